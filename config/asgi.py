@@ -13,4 +13,39 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.urls import reverse  # noqa: E402
+
+# Push-подключения (SSE /api/events/, WebSocket /ws/events/) - мимо Django, см. config.events
+from config.events import events_application  # noqa: E402
+
+# Потоковые импорты отвечают синхронным генератором: под ASGI Django
+# дочитывает его целиком до отправки, и отчёт о многогигабайтном файле
+# копится в памяти. Их обслуживает только WSGI-сервис (gunicorn, django) -
+# здесь такие запросы отклоняются до чтения тела
+WSGI_ONLY_PATHS = frozenset((
+    reverse('users:client-import'),
+    reverse('payments:posting_import'),
+))
+
+
+def wsgi_only_application(application):
+    async def app(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] in WSGI_ONLY_PATHS:
+            await send({
+                'type': 'http.response.start',
+                'status': 421,
+                'headers': [(b'content-type', b'application/json')],
+            })
+            await send({
+                'type': 'http.response.body',
+                'body': '{"detail": "Импорт обслуживает WSGI-сервис (gunicorn), а не ASGI"}'.encode(),
+            })
+            return
+        return await application(scope, receive, send)
+
+    return app
+
+
+application = events_application(wsgi_only_application(django_application))
@@ -0,0 +1,54 @@
+"""
+Асинхронный доступ к Redis из async-представлений (ASGI).
+
+Ключи и формат значений совпадают с кэшем django_redis, поэтому
+синхронный и асинхронный код видят одни и те же данные.
+"""
+
+import asyncio
+import time
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def is_redis_cache():
+    return settings.CACHES['default']['BACKEND'].startswith('django_redis.')
+
+
+def get_async_redis():
+    """Клиент redis.asyncio для текущего event loop"""
+    import redis.asyncio
+
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = redis.asyncio.from_url(settings.CACHES['default']['LOCATION'])
+        _clients[loop] = client
+    return client
+
+
+async def acache_get(key, default=None):
+    if not is_redis_cache():
+        return await cache.aget(key, default)
+    from .metrics import record_cache
+
+    started = time.perf_counter()
+    value = await get_async_redis().get(cache.make_key(key))
+    record_cache(time.perf_counter() - started, hits=int(value is not None), misses=int(value is None))
+    if value is None:
+        return default
+    return cache.client.decode(value)
+
+
+async def acache_set(key, value, timeout):
+    if not is_redis_cache():
+        return await cache.aset(key, value, timeout)
+    from .metrics import record_cache
+
+    started = time.perf_counter()
+    await get_async_redis().set(cache.make_key(key), cache.client.encode(value), ex=timeout)
+    record_cache(time.perf_counter() - started)
@@ -0,0 +1,199 @@
+"""
+Маршрутизация запросов по базам: основная база приложения и её реплики.
+
+- Запись и чтение по умолчанию - основная база приложения
+  (DATABASE_APPS: app_label -> alias, остальные приложения - default).
+- С реплики читается только то, что явно обёрнуто в replica_reads():
+  профиль, список клиентов, статистика, кабинет. Внутри транзакции и
+  после записи в этом же запросе чтение идёт в основную базу.
+- Read-your-writes: после записи клиент REPLICA_STICKY_SECONDS секунд
+  читает из основной базы (отметка в кэше по id клиента), поэтому свои
+  изменения видит сразу, даже если реплика отстаёт.
+
+Связанные модели (FK, M2M) должны жить в одной базе - иначе нет ни
+внешних ключей, ни JOIN. Это проверяет check_database_apps при запуске.
+"""
+
+import logging
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.checks import Error, Tags, register
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+DATABASE_APPS = getattr(settings, 'DATABASE_APPS', {})
+DATABASE_REPLICAS = getattr(settings, 'DATABASE_REPLICAS', {})
+# Сколько секунд после записи клиент читает только из основной базы (запас на отставание реплик)
+REPLICA_STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_request_state = ContextVar('db_routing_state', default=None)
+
+
+def primary_alias(app_label):
+    return DATABASE_APPS.get(app_label, DEFAULT_DB_ALIAS)
+
+
+def _pin_key(client_id):
+    return f'db:pinned:{client_id}'
+
+
+@contextmanager
+def replica_reads():
+    """Чтения внутри блока (или декорированной функции) можно отдавать репликам"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads_active():
+    """Чтение сейчас может уйти на реплику (данные могут отставать)"""
+    return _replica_reads.get() and bool(DATABASE_REPLICAS)
+
+
+class RoutingState:
+    """Состояние маршрутизации одного запроса: была ли запись и закреплён ли клиент за основной базой"""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.client_id = None
+        self.wrote = False
+        self._pinned = None
+        self._resolving = False
+
+    def set_client(self, client_id):
+        self.client_id = client_id
+        self._pinned = None
+
+    def _resolve_client(self):
+        if self.client_id is None and self.request is not None:
+            # Пользователь сессии; клиента из JWT сообщает note_client
+            user = getattr(self.request, 'user', None)
+            if user is not None and user.is_authenticated:
+                self.client_id = user.pk
+        return self.client_id
+
+    def pinned(self):
+        if self.wrote:
+            return True
+        if self._pinned is None:
+            if self._resolving:
+                # Загрузка пользователя сессии сама пришла в роутер - её в основную базу
+                return True
+            self._resolving = True
+            try:
+                client_id = self._resolve_client()
+                self._pinned = client_id is not None and cache.get(_pin_key(client_id)) is not None
+            except Exception as e:
+                logger.warning('Не удалось проверить закрепление за основной базой: %s', e)
+                self._pinned = True
+            finally:
+                self._resolving = False
+        return self._pinned
+
+
+def note_client(client_id):
+    """Клиент запроса известен (JWT без сессии) - для проверки read-your-writes"""
+    state = _request_state.get()
+    if state is not None:
+        state.set_client(client_id)
+
+
+class DatabaseRouter:
+    def db_for_read(self, model, **hints):
+        primary = primary_alias(model._meta.app_label)
+        replicas = DATABASE_REPLICAS.get(primary)
+        if not replicas or not _replica_reads.get():
+            return primary
+        if connections[primary].in_atomic_block:
+            return primary
+        state = _request_state.get()
+        if state is not None and state.pinned():
+            return primary
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return primary_alias(model._meta.app_label)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return primary_alias(obj1._meta.app_label) == primary_alias(obj2._meta.app_label)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == primary_alias(app_label)
+
+
+def _remember_write(state):
+    client_id = state._resolve_client()
+    if client_id is not None:
+        try:
+            cache.set(_pin_key(client_id), 1, REPLICA_STICKY_SECONDS)
+        except Exception as e:
+            logger.warning('Не удалось закрепить клиента %s за основной базой: %s', client_id, e)
+
+
+@sync_and_async_middleware
+def routing_middleware(get_response):
+    """Состояние маршрутизации на запрос; после записи клиент закрепляется за основной базой"""
+    if not DATABASE_REPLICAS:
+        return get_response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            state = RoutingState(request)
+            token = _request_state.set(state)
+            try:
+                response = await get_response(request)
+            finally:
+                _request_state.reset(token)
+            if state.wrote:
+                await sync_to_async(_remember_write)(state)
+            return response
+    else:
+        def middleware(request):
+            state = RoutingState(request)
+            token = _request_state.set(state)
+            try:
+                response = get_response(request)
+            finally:
+                _request_state.reset(token)
+            if state.wrote:
+                _remember_write(state)
+            return response
+    return middleware
+
+
+@register(Tags.models)
+def check_database_apps(app_configs, **kwargs):
+    """Связанные модели должны быть в одной базе: FK и JOIN между базами не работают"""
+    errors = []
+    for model in apps.get_models(include_auto_created=True):
+        database = primary_alias(model._meta.app_label)
+        for field in model._meta.get_fields():
+            if not field.is_relation or field.auto_created or field.related_model is None:
+                continue
+            related_model = field.related_model
+            if isinstance(related_model, str):
+                continue
+            related = primary_alias(related_model._meta.app_label)
+            if related != database:
+                errors.append(Error(
+                    f'{model._meta.label}.{field.name} ссылается на {related_model._meta.label}, '
+                    f'но модели в разных базах ({database} и {related})',
+                    hint='Перенесите приложения в одну базу (DATABASE_APPS) или замените связь на id без FK',
+                    obj=field,
+                    id='config.E001',
+                ))
+    return errors
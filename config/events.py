@@ -0,0 +1,389 @@
+"""
+Push-уведомления клиентам об изменениях документов и оплат: SSE и WebSocket.
+
+Публикация - из синхронного кода после коммита транзакции: события пачки
+группируются по клиентам, на клиента - один PUBLISH в канал events:<id>,
+все каналы - одним pipeline.
+
+Доставка - в ASGI-процессе (config.asgi), в обход Django-представлений:
+- одно соединение Redis pub/sub на процесс; процесс подписан только на
+  каналы клиентов, у которых в нём есть открытые подключения, поэтому
+  каждая реплика получает только свои события;
+- подключение - корутина, ждущая asyncio.Event: ни потока, ни соединения
+  с БД на подключение, простаивающее подключение - несколько килобайт;
+- события копятся EVENTS_FLUSH_INTERVAL секунд и уходят одной записью;
+  события с одинаковым ключом (баланс, статус документа) схлопываются
+  в последнее.
+
+Истории событий нет: после (пере)подключения клиент получает событие
+ready и перечитывает нужные данные через REST. Без Redis (разработка)
+события доставляются только подключениям текущего процесса.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from itertools import count
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from config.async_redis import get_async_redis, is_redis_cache
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL_PREFIX = 'events:'
+EVENTS_SSE_PATH = getattr(settings, 'EVENTS_SSE_PATH', '/api/events/')
+EVENTS_WS_PATH = getattr(settings, 'EVENTS_WS_PATH', '/ws/events/')
+# Окно накопления событий перед отправкой (секунды)
+EVENTS_FLUSH_INTERVAL = getattr(settings, 'EVENTS_FLUSH_INTERVAL', 0.5)
+# Комментарий-пинг SSE, чтобы прокси не закрывали простаивающее соединение
+EVENTS_HEARTBEAT_INTERVAL = getattr(settings, 'EVENTS_HEARTBEAT_INTERVAL', 25)
+# Пауза перед переподключением браузера (поле retry SSE, миллисекунды)
+EVENTS_RETRY_MS = getattr(settings, 'EVENTS_RETRY_MS', 3000)
+# Неотправленных событий на подключение; больше - клиенту уходит одно событие resync
+EVENTS_MAX_PENDING = getattr(settings, 'EVENTS_MAX_PENDING', 1000)
+
+# Закрытие WebSocket из-за истёкшего или неверного токена
+WS_CLOSE_UNAUTHORIZED = 4401
+
+
+def channel(client_id):
+    return f'{EVENTS_CHANNEL_PREFIX}{client_id}'
+
+
+def make_event(event_type, data, key=None):
+    """Событие; из событий с одинаковым key до клиента доходит последнее"""
+    return {'type': event_type, 'key': key, 'data': data}
+
+
+def _encode(events):
+    return json.dumps(events, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def send_events(batches):
+    """{client_id: [событие, ...]} -> PUBLISH в каналы клиентов. Ошибка доставки только логируется"""
+    batches = {client_id: events for client_id, events in batches.items() if events}
+    if not batches:
+        return
+    try:
+        if is_redis_cache():
+            from django_redis import get_redis_connection
+
+            pipe = get_redis_connection('default').pipeline(transaction=False)
+            for client_id, events in batches.items():
+                pipe.publish(channel(client_id), _encode(events))
+            pipe.execute()
+        else:
+            hub.deliver_threadsafe(batches)
+    except Exception as e:
+        logger.warning('Не удалось опубликовать события: %s', e)
+
+
+def publish(batches):
+    """Опубликовать события после коммита текущей транзакции (вне транзакции - сразу)"""
+    if batches:
+        transaction.on_commit(lambda: send_events(batches))
+
+
+class Connection:
+    """Открытое подключение клиента: накопленные события и пробуждение отправителя"""
+
+    _sequence = count()
+
+    def __init__(self, client_id, expires_at):
+        self.client_id = client_id
+        self.expires_at = expires_at
+        self.pending = {}
+        self.wakeup = asyncio.Event()
+
+    @property
+    def expired(self):
+        return time.time() >= self.expires_at
+
+    def push(self, events):
+        for event in events:
+            key = event.get('key') or f'#{next(self._sequence)}'
+            # Повторное событие с тем же ключом встаёт в конец очереди
+            self.pending.pop(key, None)
+            self.pending[key] = event
+        if len(self.pending) > EVENTS_MAX_PENDING:
+            # Клиент не успевает забирать события - пусть перечитает состояние целиком
+            self.pending = {'resync': make_event('resync', {}, 'resync')}
+        self.wakeup.set()
+
+    def take(self):
+        events = [{'type': event['type'], 'data': event['data']} for event in self.pending.values()]
+        self.pending = {}
+        self.wakeup.clear()
+        return events
+
+    async def pump(self, send_events, send_heartbeat=None, heartbeat_interval=EVENTS_HEARTBEAT_INTERVAL):
+        """Отправка накопленных событий до истечения токена подключения"""
+        while True:
+            timeout = self.expires_at - time.time()
+            if timeout <= 0:
+                return
+            if send_heartbeat is not None:
+                timeout = min(timeout, heartbeat_interval)
+            try:
+                async with asyncio.timeout(timeout):
+                    await self.wakeup.wait()
+            except TimeoutError:
+                if send_heartbeat is not None and not self.expired:
+                    await send_heartbeat()
+                continue
+            # Окно накопления: события пачки и частые обновления уходят одной записью
+            await asyncio.sleep(EVENTS_FLUSH_INTERVAL)
+            await send_events(self.take())
+
+
+class EventHub:
+    """Подключения процесса по клиентам и общая подписка на их каналы в Redis"""
+
+    def __init__(self):
+        self.connections = defaultdict(set)
+        self.loop = None
+        self._pubsub = None
+        self._reader = None
+
+    @property
+    def connection_count(self):
+        return sum(len(connections) for connections in self.connections.values())
+
+    async def add(self, connection):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # Новый event loop (перезапуск в тестах/бенчмарке) - старая подписка к нему не относится
+            self.loop, self._pubsub, self._reader = loop, None, None
+        connections = self.connections[connection.client_id]
+        connections.add(connection)
+        if len(connections) == 1 and is_redis_cache():
+            await self._subscribe(channel(connection.client_id))
+
+    async def remove(self, connection):
+        connections = self.connections.get(connection.client_id)
+        if connections is None:
+            return
+        connections.discard(connection)
+        if connections:
+            return
+        del self.connections[connection.client_id]
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(channel(connection.client_id))
+            except Exception as e:
+                logger.warning('Не удалось отписаться от %s: %s', channel(connection.client_id), e)
+
+    async def _subscribe(self, name):
+        try:
+            if self._pubsub is None:
+                self._pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+            await self._pubsub.subscribe(name)
+        except Exception as e:
+            logger.warning('Не удалось подписаться на %s: %s', name, e)
+            return
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.ensure_future(self._read())
+
+    async def _read(self):
+        while self.connections:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning('Соединение pub/sub с Redis потеряно: %s', e)
+                await self._resubscribe()
+                continue
+            if message is None or message['type'] != 'message':
+                continue
+            client_id = int(message['channel'].decode().removeprefix(EVENTS_CHANNEL_PREFIX))
+            self.dispatch(client_id, message['data'])
+
+    async def _resubscribe(self):
+        await asyncio.sleep(1)
+        try:
+            await self._pubsub.aclose()
+        except Exception:
+            pass
+        try:
+            self._pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+            if self.connections:
+                await self._pubsub.subscribe(*(channel(client_id) for client_id in self.connections))
+        except Exception as e:
+            logger.warning('Не удалось восстановить подписку: %s', e)
+            return
+        # Пока подписки не было, события могли потеряться
+        for connections in self.connections.values():
+            for connection in connections:
+                connection.push([make_event('resync', {}, 'resync')])
+
+    def dispatch(self, client_id, payload):
+        connections = self.connections.get(client_id)
+        if not connections:
+            return
+        try:
+            events = json.loads(payload)
+        except ValueError:
+            logger.warning('Некорректное сообщение в канале %s', channel(client_id))
+            return
+        for connection in connections:
+            connection.push(events)
+
+    def deliver_threadsafe(self, batches):
+        """Доставка без Redis: только подключениям этого процесса"""
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        for client_id, events in batches.items():
+            loop.call_soon_threadsafe(self.dispatch, client_id, _encode(events))
+
+
+hub = EventHub()
+
+
+def _raw_token(scope):
+    """Токен из Authorization или ?token= (EventSource и WebSocket в браузере заголовки не передают)"""
+    from rest_framework_simplejwt.settings import api_settings
+
+    for name, value in scope.get('headers', ()):
+        if name == b'authorization':
+            parts = value.decode('latin-1').split()
+            if len(parts) == 2 and parts[0] in api_settings.AUTH_HEADER_TYPES:
+                return parts[1]
+    return (parse_qs(scope.get('query_string', b'').decode('latin-1')).get('token') or [None])[0]
+
+
+async def authenticate(scope):
+    """Подключение для клиента из токена или None; подключение живёт до exp токена"""
+    from users.async_views import authenticate_token
+
+    raw_token = _raw_token(scope)
+    if not raw_token:
+        return None
+    result = await authenticate_token(raw_token)
+    if result is None:
+        return None
+    client_id, token = result
+    return Connection(client_id, expires_at=token['exp'])
+
+
+def _cors_headers(scope):
+    origin = next((value for name, value in scope.get('headers', ()) if name == b'origin'), None)
+    if origin is None:
+        return []
+    allowed = getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False) or \
+        origin.decode('latin-1') in getattr(settings, 'CORS_ALLOWED_ORIGINS', ())
+    if not allowed:
+        return []
+    return [(b'access-control-allow-origin', origin), (b'access-control-allow-credentials', b'true')]
+
+
+async def _wait_disconnect(receive, disconnect_type):
+    while (await receive())['type'] != disconnect_type:
+        pass
+
+
+async def _serve(connection, receive, disconnect_type, send_events, send_heartbeat=None):
+    """Отправка событий подключению, пока клиент не отключится или не истечёт токен"""
+    await hub.add(connection)
+    pump = asyncio.ensure_future(connection.pump(send_events, send_heartbeat))
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive, disconnect_type))
+    try:
+        await asyncio.wait({pump, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        pump.cancel()
+        disconnected.cancel()
+        await hub.remove(connection)
+    if pump.done() and not pump.cancelled() and pump.exception() is not None:
+        # Обычно это запись в уже закрытое клиентом соединение
+        logger.debug('Подключение клиента %s закрыто: %s', connection.client_id, pump.exception())
+
+
+async def sse_application(scope, receive, send):
+    """GET /api/events/ - поток text/event-stream"""
+    cors = _cors_headers(scope)
+    if scope['method'] != 'GET':
+        await send({'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'GET'), *cors]})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    connection = await authenticate(scope)
+    if connection is None:
+        body = json.dumps({'detail': 'Учетные данные не были предоставлены.'}, ensure_ascii=False).encode()
+        await send({'type': 'http.response.start', 'status': 401, 'headers': [
+            (b'content-type', b'application/json'), *cors,
+        ]})
+        await send({'type': 'http.response.body', 'body': body})
+        return
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream; charset=utf-8'),
+        (b'cache-control', b'no-cache'),
+        # nginx не должен буферизовать поток
+        (b'x-accel-buffering', b'no'),
+        *cors,
+    ]})
+
+    async def write(text):
+        await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+
+    async def send_events(events):
+        await write(''.join(
+            f"event: {event['type']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+            for event in events
+        ))
+
+    async def send_heartbeat():
+        await write(': ping\n\n')
+
+    await write(f'retry: {EVENTS_RETRY_MS}\nevent: ready\ndata: {{}}\n\n')
+    await _serve(connection, receive, 'http.disconnect', send_events, send_heartbeat)
+    try:
+        await send({'type': 'http.response.body', 'body': b''})
+    except Exception:
+        pass
+
+
+async def websocket_application(scope, receive, send):
+    """/ws/events/ - JSON-сообщения {"events": [...]}; пинги делает сервер (uvicorn)"""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    connection = await authenticate(scope)
+    if connection is None:
+        await send({'type': 'websocket.close', 'code': WS_CLOSE_UNAUTHORIZED})
+        return
+    await send({'type': 'websocket.accept'})
+
+    async def send_events(events):
+        await send({'type': 'websocket.send', 'text': json.dumps({'events': events}, ensure_ascii=False)})
+
+    await send_events([{'type': 'ready', 'data': {}}])
+    await _serve(connection, receive, 'websocket.disconnect', send_events)
+    if connection.expired:
+        # Клиент обновит токен и переподключится
+        try:
+            await send({'type': 'websocket.close', 'code': WS_CLOSE_UNAUTHORIZED})
+        except Exception:
+            pass
+
+
+def events_application(application):
+    """ASGI-приложение: push-подключения обслуживаются здесь, остальное - Django"""
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == EVENTS_SSE_PATH:
+            return await sse_application(scope, receive, send)
+        if scope['type'] == 'websocket':
+            if scope['path'] == EVENTS_WS_PATH:
+                return await websocket_application(scope, receive, send)
+            # Других WebSocket-маршрутов нет, Django их не обслуживает
+            await send({'type': 'websocket.close'})
+            return
+        return await application(scope, receive, send)
+
+    return app
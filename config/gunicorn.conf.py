@@ -0,0 +1,76 @@
+"""
+Конфигурация gunicorn для монолита (WSGI): gunicorn -c config/gunicorn.conf.py
+
+- Воркеры - процессы (prefork) с потоками (gthread). У каждого потока своё
+  постоянное подключение к каждой базе (CONN_MAX_AGE), поэтому размер
+  задаётся бюджетом подключений GUNICORN_DB_CONNECTIONS на базу (основная,
+  каждая реплика): процессов 2 * CPU + 1, но не больше бюджета, потоков -
+  сколько в бюджет помещается, до 4. Бюджет - доля max_connections
+  PostgreSQL, остальное - ASGI-сервису, обработчику документов и
+  командам. Если явно заданные GUNICORN_WORKERS * GUNICORN_THREADS его
+  превышают, gunicorn не стартует.
+- preload_app: приложение загружается в мастере до fork, код и данные
+  модулей делятся воркерами copy-on-write. Пулы, потоки и подключения в
+  проекте создаются лениво, уже в воркере.
+- Воркер перезапускается после max_requests (+ случайный jitter, чтобы не
+  все сразу) - утечки памяти не копятся.
+
+Параметры переопределяются переменными GUNICORN_*.
+"""
+
+import logging
+import multiprocessing
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings_production')
+
+wsgi_app = 'config.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+db_connections = int(os.environ.get('GUNICORN_DB_CONNECTIONS', 40))
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, db_connections)))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', max(1, min(4, db_connections // workers))))
+if workers * threads > db_connections:
+    raise RuntimeError(
+        f'GUNICORN_WORKERS * GUNICORN_THREADS = {workers * threads} подключений к базе '
+        f'при бюджете GUNICORN_DB_CONNECTIONS = {db_connections}'
+    )
+# Пул хэширования паролей свой у каждого воркера - делим между ними ядра, а не даём каждому все
+os.environ.setdefault('HASHING_WORKERS', str(max(1, multiprocessing.cpu_count() // workers)))
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 2048))
+# Heartbeat воркеров - в tmpfs, а не на диске контейнера
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+forwarded_allow_ips = os.environ.get('GUNICORN_FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+logger = logging.getLogger('gunicorn.error')
+
+
+def pre_fork(server, worker):
+    # Подключение, открытое в мастере при загрузке приложения, не должно достаться воркерам:
+    # закрываем в мастере - закрытие в воркере оборвало бы общий сокет и для остальных
+    from django.db import connections
+
+    connections.close_all()
+
+
+def worker_exit(server, worker):
+    # Перезапуск по max_requests: не теряем ещё не отправленные в Redis метрики
+    try:
+        from config.metrics import registry
+
+        registry.flush()
+    except Exception as e:
+        logger.warning('Не удалось отправить метрики при остановке воркера: %s', e)
@@ -0,0 +1,137 @@
+"""
+Простой асинхронный генератор нагрузки HTTP/1.1 для бенчмарков.
+
+Каждое соединение - корутина с keep-alive, поэтому тысячи одновременных
+соединений обслуживаются одним потоком без сторонних библиотек.
+"""
+
+import asyncio
+import json
+import resource
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def raise_nofile_limit(connections):
+    """Каждому соединению - дескриптор: поднять мягкий лимит открытых файлов"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, connections * 2 + 100)
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class LoadResult:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def as_dict(self):
+        latencies = sorted(self.latencies)
+        ms = lambda value: round(value * 1000, 2) if value is not None else None
+        succeeded = sum(count for code, count in self.statuses.items() if code < 400)
+        return {
+            'name': self.name,
+            'requests': len(latencies),
+            'errors': self.errors,
+            'ok_share': round(succeeded / (len(latencies) + self.errors), 4) if latencies or self.errors else None,
+            'statuses': {str(code): count for code, count in sorted(self.statuses.items())},
+            'rps': round(len(latencies) / self.elapsed, 1) if self.elapsed else 0,
+            'p50_ms': ms(percentile(latencies, 50)),
+            'p95_ms': ms(percentile(latencies, 95)),
+            'p99_ms': ms(percentile(latencies, 99)),
+            'mean_ms': ms(statistics.fmean(latencies)) if latencies else None,
+        }
+
+
+async def _read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status, headers
+
+
+def build_request(method, url, headers=None, body=None):
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    if body is not None and not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: keep-alive']
+    for key, value in (headers or {}).items():
+        lines.append(f'{key}: {value}')
+    lines.append(f'Content-Length: {len(body or b"")}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode() + (body or b'')
+
+
+async def _worker(url, make_request, deadline, result, timeout):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            started = time.perf_counter()
+            writer.write(make_request())
+            await writer.drain()
+            status, headers = await asyncio.wait_for(_read_response(reader), timeout)
+            result.latencies.append(time.perf_counter() - started)
+            result.statuses[status] = result.statuses.get(status, 0) + 1
+            if headers.get('connection', '').lower() == 'close':
+                writer.close()
+                writer = None
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            result.errors += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(name, url, method='GET', headers=None, body=None,
+                   connections=100, duration=10.0, timeout=30.0, make_request=None):
+    """
+    Держит `connections` соединений в течение `duration` секунд.
+    make_request (если задан) строит байты запроса для каждого обращения.
+    """
+    result = LoadResult(name)
+    if make_request is None:
+        raw = build_request(method, url, headers, body)
+        make_request = lambda: raw
+
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        _worker(url, make_request, deadline, result, timeout) for _ in range(connections)
+    ))
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,391 @@
+"""
+Метрики запросов в формате Prometheus (GET /metrics).
+
+Middleware меряет каждый запрос Django и раскладывает время по маршруту
+(шаблону URL, а не пути - число рядов ограничено):
+- http_request_duration_seconds - гистограмма длительности {route, method, status};
+- http_request_db_queries_total, http_request_cache_hits_total / _misses_total;
+- http_request_component_seconds_total {component}: db, cache, serialize, hashing.
+
+Запросы к БД считает обёртка из execute_wrappers подключения (ставится на
+каждое новое подключение), обращения к Redis - клиент кэша
+InstrumentedRedisClient, сериализацию - обёртки над Serializer.data и
+JSONRenderer.render, хэширование паролей - users.hashing.
+
+Гистограммы - логарифмические корзины в духе HDR: METRICS_BUCKETS_PER_OCTAVE
+корзин на каждое удвоение начиная со 100 мкс, номер корзины считается за O(1)
+(при 4 корзинах на октаву погрешность квантилей - до 19%). В выдаче у каждого
+ряда одна и та же полная раскладка le до MAX_BUCKET_INDEX, пустые корзины
+тоже: иначе sum by (le) в histogram_quantile складывал бы несовпадающие
+накопленные значения.
+
+Каждый процесс копит значения у себя и раз в METRICS_FLUSH_INTERVAL секунд
+добавляет приращения в общий хэш Redis (HINCRBYFLOAT в одном pipeline);
+/metrics отдаёт сумму по всем процессам. Без Redis - значения текущего процесса.
+"""
+
+import functools
+import hmac
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+from django_redis.client import DefaultClient
+
+logger = logging.getLogger(__name__)
+
+METRICS_FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+METRICS_BUCKETS_PER_OCTAVE = getattr(settings, 'METRICS_BUCKETS_PER_OCTAVE', 4)
+# Если задан, /metrics требует заголовок Authorization: Bearer <токен>
+METRICS_TOKEN = getattr(settings, 'METRICS_TOKEN', '')
+METRICS_KEY = 'metrics'
+
+MIN_BUCKET_SECONDS = 0.0001
+# Последняя корзина - около минуты, всё дольше попадает только в +Inf
+MAX_BUCKET_INDEX = math.ceil(math.log2(60 / MIN_BUCKET_SECONDS) * METRICS_BUCKETS_PER_OCTAVE)
+
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Длительность запроса'),
+    'http_request_db_queries_total': ('counter', 'Запросов к БД'),
+    'http_request_cache_hits_total': ('counter', 'Попаданий в кэш'),
+    'http_request_cache_misses_total': ('counter', 'Промахов кэша'),
+    'http_request_component_seconds_total': ('counter', 'Время запроса по составляющим: db, cache, serialize, hashing'),
+}
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def bucket_index(seconds):
+    if seconds <= MIN_BUCKET_SECONDS:
+        return 0
+    index = math.ceil(math.log2(seconds / MIN_BUCKET_SECONDS) * METRICS_BUCKETS_PER_OCTAVE - 1e-9)
+    return min(index, MAX_BUCKET_INDEX + 1)
+
+
+def bucket_bound(index):
+    return MIN_BUCKET_SECONDS * 2 ** (index / METRICS_BUCKETS_PER_OCTAVE)
+
+
+BUCKET_BOUNDS = [f'{bucket_bound(index):.6g}' for index in range(MAX_BUCKET_INDEX + 1)]
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{_label_value(value)}"' for name, value in labels.items())
+
+
+def _field(name, labels, index=''):
+    return f'{name}|{labels}|{index}'
+
+
+class Registry:
+    """Значения метрик процесса; приращения периодически уходят в Redis"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Ещё не отправленные в Redis приращения и всё накопленное процессом
+        self._pending = defaultdict(float)
+        self._local = defaultdict(float)
+        self._flushed_at = time.monotonic()
+
+    def add(self, samples):
+        with self._lock:
+            for field, value in samples:
+                self._pending[field] += value
+                self._local[field] += value
+
+    def flush_due(self):
+        return time.monotonic() - self._flushed_at >= METRICS_FLUSH_INTERVAL
+
+    def flush(self):
+        from .async_redis import is_redis_cache
+
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+            self._flushed_at = time.monotonic()
+        if not pending or not is_redis_cache():
+            return
+        try:
+            from django_redis import get_redis_connection
+
+            pipe = get_redis_connection('default').pipeline(transaction=False)
+            key = cache.make_key(METRICS_KEY)
+            for field, value in pending.items():
+                pipe.hincrbyfloat(key, field, value)
+            pipe.execute()
+        except Exception as e:
+            logger.warning('Не удалось отправить метрики в Redis: %s', e)
+            # Приращения не теряются - уйдут со следующей отправкой
+            with self._lock:
+                for field, value in pending.items():
+                    self._pending[field] += value
+
+    def collect(self):
+        """Все значения: сумма по процессам из Redis или значения этого процесса"""
+        from .async_redis import is_redis_cache
+
+        if not is_redis_cache():
+            with self._lock:
+                return dict(self._local)
+        self.flush()
+        from django_redis import get_redis_connection
+
+        raw = get_redis_connection('default').hgetall(cache.make_key(METRICS_KEY))
+        return {field.decode(): float(value) for field, value in raw.items()}
+
+
+registry = Registry()
+
+
+class RequestStats:
+    """Счётчики одного запроса"""
+
+    __slots__ = ('db_queries', 'cache_hits', 'cache_misses', 'seconds', 'active')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.seconds = defaultdict(float)
+        # Составляющие, которые сейчас меряются: вложенные вызовы не считаются дважды
+        self.active = set()
+
+
+@contextmanager
+def measure(component):
+    """
+    Время блока в составляющую component текущего запроса. Отдаёт статистику
+    запроса или None - вне запроса и во вложенном блоке той же составляющей
+    """
+    stats = _current.get()
+    if stats is None or component in stats.active:
+        yield None
+        return
+    stats.active.add(component)
+    started = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.seconds[component] += time.perf_counter() - started
+        stats.active.discard(component)
+
+
+def record_cache(seconds, hits=0, misses=0):
+    """Обращение к кэшу в обход InstrumentedRedisClient (async-представления)"""
+    stats = _current.get()
+    if stats is not None:
+        stats.seconds['cache'] += seconds
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    with measure('db') as stats:
+        if stats is not None:
+            stats.db_queries += 1
+        return execute(sql, params, many, context)
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    # В начало списка: connection.execute_wrapper() снимает свою обёртку через pop()
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _sql_wrapper)
+
+
+def _timed_cache_operation(name):
+    method = getattr(DefaultClient, name)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with measure('cache'):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+_MISSING = object()
+
+
+class InstrumentedRedisClient(DefaultClient):
+    """Клиент django_redis: попадания, промахи и время обращений к Redis в метрики запроса"""
+
+    def get(self, key, default=None, version=None, client=None):
+        with measure('cache') as stats:
+            value = super().get(key, default=_MISSING, version=version, client=client)
+            if stats is not None:
+                if value is _MISSING:
+                    stats.cache_misses += 1
+                else:
+                    stats.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        with measure('cache') as stats:
+            values = super().get_many(keys, version=version, client=client)
+            if stats is not None:
+                stats.cache_hits += len(values)
+                stats.cache_misses += len(keys) - len(values)
+        return values
+
+    set = _timed_cache_operation('set')
+    add = _timed_cache_operation('add')
+    set_many = _timed_cache_operation('set_many')
+    delete = _timed_cache_operation('delete')
+    delete_many = _timed_cache_operation('delete_many')
+    has_key = _timed_cache_operation('has_key')
+    incr = _timed_cache_operation('incr')
+    decr = _timed_cache_operation('decr')
+    touch = _timed_cache_operation('touch')
+    expire = _timed_cache_operation('expire')
+    ttl = _timed_cache_operation('ttl')
+
+
+_instrumented = False
+
+
+def _instrument():
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+    connection_created.connect(_instrument_connection, dispatch_uid='config.metrics')
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(None, connection)
+
+    from rest_framework import renderers, serializers
+
+    # Serializer.data и ListSerializer.data берут результат через BaseSerializer.data
+    serializer_data = serializers.BaseSerializer.data.fget
+
+    def data(self):
+        with measure('serialize'):
+            return serializer_data(self)
+    serializers.BaseSerializer.data = property(data)
+
+    render = renderers.JSONRenderer.render
+
+    @functools.wraps(render)
+    def timed_render(self, *args, **kwargs):
+        with measure('serialize'):
+            return render(self, *args, **kwargs)
+    renderers.JSONRenderer.render = timed_render
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return '/' + match.route if match.route else match.view_name
+
+
+def _record(request, status, stats, seconds):
+    route = _route(request)
+    labels = _labels(route=route, method=request.method)
+    duration_labels = f'{labels},{_labels(status=status)}'
+    samples = [
+        (_field('http_request_duration_seconds_bucket', duration_labels, bucket_index(seconds)), 1),
+        (_field('http_request_duration_seconds_sum', duration_labels), seconds),
+        (_field('http_request_duration_seconds_count', duration_labels), 1),
+        (_field('http_request_db_queries_total', labels), stats.db_queries),
+        (_field('http_request_cache_hits_total', labels), stats.cache_hits),
+        (_field('http_request_cache_misses_total', labels), stats.cache_misses),
+    ]
+    samples.extend(
+        (_field('http_request_component_seconds_total', f'{labels},{_labels(component=component)}'), value)
+        for component, value in stats.seconds.items()
+    )
+    registry.add(samples)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Время, запросы к БД и кэшу, сериализация - по маршрутам"""
+    _instrument()
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats = RequestStats()
+            token = _current.set(stats)
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = await get_response(request)
+                status = response.status_code
+            finally:
+                _current.reset(token)
+                _record(request, status, stats, time.perf_counter() - started)
+            if registry.flush_due():
+                await sync_to_async(registry.flush, thread_sensitive=False)()
+            return response
+    else:
+        def middleware(request):
+            stats = RequestStats()
+            token = _current.set(stats)
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = get_response(request)
+                status = response.status_code
+            finally:
+                _current.reset(token)
+                _record(request, status, stats, time.perf_counter() - started)
+            if registry.flush_due():
+                registry.flush()
+            return response
+    return middleware
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render_metrics(values):
+    """Значения {поле: число} -> текстовый формат Prometheus"""
+    grouped = defaultdict(lambda: defaultdict(dict))
+    for field, value in values.items():
+        name, rest = field.split('|', 1)
+        labels, index = rest.rsplit('|', 1)
+        grouped[name][labels][index] = value
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for labels, series in sorted(grouped[name].items()):
+                lines.append(f'{name}{{{labels}}} {_number(series[""])}')
+            continue
+        for labels, buckets in sorted(grouped[f'{name}_bucket'].items()):
+            cumulative = 0
+            for index in range(MAX_BUCKET_INDEX + 1):
+                cumulative += buckets.get(str(index), 0)
+                lines.append(f'{name}_bucket{{{labels},le="{BUCKET_BOUNDS[index]}"}} {_number(cumulative)}')
+            # Корзина за MAX_BUCKET_INDEX видна только в +Inf
+            count = grouped[f'{name}_count'][labels].get('', cumulative + buckets.get(str(MAX_BUCKET_INDEX + 1), 0))
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {_number(count)}')
+            lines.append(f'{name}_sum{{{labels}}} {_number(grouped[f"{name}_sum"][labels].get("", 0))}')
+            lines.append(f'{name}_count{{{labels}}} {_number(count)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """GET /metrics - метрики всех процессов для Prometheus"""
+    if METRICS_TOKEN:
+        header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(header.encode(), f'Bearer {METRICS_TOKEN}'.encode()):
+            return HttpResponse(status=401)
+    return HttpResponse(render_metrics(registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,262 @@
+"""
+Сэмплирующий профилировщик по требованию (без перезапуска процесса).
+
+Сессия запускается в текущем процессе на N секунд: поток-таймер раз в
+PROFILER_INTERVAL секунд снимает стеки (sys._current_frames) потоков,
+которые сейчас обрабатывают запросы с нужным префиксом пути. Какой поток
+каким запросом занят, отмечают обработчики request_started/request_finished -
+они подключаются только на время сессии, без сессии профилировщик ничего
+не стоит. Async-представления выполняются в потоке event loop и под фильтр
+не попадают; синхронные (в том числе под ASGI) - попадают.
+
+Время, которое таймер держит GIL, считается; если оно больше
+PROFILER_MAX_OVERHEAD от прошедшего, интервал удваивается.
+
+Результат - файл <id>.collapsed в PROFILER_DIR в формате collapsed stacks
+(«кадр;кадр;... число»): flamegraph.pl, speedscope, inferno. Рядом -
+<id>.json с параметрами и состоянием сессии. Каталог общий для процессов
+одной машины, поэтому результат можно забрать с любого воркера.
+
+Воркер может умереть посреди сессии (max_requests, OOM, SIGKILL) и не
+дописать файлы. Поэтому в <id>.json есть pid, хост и крайний срок: сессия
+«running», чей процесс на этом хосте уже не существует или чей срок
+прошёл, при чтении считается упавшей.
+"""
+
+import json
+import os
+import socket
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+PROFILER_INTERVAL = getattr(settings, 'PROFILER_INTERVAL', 0.01)
+PROFILER_MAX_SECONDS = getattr(settings, 'PROFILER_MAX_SECONDS', 300)
+PROFILER_MAX_OVERHEAD = getattr(settings, 'PROFILER_MAX_OVERHEAD', 0.02)
+PROFILER_DIR = getattr(settings, 'PROFILER_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+# Запас к длительности сессии на последний сэмпл и запись файлов
+PROFILER_DEADLINE_GRACE = getattr(settings, 'PROFILER_DEADLINE_GRACE', 30)
+
+# Префиксы путей, которые срезаются в именах кадров: проект и стандартная библиотека
+_PATH_PREFIXES = (str(Path(settings.BASE_DIR).resolve()) + os.sep, sysconfig.get_paths()['stdlib'] + os.sep)
+
+_lock = threading.Lock()
+_active = None
+
+
+class ProfilerBusy(Exception):
+    """В процессе уже идёт сессия профилирования"""
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    if 'site-packages' + os.sep in filename:
+        filename = filename.rsplit('site-packages' + os.sep, 1)[1]
+    else:
+        for prefix in _PATH_PREFIXES:
+            if filename.startswith(prefix):
+                filename = filename[len(prefix):]
+                break
+    module = filename[:-3] if filename.endswith('.py') else filename
+    return f"{module.replace(os.sep, '.')}:{code.co_qualname}".replace(';', ':')
+
+
+class SamplingProfiler:
+    def __init__(self, seconds, prefix='/', interval=PROFILER_INTERVAL):
+        self.id = uuid.uuid4().hex[:12]
+        self.seconds = seconds
+        self.prefix = prefix
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.requests = 0
+        self.busy = 0.0
+        self.elapsed = None
+        self.started_at = timezone.now()
+        self.status = 'running'
+        # Поток -> путь обрабатываемого запроса
+        self._threads = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'profiler-{self.id}', daemon=True)
+
+    def _request_started(self, sender, environ=None, scope=None, **kwargs):
+        path = scope['path'] if scope is not None else (environ or {}).get('PATH_INFO', '')
+        if path.startswith(self.prefix):
+            self._threads[threading.get_ident()] = path
+            self.requests += 1
+
+    def _request_finished(self, sender, **kwargs):
+        self._threads.pop(threading.get_ident(), None)
+
+    def start(self):
+        request_started.connect(self._request_started, dispatch_uid=f'profiler-{self.id}')
+        request_finished.connect(self._request_finished, dispatch_uid=f'profiler-{self.id}')
+        self._write_meta()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _sample(self):
+        frames = sys._current_frames()
+        for ident in list(self._threads):
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+    def _run(self):
+        global _active
+        started = time.perf_counter()
+        deadline = started + self.seconds
+        try:
+            while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+                sample_started = time.perf_counter()
+                self._sample()
+                self.busy += time.perf_counter() - sample_started
+                if self.busy > PROFILER_MAX_OVERHEAD * (time.perf_counter() - started):
+                    self.interval = min(self.interval * 2, 1.0)
+            self.status = 'done'
+        except Exception as e:
+            self.status = f'failed: {e}'
+        finally:
+            request_started.disconnect(dispatch_uid=f'profiler-{self.id}')
+            request_finished.disconnect(dispatch_uid=f'profiler-{self.id}')
+            self.elapsed = time.perf_counter() - started
+            # Сначала освобождаем процесс: ошибка записи не должна блокировать новые сессии
+            with _lock:
+                if _active is self:
+                    _active = None
+            self._write_collapsed()
+            self._write_meta()
+
+    def collapsed(self):
+        labels = {}
+        lines = []
+        for stack, count in self.stacks.most_common():
+            names = []
+            for code in stack:
+                if code not in labels:
+                    labels[code] = _frame_label(code)
+                names.append(labels[code])
+            lines.append(f"{';'.join(names)} {count}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def meta(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'prefix': self.prefix,
+            'seconds': self.seconds,
+            'started_at': self.started_at.isoformat(),
+            'deadline': (self.started_at + timedelta(seconds=self.seconds + PROFILER_DEADLINE_GRACE)).isoformat(),
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'interval': self.interval,
+            'samples': self.samples,
+            'requests': self.requests,
+            'overhead': round(self.busy / self.elapsed, 4) if self.elapsed else None,
+        }
+
+    def _write(self, name, text):
+        os.makedirs(PROFILER_DIR, exist_ok=True)
+        path = os.path.join(PROFILER_DIR, name)
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(f'{path}.tmp', path)
+
+    def _write_meta(self):
+        self._write(f'{self.id}.json', json.dumps(self.meta(), ensure_ascii=False))
+
+    def _write_collapsed(self):
+        self._write(f'{self.id}.collapsed', self.collapsed())
+
+
+def start_profiling(seconds, prefix='/'):
+    """Запустить сессию в этом процессе; ProfilerBusy, если уже идёт другая"""
+    global _active
+    with _lock:
+        if _active is not None:
+            raise ProfilerBusy(_active.id)
+        _active = SamplingProfiler(seconds, prefix)
+        _active.start()
+        return _active
+
+
+def _process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _check_alive(meta):
+    """Сессия «running», которую уже никто не допишет, - упавшая"""
+    if meta['status'] != 'running':
+        return meta
+    deadline = parse_datetime(meta.get('deadline') or '')
+    if deadline is not None and timezone.now() > deadline:
+        return {**meta, 'status': 'failed: сессия не завершилась в срок'}
+    if meta.get('host') == socket.gethostname() and not _process_exists(meta['pid']):
+        return {**meta, 'status': 'failed: процесс завершился'}
+    return meta
+
+
+def list_profiles(limit=20):
+    """Последние сессии всех процессов (по файлам в PROFILER_DIR)"""
+    if not os.path.isdir(PROFILER_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILER_DIR):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(PROFILER_DIR, name), encoding='utf-8') as f:
+                    profiles.append(_check_alive(json.load(f)))
+            except (OSError, ValueError):
+                continue
+    profiles.sort(key=lambda meta: meta['started_at'], reverse=True)
+    return profiles[:limit]
+
+
+def _profile_path(profile_id, suffix):
+    if not profile_id.isalnum():
+        return None
+    return os.path.join(PROFILER_DIR, f'{profile_id}{suffix}')
+
+
+def get_profile(profile_id):
+    """
+    (параметры сессии, collapsed-стеки) или None. Стеки - None, пока сессия
+    идёт или если процесс умер, не записав их.
+    """
+    path = _profile_path(profile_id, '.json')
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        meta = _check_alive(json.load(f))
+    if meta['status'] == 'running':
+        return meta, None
+    try:
+        with open(_profile_path(profile_id, '.collapsed'), encoding='utf-8') as f:
+            return meta, f.read()
+    except FileNotFoundError:
+        return meta, None
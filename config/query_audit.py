@@ -0,0 +1,209 @@
+"""
+Аудит SQL-запросов на запрос (разработка и тесты, QUERY_AUDIT).
+
+- Запросы группируются по форме: параметры и так уже отдельно, списки
+  IN (%s, %s, ...) сворачиваются, числа и строки в тексте заменяются на ?.
+  Форма, повторившаяся QUERY_AUDIT_N_PLUS_ONE раз и больше, - N+1: в лог
+  идёт число повторов и стек до представления или сериализатора, где
+  запрос выполнялся в цикле.
+- Представление объявляет бюджет - сколько запросов ему можно:
+  @query_budget(n) на функции или классе, атрибут query_budget у класса,
+  у ModelAdmin - query_budgets = {'changelist_view': n, ...}.
+  Превышение пишется в лог, а при QUERY_AUDIT_STRICT (тесты) - исключение
+  QueryBudgetExceeded, и тест падает.
+- В ответ добавляются X-Query-Count и X-Query-Budget.
+
+В продакшене выключено: middleware не подключается (MiddlewareNotUsed).
+"""
+
+import logging
+import re
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+QUERY_AUDIT = getattr(settings, 'QUERY_AUDIT', settings.DEBUG)
+QUERY_AUDIT_STRICT = getattr(settings, 'QUERY_AUDIT_STRICT', False)
+# Сколько одинаковых по форме запросов за запрос считается N+1
+QUERY_AUDIT_N_PLUS_ONE = getattr(settings, 'QUERY_AUDIT_N_PLUS_ONE', 5)
+
+_PROJECT_DIR = str(Path(settings.BASE_DIR).resolve())
+# Обёртки запросов (этот модуль, метрики) в стеке источника не показываются
+_WRAPPER_FILES = {str(Path(__file__).resolve()), str(Path(__file__).with_name('metrics.py').resolve())}
+
+_IN_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+_current = ContextVar('query_audit', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше запросов, чем объявило"""
+
+
+def query_shape(sql):
+    """Форма запроса: без значений и длины списков IN"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _IN_LIST.sub('(...)', sql)
+
+
+def _origin():
+    """Кадры стека из кода проекта (представление, сериализатор), без Django и этого модуля"""
+    stack = [frame for frame in traceback.extract_stack() if frame.filename not in _WRAPPER_FILES]
+    frames = [
+        frame for frame in stack
+        if frame.filename.startswith(_PROJECT_DIR) and 'site-packages' not in frame.filename
+    ]
+    if not frames:
+        # Например, админка: последние кадры Django выше уровня БД
+        frames = [frame for frame in stack if '/django/db/' not in frame.filename][-8:]
+    return ''.join(traceback.format_list(frames))
+
+
+class QueryAudit:
+    """Запросы одного HTTP-запроса или блока audit_queries()"""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+        # Форма -> стек, с которого она стала N+1
+        self.repeated = {}
+
+    def record(self, sql):
+        self.count += 1
+        shape = query_shape(sql)
+        self.shapes[shape] += 1
+        if self.shapes[shape] == QUERY_AUDIT_N_PLUS_ONE:
+            self.repeated[shape] = _origin()
+
+    def report(self):
+        """Текст о повторяющихся запросах"""
+        return '\n'.join(
+            f'{self.shapes[shape]} раз: {shape}\n{stack}'
+            for shape, stack in sorted(self.repeated.items(), key=lambda item: -self.shapes[item[0]])
+        )
+
+
+def _audit_wrapper(execute, sql, params, many, context):
+    audit = _current.get()
+    if audit is not None:
+        audit.record(sql)
+    return execute(sql, params, many, context)
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    # В начало списка: connection.execute_wrapper() снимает свою обёртку через pop()
+    if _audit_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _audit_wrapper)
+
+
+def _instrument():
+    connection_created.connect(_instrument_connection, dispatch_uid='config.query_audit')
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(None, connection)
+
+
+def query_budget(limit):
+    """Бюджет запросов к БД для представления (функции или класса)"""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def view_budget(match):
+    """Бюджет представления из resolver_match или None"""
+    if match is None:
+        return None
+    func = match.func
+    budget = getattr(func, 'query_budget', None)
+    # Django CBV - view_class, DRF - cls
+    view_class = getattr(func, 'view_class', None) or getattr(func, 'cls', None)
+    if budget is None and view_class is not None:
+        budget = getattr(view_class, 'query_budget', None)
+    model_admin = getattr(func, 'model_admin', None)
+    if budget is None and model_admin is not None:
+        budget = getattr(model_admin, 'query_budgets', {}).get(func.__name__)
+    return budget
+
+
+@contextmanager
+def audit_queries(budget=None, label='блок'):
+    """
+    Аудит запросов внутри блока (для тестов и скриптов). При budget
+    превышение - QueryBudgetExceeded с перечнем повторяющихся запросов.
+    """
+    _instrument()
+    audit = QueryAudit()
+    token = _current.set(audit)
+    try:
+        yield audit
+    finally:
+        _current.reset(token)
+    _check(audit, budget, label, strict=True)
+
+
+def _check(audit, budget, label, strict):
+    if audit.repeated:
+        logger.warning('Похоже на N+1 в %s (%d запросов):\n%s', label, audit.count, audit.report())
+    if budget is None or audit.count <= budget:
+        return
+    message = f'{label}: {audit.count} запросов к БД при бюджете {budget}'
+    if audit.repeated:
+        message += '\n' + audit.report()
+    if strict:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def _finish(request, response, audit):
+    match = getattr(request, 'resolver_match', None)
+    budget = view_budget(match)
+    label = f'{request.method} {request.path}' + (f' ({match.view_name})' if match else '')
+    response['X-Query-Count'] = str(audit.count)
+    if budget is not None:
+        response['X-Query-Budget'] = str(budget)
+    _check(audit, budget, label, QUERY_AUDIT_STRICT)
+
+
+@sync_and_async_middleware
+def query_audit_middleware(get_response):
+    """Повторяющиеся запросы и бюджет представления (только при QUERY_AUDIT)"""
+    if not QUERY_AUDIT:
+        raise MiddlewareNotUsed()
+    _instrument()
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            audit = QueryAudit()
+            token = _current.set(audit)
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            _finish(request, response, audit)
+            return response
+    else:
+        def middleware(request):
+            audit = QueryAudit()
+            token = _current.set(audit)
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            _finish(request, response, audit)
+            return response
+    return middleware
@@ -0,0 +1,45 @@
+"""
+Общая часть поиска по документам и клиентам.
+
+Слова ищутся по колонке search_vector (tsvector, GIN), части ИНН/номеров/
+названий - через LIKE по индексам pg_trgm. Триггеры собирают вектор из
+частей разных конфигураций: тексты - russian (со стеммингом), реквизиты,
+логины, email, имена файлов - simple. Запрос разбирается обеими, и tsquery
+объединяются через ||: 'managers' находит логин managers (simple), а не
+только основу manag (russian). Выражения
+индексов совпадают с тем, что генерирует ORM: inn::text для __contains,
+UPPER(col::text) для __icontains.
+"""
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Q
+
+# Конфигурации, которыми триггеры строят части search_vector
+SEARCH_CONFIGS = ('russian', 'simple')
+# Короче трёх символов pg_trgm индекс не помогает - только полнотекстовый поиск
+TRIGRAM_MIN_LENGTH = 3
+
+
+def search_queryset(queryset, text, substring_lookups=()):
+    """
+    Фильтр по запросу text и сортировка по релевантности (ts_rank).
+    substring_lookups - lookups полей с trigram-индексом, например 'inn__contains'.
+    """
+    text = ' '.join(text.split())
+    if not text:
+        return queryset.none()
+
+    query = SearchQuery(text, config=SEARCH_CONFIGS[0], search_type='websearch')
+    for config in SEARCH_CONFIGS[1:]:
+        query |= SearchQuery(text, config=config, search_type='websearch')
+    condition = Q(search_vector=query)
+    if len(text) >= TRIGRAM_MIN_LENGTH:
+        for lookup in substring_lookups:
+            condition |= Q(**{lookup: text})
+
+    return (
+        queryset.filter(condition)
+        .defer('search_vector')
+        .annotate(rank=SearchRank(F('search_vector'), query))
+        .order_by('-rank', '-pk')
+    )
@@ -14,7 +14,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-dev-key-change-in-production'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', 'True') == 'True'
 
 ALLOWED_HOSTS = ['*']
 
@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -38,16 +39,20 @@ INSTALLED_APPS = [
     # Local apps
     'users',
     'documents',
-    'payments'
+    'payments',
+    'dashboard',
 ]
 
 MIDDLEWARE = [
+    'config.metrics.metrics_middleware',
+    'config.query_audit.query_audit_middleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.db_router.routing_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -85,6 +90,28 @@ DATABASES = {
     }
 }
 
+# Реплики основной базы для чтения: DB_REPLICA_HOSTS=replica1:5432,replica2:5432
+# (те же имя базы и учётные данные). Читают с них только блоки replica_reads()
+DATABASE_REPLICAS = {}
+for number, address in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.setdefault('default', []).append(f'replica{number}')
+
+# Основная база приложения: app_label -> alias из DATABASES (по умолчанию всё в default).
+# documents, payments и dashboard ссылаются на users.Client внешними ключами, поэтому
+# разнести их по отдельным базам нельзя, пока эти связи не заменены на id без FK
+# (это проверяется при запуске, config.E001)
+DATABASE_APPS = {}
+DATABASE_ROUTERS = ['config.db_router.DatabaseRouter']
+# Read-your-writes: сколько секунд после записи клиент читает из основной базы
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -103,6 +130,34 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Хэширование паролей: первый хэшер - основной, остальные нужны для
+# проверки старых хэшей, которые обновляются при успешном входе
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'scrypt')
+PASSWORD_HASHERS = [
+    'users.hashers.TunedScryptPasswordHasher',
+    'users.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+if PASSWORD_HASHER == 'argon2':
+    PASSWORD_HASHERS[0], PASSWORD_HASHERS[1] = PASSWORD_HASHERS[1], PASSWORD_HASHERS[0]
+elif PASSWORD_HASHER == 'pbkdf2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(2))
+
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.environ.get('PASSWORD_SCRYPT_BLOCK_SIZE', 8))
+PASSWORD_SCRYPT_PARALLELISM = int(os.environ.get('PASSWORD_SCRYPT_PARALLELISM', 1))
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 102400))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 8))
+
+# Пул процессов для хэширования: размер и лимит очереди до отказа с 503
+HASHING_WORKERS = int(os.environ.get('HASHING_WORKERS', os.cpu_count() or 1))
+HASHING_MAX_QUEUE = int(os.environ.get('HASHING_MAX_QUEUE', 64))
+
+AUTHENTICATION_BACKENDS = ['users.backends.PooledModelBackend']
+
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -115,6 +170,48 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузка документов частями: блок чтения тела запроса и предельный размер файла
+DOCUMENTS_UPLOAD_READ_SIZE = int(os.environ.get('DOCUMENTS_UPLOAD_READ_SIZE', 1024 * 1024))
+DOCUMENTS_MAX_UPLOAD_SIZE = int(os.environ.get('DOCUMENTS_MAX_UPLOAD_SIZE', 10 * 1024 ** 3))
+# Аренда сессии загрузки одним PUT (секунды); продлевается, пока данные идут
+DOCUMENTS_UPLOAD_LEASE = int(os.environ.get('DOCUMENTS_UPLOAD_LEASE', 60))
+# Незавершённые загрузки без активности дольше этого срока удаляет purge_uploads (секунды)
+DOCUMENTS_UPLOAD_SESSION_TTL = int(os.environ.get('DOCUMENTS_UPLOAD_SESSION_TTL', 7 * 24 * 3600))
+
+# Отдача документов: '' (FileResponse/sendfile), 'x-accel' (nginx) или 'x-sendfile'.
+# Для nginx: location /protected-media/blobs/ { internal; alias <MEDIA_ROOT>/blobs/; }
+DOCUMENTS_SENDFILE_MODE = os.environ.get('DOCUMENTS_SENDFILE_MODE', '')
+DOCUMENTS_ACCEL_PREFIX = os.environ.get('DOCUMENTS_ACCEL_PREFIX', '/protected-media/blobs/')
+
+# Фоновая обработка документов (manage.py process_documents)
+DOCUMENTS_JOB_CONCURRENCY = int(os.environ.get('DOCUMENTS_JOB_CONCURRENCY', os.cpu_count() or 1))
+DOCUMENTS_JOB_MAX_ATTEMPTS = int(os.environ.get('DOCUMENTS_JOB_MAX_ATTEMPTS', 5))
+DOCUMENTS_JOB_TIMEOUT = int(os.environ.get('DOCUMENTS_JOB_TIMEOUT', 600))
+DOCUMENTS_JOB_RUN_TIMEOUT = int(os.environ.get('DOCUMENTS_JOB_RUN_TIMEOUT', 300))
+DOCUMENTS_THUMBNAIL_WIDTH = int(os.environ.get('DOCUMENTS_THUMBNAIL_WIDTH', 320))
+
+# Журнал расчётов: на сколько месяцев вперёд держать готовые секции
+LEDGER_PARTITIONS_AHEAD = int(os.environ.get('LEDGER_PARTITIONS_AHEAD', 3))
+# Сколько хранится ответ на запрос с Idempotency-Key, секунд
+PAYMENTS_IDEMPOTENCY_TTL = int(os.environ.get('PAYMENTS_IDEMPOTENCY_TTL', 24 * 3600))
+# Проводок в одной транзакции при импорте выписки
+PAYMENTS_POSTING_BATCH_SIZE = int(os.environ.get('PAYMENTS_POSTING_BATCH_SIZE', 500))
+# Сверка банковских выписок со счетами
+PAYMENTS_RECONCILE_BATCH_SIZE = int(os.environ.get('PAYMENTS_RECONCILE_BATCH_SIZE', 5000))
+PAYMENTS_RECONCILE_FUZZY_THRESHOLD = float(os.environ.get('PAYMENTS_RECONCILE_FUZZY_THRESHOLD', 0.5))
+# ИНН нашей организации: её исходящие платежи в выписке не сверяются
+PAYMENTS_OWN_INN = os.environ.get('PAYMENTS_OWN_INN', '')
+
+# Сводка личного кабинета: кэш ответа (секунды) и число последних событий
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', 10))
+DASHBOARD_RECENT_LIMIT = int(os.environ.get('DASHBOARD_RECENT_LIMIT', 10))
+DASHBOARD_ROLLUP_CHECK_BATCH_SIZE = int(os.environ.get('DASHBOARD_ROLLUP_CHECK_BATCH_SIZE', 1000))
+
+# Push-события клиентам (SSE / WebSocket под ASGI, см. config.events)
+EVENTS_FLUSH_INTERVAL = float(os.environ.get('EVENTS_FLUSH_INTERVAL', 0.5))
+EVENTS_HEARTBEAT_INTERVAL = int(os.environ.get('EVENTS_HEARTBEAT_INTERVAL', 25))
+EVENTS_MAX_PENDING = int(os.environ.get('EVENTS_MAX_PENDING', 1000))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -127,14 +224,32 @@ CACHES = {
         "BACKEND": "django_redis.cache.RedisCache",
         "LOCATION": os.environ.get('REDIS_URL', 'redis://:redis123@redis:6379/0'),
         "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CLIENT_CLASS": "config.metrics.InstrumentedRedisClient",
         }
     }
 }
 
+# Метрики Prometheus (config.metrics): как часто процесс сбрасывает приращения в Redis
+# и токен для GET /metrics (пусто - без проверки, закрывайте на уровне сети)
+METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+METRICS_BUCKETS_PER_OCTAVE = 4
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Аудит SQL на запрос (config.query_audit): N+1 и бюджеты запросов представлений.
+# QUERY_AUDIT_STRICT - превышение бюджета роняет запрос (для тестов)
+QUERY_AUDIT = os.environ.get('QUERY_AUDIT', str(DEBUG)) == 'True'
+QUERY_AUDIT_STRICT = os.environ.get('QUERY_AUDIT_STRICT', 'False') == 'True'
+QUERY_AUDIT_N_PLUS_ONE = int(os.environ.get('QUERY_AUDIT_N_PLUS_ONE', 5))
+
+# Сэмплирующий профилировщик (config.profiler, /api/users/health/profile/)
+PROFILER_INTERVAL = 0.01
+PROFILER_MAX_SECONDS = 300
+PROFILER_MAX_OVERHEAD = 0.02
+PROFILER_DIR = os.environ.get('PROFILER_DIR', os.path.join(BASE_DIR, 'profiles'))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -142,6 +257,17 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Сколько доверенных прокси перед приложением: IP клиента для троттлинга - столько-то
+    # адресов с конца X-Forwarded-For. 0 - только REMOTE_ADDR (заголовок от клиента не читается)
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    # Token bucket (users.throttling): ёмкость/период, пополнение равномерное
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('THROTTLE_LOGIN_IP', '20/min'),
+        'login_username': os.environ.get('THROTTLE_LOGIN_USERNAME', '10/min'),
+        'register_ip': os.environ.get('THROTTLE_REGISTER_IP', '10/hour'),
+        'register_inn': os.environ.get('THROTTLE_REGISTER_INN', '5/hour'),
+        'public_ip': os.environ.get('THROTTLE_PUBLIC_IP', '60/min'),
+    },
 }
 # JWT Settings
 SIMPLE_JWT = {
@@ -152,8 +278,34 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_USER_CLASS': 'users.authentication.ClientTokenUser',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.RevocableTokenRefreshSerializer',
 }
 
+# Отзыв токенов: ключи Redis с EXAT + Bloom-фильтр процесса
+JWT_CHECK_ACCESS_REVOCATION = os.environ.get('JWT_CHECK_ACCESS_REVOCATION', 'True') == 'True'
+REVOCATION_BLOOM_ENABLED = os.environ.get('REVOCATION_BLOOM_ENABLED', 'True') == 'True'
+REVOCATION_BLOOM_CAPACITY = int(os.environ.get('REVOCATION_BLOOM_CAPACITY', 1_000_000))
+REVOCATION_SYNC_INTERVAL = float(os.environ.get('REVOCATION_SYNC_INTERVAL', 1))
+
+# Кэш изменяемого состояния клиента для JWT без запроса к БД
+CLIENT_STATE_CACHE_TIMEOUT = int(os.environ.get('CLIENT_STATE_CACHE_TIMEOUT', 300))
+CLIENT_STATE_LOCAL_TTL = int(os.environ.get('CLIENT_STATE_LOCAL_TTL', 5))
+
+# Кэш сериализованного профиля клиента (инвалидируется версией ключа)
+PROFILE_CACHE_TIMEOUT = int(os.environ.get('PROFILE_CACHE_TIMEOUT', 300))
+
+# Пакетная запись Client.last_activity: максимальная задержка в секундах
+ACTIVITY_FLUSH_INTERVAL = int(os.environ.get('ACTIVITY_FLUSH_INTERVAL', 30))
+ACTIVITY_FLUSH_BATCH_SIZE = int(os.environ.get('ACTIVITY_FLUSH_BATCH_SIZE', 1000))
+
+# Health check: таймаут на зависимость и период пересчёта статистики клиентов
+HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', 2))
+CLIENT_STATS_TTL = int(os.environ.get('CLIENT_STATS_TTL', 60))
+
+# Массовый импорт клиентов
+CLIENT_IMPORT_BATCH_SIZE = int(os.environ.get('CLIENT_IMPORT_BATCH_SIZE', 2000))
+
 # CORS Settings (разрешаем React доступ)
 CORS_ALLOW_ALL_ORIGINS = True  # Только для разработки!
 CORS_ALLOW_CREDENTIALS = True
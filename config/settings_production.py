@@ -0,0 +1,73 @@
+"""
+Профиль настроек для продакшена: DJANGO_SETTINGS_MODULE=config.settings_production.
+
+Всё как в config.settings, кроме того, что мешает под нагрузкой:
+- DEBUG выключен: Django не копит SQL каждого запроса в connection.queries,
+  аудит запросов (QUERY_AUDIT) по умолчанию тоже выключен;
+- постоянные подключения к БД (CONN_MAX_AGE) с проверкой перед запросом
+  (CONN_HEALTH_CHECKS) - без нового подключения на каждый запрос;
+- кэширующий загрузчик шаблонов задан явно;
+- статика собирается collectstatic и отдаётся WhiteNoise (сжатая, с хэшем
+  в имени и долгим кэшированием), пока перед приложением нет nginx;
+- SECRET_KEY, ALLOWED_HOSTS и METRICS_TOKEN обязательны: без них процесс не
+  стартует, а не работает с ключом из репозитория и открытым /metrics.
+
+Сервер приложений - gunicorn с config/gunicorn.conf.py.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, MIDDLEWARE, SIMPLE_JWT, TEMPLATES
+
+
+def _required(name):
+    value = os.environ.get(name, '')
+    if not value:
+        raise ImproperlyConfigured(f'{name} обязателен в config.settings_production')
+    return value
+
+
+DEBUG = False
+
+# Ключ из config.settings лежит в репозитории: им подписываются JWT, с ним токен подделает кто угодно
+SECRET_KEY = _required('SECRET_KEY')
+SIMPLE_JWT = {**SIMPLE_JWT, 'SIGNING_KEY': SECRET_KEY}
+ALLOWED_HOSTS = _required('ALLOWED_HOSTS').split(',')
+METRICS_TOKEN = _required('METRICS_TOKEN')
+
+# Подключение живёт DB_CONN_MAX_AGE секунд и переиспользуется запросами потока.
+# Подключений к PostgreSQL столько, сколько потоков во всех воркерах (workers * threads)
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+    database['CONN_HEALTH_CHECKS'] = True
+
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+# Сразу после SecurityMiddleware: статика отдаётся до сессий и аутентификации
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE.insert(
+    MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1, 'whitenoise.middleware.WhiteNoiseMiddleware',
+)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+
+QUERY_AUDIT = os.environ.get('QUERY_AUDIT', 'False') == 'True'
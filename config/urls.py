@@ -1,13 +1,16 @@
 from django.utils import timezone
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny  # Добавьте эту строку!
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework import permissions
 
+from config.metrics import metrics_view
+from users.throttling import PublicIPThrottle
+
 # Swagger схема
 schema_view = get_schema_view(
     openapi.Info(
@@ -35,11 +38,13 @@ def api_root(request):
             'users': '/api/users/',
             'documents': '/api/documents/',
             'payments': '/api/payments/',
+            'dashboard': '/api/dashboard/',
         }
     })
 
 @api_view(['POST'])
 @permission_classes([AllowAny])  # Добавьте эту строку!
+@throttle_classes([PublicIPThrottle])
 def test_api(request):
     return Response({
         'success': True,
@@ -58,4 +63,6 @@ urlpatterns = [
     path('api/users/', include('users.urls')),
     path('api/documents/', include('documents.urls')),
     path('api/payments/', include('payments.urls')),
+    path('api/dashboard/', include('dashboard.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
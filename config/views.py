@@ -13,7 +13,7 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login
 from django.contrib import messages
 from users.models import Client
-from django.contrib.auth.hashers import make_password
+from users.hashing import hashing_service
 
 def register_view(request):
     """Регистрация нового пользователя"""
@@ -50,7 +50,7 @@ def register_view(request):
             user = Client.objects.create(
                 username=username,
                 email=email,
-                password=make_password(password),
+                password=hashing_service.make_password(password),
                 inn=inn,
                 company_name=company_name,
                 legal_address=legal_address,
@@ -76,5 +76,7 @@ def profile_view(request):
 
 @login_required
 def dashboard_view(request):
-    """Личный кабинет"""
-    return render(request, 'dashboard.html', {'user': request.user})
+    """Личный кабинет; цифры - из сводок (dashboard.rollups), а не подсчётом по таблицам"""
+    from dashboard.rollups import get_dashboard
+
+    return render(request, 'dashboard.html', {'user': request.user, 'summary': get_dashboard(request.user.pk)})
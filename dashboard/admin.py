@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from .models import ClientRollup
+
+
+@admin.register(ClientRollup)
+class ClientRollupAdmin(admin.ModelAdmin):
+    """Сводки только для просмотра: исправляются через manage.py check_rollups --fix"""
+    list_display = ('client', 'documents_total', 'documents_processing', 'documents_failed',
+                    'invoices_open', 'invoices_outstanding', 'updated_at')
+    list_select_related = ('client',)
+    raw_id_fields = ('client',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,49 @@
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.rollups import check_rollups
+from users.models import Client
+
+ROLLUP_CHECK_BATCH_SIZE = getattr(settings, 'DASHBOARD_ROLLUP_CHECK_BATCH_SIZE', 1000)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверка сводок кабинета с документами и счетами. Без --fix только отчёт '
+        '(и ненулевой код выхода при расхождениях); с --fix сводки пересчитываются '
+        'из исходных таблиц под блокировкой строк сводок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Перезаписать расходящиеся сводки')
+        parser.add_argument('--client', type=int, action='append', help='Только этот клиент (можно несколько раз)')
+        parser.add_argument('--batch-size', type=int, default=ROLLUP_CHECK_BATCH_SIZE)
+        parser.add_argument('--show', type=int, default=10, help='Сколько расхождений вывести')
+
+    def handle(self, *args, **options):
+        if options['client']:
+            client_ids = iter(options['client'])
+        else:
+            client_ids = Client.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=options['batch_size'])
+
+        checked = mismatched = 0
+        while True:
+            batch = list(islice(client_ids, options['batch_size']))
+            if not batch:
+                break
+            mismatches = check_rollups(batch, fix=options['fix'])
+            for client_id, diff in mismatches.items():
+                if mismatched < options['show']:
+                    details = ', '.join(f'{name}: {stored} -> {actual}' for name, (stored, actual) in diff.items())
+                    self.stdout.write(f'клиент {client_id}: {details}')
+                mismatched += 1
+            checked += len(batch)
+
+        summary = f'Проверено клиентов: {checked}, расхождений: {mismatched}'
+        if options['fix'] and mismatched:
+            summary += ' (исправлено)'
+        self.stdout.write(summary)
+        if mismatched and not options['fix']:
+            raise CommandError('Сводки расходятся с данными: запустите с --fix')
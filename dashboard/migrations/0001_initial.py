@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-18 13:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('users', '0003_client_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientRollup',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Клиент')),
+                ('documents_total', models.IntegerField(default=0, verbose_name='Документов')),
+                ('documents_processing', models.IntegerField(default=0, verbose_name='В обработке')),
+                ('documents_ready', models.IntegerField(default=0, verbose_name='Обработано')),
+                ('documents_failed', models.IntegerField(default=0, verbose_name='Ошибка обработки')),
+                ('invoices_open', models.IntegerField(default=0, verbose_name='Открытых счетов')),
+                ('invoices_outstanding', models.BigIntegerField(default=0, verbose_name='К оплате по счетам, коп.')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Сводка клиента',
+                'verbose_name_plural': 'Сводки клиентов',
+            },
+        ),
+    ]
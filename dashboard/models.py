@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class ClientRollup(models.Model):
+    """
+    Сводка личного кабинета клиента: документы по состоянию обработки и
+    открытые счета. Счётчики меняются на приращения в момент записи
+    документа или проводки, поэтому кабинет читает одну строку вместо
+    COUNT/SUM по документам и счетам. Расхождения с исходными таблицами
+    исправляет manage.py check_rollups --fix.
+    """
+
+    client = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_('Клиент'),
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rollup',
+    )
+    # Не PositiveIntegerField: при гонке счётчик может ненадолго уйти в минус,
+    # запись документа или проводки из-за этого падать не должна
+    documents_total = models.IntegerField(_('Документов'), default=0)
+    documents_processing = models.IntegerField(_('В обработке'), default=0)
+    documents_ready = models.IntegerField(_('Обработано'), default=0)
+    documents_failed = models.IntegerField(_('Ошибка обработки'), default=0)
+    invoices_open = models.IntegerField(_('Открытых счетов'), default=0)
+    invoices_outstanding = models.BigIntegerField(_('К оплате по счетам, коп.'), default=0)
+    updated_at = models.DateTimeField(_('Дата изменения'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Сводка клиента')
+        verbose_name_plural = _('Сводки клиентов')
+
+    def __str__(self):
+        return str(self.client_id)
@@ -0,0 +1,265 @@
+"""
+Сводки личного кабинета: инкрементальное обновление, чтение с кэшем и
+сверка с исходными таблицами.
+
+Счётчики ClientRollup меняются на приращения там, где меняются данные:
+- загрузка документа (documents.uploads.finalize) и завершение задачи
+  обработки его файла (documents.jobs.Worker);
+- проводки журнала (payments.ledger.post_entries): выставленный счёт
+  открывает задолженность, оплата по счёту её уменьшает и закрывает счёт.
+
+Приращения пишутся в транзакции вызывающего кода; строки сводок
+блокируются в порядке client_id, как балансы в payments.ledger.
+Записи в обход этих функций (bulk_create счетов, удаление документа
+в админке) сводку не меняют - расхождение находит и исправляет
+manage.py check_rollups.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Concat, Greatest
+from django.utils import timezone
+
+from config.db_router import replica_reads
+from documents.models import Document, ProcessingJob
+from payments.models import Invoice, LedgerEntry
+
+from .models import ClientRollup
+
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 10)
+DASHBOARD_RECENT_LIMIT = getattr(settings, 'DASHBOARD_RECENT_LIMIT', 10)
+
+ROLLUP_COUNTERS = (
+    'documents_total',
+    'documents_processing',
+    'documents_ready',
+    'documents_failed',
+    'invoices_open',
+    'invoices_outstanding',
+)
+
+# Статус задачи обработки файла -> счётчик документа (None - задачи ещё нет)
+DOCUMENT_STATUS_COUNTERS = {
+    None: 'documents_processing',
+    'queued': 'documents_processing',
+    'running': 'documents_processing',
+    'done': 'documents_ready',
+    'failed': 'documents_failed',
+}
+
+
+def _lock_rollups(client_ids):
+    ClientRollup.objects.bulk_create(
+        [ClientRollup(client_id=client_id) for client_id in client_ids],
+        ignore_conflicts=True,
+    )
+    return {
+        rollup.client_id: rollup
+        for rollup in ClientRollup.objects.select_for_update().filter(client_id__in=client_ids).order_by('client_id')
+    }
+
+
+def _write_increments(rows, now):
+    placeholder = '(%s::bigint' + ', %s::bigint' * len(ROLLUP_COUNTERS) + ')'
+    assignments = ', '.join(f'{name} = r.{name} + v.{name}' for name in ROLLUP_COUNTERS)
+    sql = (
+        f'UPDATE dashboard_clientrollup AS r SET {assignments}, updated_at = %s '
+        f'FROM (VALUES {{values}}) AS v(client_id, {", ".join(ROLLUP_COUNTERS)}) '
+        'WHERE r.client_id = v.client_id'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(values=', '.join([placeholder] * len(rows))), [now] + [p for row in rows for p in row])
+
+
+def apply_deltas(deltas):
+    """
+    Приращения счётчиков: {client_id: {счётчик: приращение}}.
+    Один UPDATE ... FROM (VALUES ...) на всю пачку клиентов.
+    """
+    rows = [
+        (client_id, *(delta.get(name, 0) for name in ROLLUP_COUNTERS))
+        for client_id, delta in sorted(deltas.items())
+        if any(delta.values())
+    ]
+    if not rows:
+        return
+    with transaction.atomic():
+        _lock_rollups([row[0] for row in rows])
+        _write_increments(rows, timezone.now())
+
+
+def document_added(owner_id, job_status):
+    """Новый документ; job_status - статус задачи обработки его файла"""
+    apply_deltas({owner_id: {'documents_total': 1, DOCUMENT_STATUS_COUNTERS[job_status]: 1}})
+
+
+def blob_processed(blob_id, job_status):
+    """Задача обработки файла завершилась: документы с этим файлом выходят из обработки"""
+    counter = DOCUMENT_STATUS_COUNTERS[job_status]
+    owners = (
+        Document.objects.filter(blob_id=blob_id)
+        .values('owner_id').annotate(count=Count('id')).order_by()
+    )
+    apply_deltas({
+        row['owner_id']: {'documents_processing': -row['count'], counter: row['count']}
+        for row in owners
+    })
+
+
+def blob_requeued(blob_id, exclude=None):
+    """Упавшая обработка файла поставлена заново: его документы снова в обработке"""
+    owners = (
+        Document.objects.filter(blob_id=blob_id).exclude(pk=exclude)
+        .values('owner_id').annotate(count=Count('id')).order_by()
+    )
+    apply_deltas({
+        row['owner_id']: {
+            DOCUMENT_STATUS_COUNTERS['failed']: -row['count'],
+            DOCUMENT_STATUS_COUNTERS['queued']: row['count'],
+        }
+        for row in owners
+    })
+
+
+def compute_rollups(client_ids):
+    """Сводки по исходным таблицам: {client_id: {счётчик: значение}}"""
+    from documents.jobs import PROCESS_BLOB
+
+    result = {client_id: dict.fromkeys(ROLLUP_COUNTERS, 0) for client_id in client_ids}
+
+    job_status = ProcessingJob.objects.filter(
+        key=Concat(Value(f'{PROCESS_BLOB}:'), OuterRef('blob__sha256')),
+    ).values('status')[:1]
+    documents = (
+        Document.objects.filter(owner_id__in=client_ids)
+        .annotate(job_status=Subquery(job_status))
+        .values('owner_id', 'job_status').annotate(count=Count('id')).order_by()
+    )
+    for row in documents:
+        counters = result[row['owner_id']]
+        counters['documents_total'] += row['count']
+        counters[DOCUMENT_STATUS_COUNTERS.get(row['job_status'], 'documents_processing')] += row['count']
+
+    invoices = (
+        Invoice.objects.filter(client_id__in=client_ids, status='open')
+        .values('client_id')
+        .annotate(
+            count=Count('id'),
+            outstanding=Sum(Greatest(F('amount') - F('paid_amount'), Value(0), output_field=BigIntegerField())),
+        )
+        .order_by()
+    )
+    for row in invoices:
+        result[row['client_id']]['invoices_open'] = row['count']
+        result[row['client_id']]['invoices_outstanding'] = row['outstanding'] or 0
+    return result
+
+
+def check_rollups(client_ids, fix=False):
+    """
+    Сверка сводок клиентов с исходными таблицами:
+    {client_id: {счётчик: (в сводке, по данным)}} для расходящихся.
+    fix=True - расхождения перезаписываются; строки сводок на время
+    пересчёта заблокированы, параллельные приращения его дождутся.
+    """
+    client_ids = sorted(set(client_ids))
+    with transaction.atomic():
+        if fix:
+            stored = _lock_rollups(client_ids)
+        else:
+            stored = {rollup.client_id: rollup for rollup in ClientRollup.objects.filter(client_id__in=client_ids)}
+        expected = compute_rollups(client_ids)
+
+        mismatches, changed = {}, []
+        for client_id, values in expected.items():
+            rollup = stored.get(client_id) or ClientRollup(client_id=client_id)
+            diff = {
+                name: (getattr(rollup, name), value)
+                for name, value in values.items()
+                if getattr(rollup, name) != value
+            }
+            if not diff:
+                continue
+            mismatches[client_id] = diff
+            for name, (_, value) in diff.items():
+                setattr(rollup, name, value)
+            changed.append(rollup)
+
+        if fix and changed:
+            now = timezone.now()
+            for rollup in changed:
+                rollup.updated_at = now
+            ClientRollup.objects.bulk_update(changed, [*ROLLUP_COUNTERS, 'updated_at'])
+    return mismatches
+
+
+def _dashboard_key(client_id):
+    return f'dashboard:{client_id}'
+
+
+def recent_activity(client_id, limit=DASHBOARD_RECENT_LIMIT):
+    """
+    Последние документы и проводки клиента вперемешку, новые первыми.
+    Оба запроса - LIMIT по индексам (owner, created_at) и (client, created_at, id).
+    """
+    documents = (
+        Document.objects.filter(owner_id=client_id)
+        .order_by('-created_at').values('id', 'title', 'created_at')[:limit]
+    )
+    entries = (
+        LedgerEntry.objects.filter(client_id=client_id)
+        .order_by('-created_at', '-id').values('id', 'kind', 'amount', 'reference', 'created_at')[:limit]
+    )
+    kinds = dict(LedgerEntry.KIND_CHOICES)
+    events = [
+        {'type': 'document', 'label': 'Документ', 'id': row['id'], 'title': row['title'], 'at': row['created_at']}
+        for row in documents
+    ] + [
+        {
+            'type': row['kind'], 'label': str(kinds[row['kind']]), 'id': row['id'],
+            'amount': row['amount'], 'reference': row['reference'], 'at': row['created_at'],
+        }
+        for row in entries
+    ]
+    events.sort(key=lambda event: event['at'], reverse=True)
+    return events[:limit]
+
+
+@replica_reads()
+def build_dashboard(client_id):
+    """Данные кабинета читаются с реплики, сразу после записи клиента - из основной базы"""
+    from payments.ledger import get_balance
+
+    rollup = ClientRollup.objects.filter(client_id=client_id).first() or ClientRollup(client_id=client_id)
+    balance = get_balance(client_id)
+    return {
+        'client': client_id,
+        'documents': {
+            'total': rollup.documents_total,
+            'processing': rollup.documents_processing,
+            'ready': rollup.documents_ready,
+            'failed': rollup.documents_failed,
+        },
+        'invoices': {
+            'open': rollup.invoices_open,
+            'outstanding': rollup.invoices_outstanding,
+        },
+        'balance': balance.balance,
+        'recent_activity': recent_activity(client_id),
+        'generated_at': timezone.now(),
+    }
+
+
+def get_dashboard(client_id):
+    """
+    Данные кабинета из кэша (DASHBOARD_CACHE_TIMEOUT секунд) или из сводок.
+    Кэш не сбрасывается при записи: цифры кабинета отстают не больше чем на таймаут.
+    """
+    key = _dashboard_key(client_id)
+    data = cache.get(key)
+    if data is None:
+        data = build_dashboard(client_id)
+        cache.set(key, data, DASHBOARD_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,15 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def rubles(kopecks):
+    """Сумма в копейках -> '1 234,56' (widthratio округлял до целых рублей)"""
+    try:
+        kopecks = int(kopecks)
+    except (TypeError, ValueError):
+        return ''
+    sign = '-' if kopecks < 0 else ''
+    whole, cents = divmod(abs(kopecks), 100)
+    return f"{sign}{whole:,}".replace(',', '\xa0') + f',{cents:02d}'
@@ -0,0 +1,17 @@
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+
+class RublesFilterTests(SimpleTestCase):
+
+    def render(self, amount):
+        return Template('{% load money %}{{ amount|rubles }}').render(Context({'amount': amount}))
+
+    def test_keeps_kopecks(self):
+        self.assertEqual(self.render(150), '1,50')
+        self.assertEqual(self.render(5), '0,05')
+        self.assertEqual(self.render(123456789), '1\xa0234\xa0567,89')
+
+    def test_negative_and_empty(self):
+        self.assertEqual(self.render(-123456), '-1\xa0234,56')
+        self.assertEqual(self.render(None), '')
@@ -0,0 +1,20 @@
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from payments.views import requested_client_id
+
+from .rollups import get_dashboard
+
+
+class DashboardView(APIView):
+    """
+    Сводка личного кабинета: документы по состоянию обработки, открытые
+    счета и сумма к оплате (копейки), баланс, последние события.
+    Читается из сводок ClientRollup и кэшируется на DASHBOARD_CACHE_TIMEOUT
+    секунд. Администратор может указать клиента через ?client=.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(get_dashboard(requested_client_id(request)))
@@ -1,3 +1,39 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Document, ProcessingJob, StoredBlob, UploadSession
+from .search import search_documents
+
+
+@admin.register(Document)
+class DocumentAdmin(admin.ModelAdmin):
+    list_display = ('title', 'contract_number', 'counterparty_name', 'owner', 'content_type', 'created_at')
+    list_select_related = ('owner',)
+    search_fields = ('title', 'contract_number', 'counterparty_inn', 'counterparty_name')
+    raw_id_fields = ('owner', 'blob')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_documents(queryset, search_term), False
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'size', 'created_at')
+    search_fields = ('sha256',)
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'owner', 'size', 'offset', 'status', 'updated_at')
+    list_filter = ('status',)
+    list_select_related = ('owner',)
+    raw_id_fields = ('owner', 'document')
+
+
+@admin.register(ProcessingJob)
+class ProcessingJobAdmin(admin.ModelAdmin):
+    list_display = ('key', 'kind', 'status', 'attempts', 'run_after', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('key',)
+    readonly_fields = ('timings', 'last_error')
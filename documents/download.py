@@ -0,0 +1,154 @@
+"""
+Отдача файлов документов без чтения их в память Python.
+
+Режимы (DOCUMENTS_SENDFILE_MODE):
+  ''           - FileResponse; под gunicorn файл уходит через os.sendfile,
+                 в том числе для диапазонов (Range)
+  'x-accel'    - заголовок X-Accel-Redirect, байты отдаёт nginx из internal
+                 location DOCUMENTS_ACCEL_PREFIX (Range и кэш - на стороне nginx)
+  'x-sendfile' - заголовок X-Sendfile для Apache/lighttpd
+Права и JWT проверяет Django, до передачи файла прокси.
+"""
+
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_etags
+
+from .storage import BLOB_ROOT, thumbnail_path
+
+SENDFILE_MODE = getattr(settings, 'DOCUMENTS_SENDFILE_MODE', '')
+ACCEL_PREFIX = getattr(settings, 'DOCUMENTS_ACCEL_PREFIX', '/protected-media/blobs/')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """
+    Один диапазон из заголовка Range -> (start, end) включительно.
+    None - заголовка нет или он не поддерживается (отдаём файл целиком),
+    ValueError - диапазон за пределами файла (416).
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Несколько диапазонов или другие единицы - по RFC можно отдать весь файл
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+class RangeFile:
+    """
+    Файл, открытый на позиции start, который отдаёт не больше length байт.
+    fileno() проброшен, поэтому gunicorn отправляет диапазон через sendfile
+    (от текущей позиции, на Content-Length байт); read() нужен остальным серверам.
+    """
+
+    def __init__(self, f, start, length):
+        f.seek(start)
+        self.file = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _disposition(document, as_attachment):
+    return content_disposition_header(as_attachment, document.filename)
+
+
+def _proxy_response(document, blob, as_attachment):
+    response = HttpResponse(content_type=document.content_type)
+    if SENDFILE_MODE == 'x-accel':
+        relative = os.path.relpath(blob.path, BLOB_ROOT)
+        response['X-Accel-Redirect'] = ACCEL_PREFIX + relative.replace(os.sep, '/')
+    else:
+        response['X-Sendfile'] = blob.path
+    response['Content-Disposition'] = _disposition(document, as_attachment)
+    return response
+
+
+def download_response(request, document, as_attachment=False):
+    blob = document.blob
+    etag = f'"{blob.sha256}"'
+    last_modified = blob.created_at.timestamp()
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if SENDFILE_MODE in ('x-accel', 'x-sendfile'):
+            response = _proxy_response(document, blob, as_attachment)
+        else:
+            response = _file_response(request, document, blob, etag, as_attachment)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _file_response(request, document, blob, etag, as_attachment):
+    size = blob.size
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    # If-Range: диапазон только если у клиента та же версия файла
+    if not if_range or etag in parse_etags(if_range):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    f = open(blob.path, 'rb')
+    if byte_range is None:
+        response = FileResponse(f, content_type=document.content_type)
+        response['Content-Length'] = str(size)
+    else:
+        start, end = byte_range
+        response = FileResponse(RangeFile(f, start, end - start + 1), status=206, content_type=document.content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = _disposition(document, as_attachment)
+    return response
+
+
+def thumbnail_response(request, document):
+    """Миниатюра первой страницы (появляется после фоновой обработки)"""
+    path = thumbnail_path(document.blob.sha256)
+    etag = f'"{document.blob.sha256}-thumb"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            response = FileResponse(open(path, 'rb'), content_type='image/png')
+        except FileNotFoundError:
+            raise Http404('Миниатюра ещё не готова')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
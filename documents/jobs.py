@@ -0,0 +1,366 @@
+"""
+Очередь фоновой обработки документов и её воркер.
+
+Очередь - таблица ProcessingJob: задачи забираются
+SELECT ... FOR UPDATE SKIP LOCKED, поэтому воркеров может быть несколько
+и они не мешают друг другу. Тяжёлая работа (хэш, текст, миниатюра)
+выполняется в пуле процессов, результаты в БД пишет главный процесс.
+
+Задачу, которая висит в running дольше JOB_TIMEOUT, забирает другой воркер,
+хотя прежний может ещё работать. Поэтому статус меняет только тот, кто
+задачу держит (locked_by и номер попытки), а запись результата и статус
+done - одна транзакция: опоздавший воркер откатывает свой результат и не
+трогает сводки.
+
+Сам воркер ждёт задачу в пуле не дольше JOB_RUN_TIMEOUT (меньше
+JOB_TIMEOUT): зависшая (PyMuPDF на битом PDF) считается неудачной
+попыткой, а пул, когда в нём остались только зависшие процессы, убивается и
+пересоздаётся. Брошенную задачу, у которой попытки кончились, claim не
+берёт снова, а помечает failed - «ядовитый» файл не съедает пулы всех
+воркеров по очереди.
+"""
+
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from config.events import make_event, publish
+from dashboard.rollups import blob_processed, blob_requeued
+
+from . import processing
+from .models import Document, ProcessingJob, StoredBlob
+from .storage import thumbnail_path
+
+logger = logging.getLogger(__name__)
+
+JOB_CONCURRENCY = getattr(settings, 'DOCUMENTS_JOB_CONCURRENCY', os.cpu_count() or 1)
+JOB_MAX_ATTEMPTS = getattr(settings, 'DOCUMENTS_JOB_MAX_ATTEMPTS', 5)
+# Задача в статусе running дольше этого времени считается брошенной (воркер упал)
+JOB_TIMEOUT = getattr(settings, 'DOCUMENTS_JOB_TIMEOUT', 600)
+# Сколько задача может выполняться в пуле; меньше JOB_TIMEOUT, чтобы воркер успел сам
+JOB_RUN_TIMEOUT = getattr(settings, 'DOCUMENTS_JOB_RUN_TIMEOUT', JOB_TIMEOUT // 2)
+JOB_POLL_INTERVAL = getattr(settings, 'DOCUMENTS_JOB_POLL_INTERVAL', 1.0)
+# Задержка перед повтором: JOB_RETRY_DELAY * 2 ** (попытка - 1) секунд
+JOB_RETRY_DELAY = getattr(settings, 'DOCUMENTS_JOB_RETRY_DELAY', 10)
+THUMBNAIL_WIDTH = getattr(settings, 'DOCUMENTS_THUMBNAIL_WIDTH', 320)
+MAX_TEXT_CHARS = getattr(settings, 'DOCUMENTS_MAX_TEXT_CHARS', 1_000_000)
+
+PROCESS_BLOB = 'process_blob'
+
+# Состояние документа для клиента по статусу задачи обработки его файла
+DOCUMENT_STATES = {
+    None: 'processing',
+    'queued': 'processing',
+    'running': 'processing',
+    'done': 'ready',
+    'failed': 'failed',
+}
+
+
+def enqueue(kind, key, payload):
+    """
+    Поставить задачу. Повторная постановка с тем же key ничего не делает,
+    кроме упавшей (failed) задачи: она ставится заново с нуля попыток.
+    Возвращает True, если упавшая задача поставлена заново.
+    """
+    ProcessingJob.objects.bulk_create(
+        [ProcessingJob(key=key, kind=kind, payload=payload)],
+        ignore_conflicts=True,
+    )
+    return bool(ProcessingJob.objects.filter(key=key, status='failed').update(
+        status='queued', payload=payload, attempts=0, run_after=timezone.now(),
+        locked_at=None, locked_by='', last_error='', finished_at=None,
+    ))
+
+
+def publish_document_states(documents, job_status):
+    """Push-события о состоянии документов; documents - словари с id, owner_id и др. полями"""
+    events = {}
+    for document in documents:
+        data = {**document, 'status': DOCUMENT_STATES[job_status]}
+        owner_id = data.pop('owner_id')
+        events.setdefault(owner_id, []).append(make_event('document', data, key=f"document:{data['id']}"))
+    publish(events)
+
+
+def blob_job_key(blob):
+    # Обработка зависит только от содержимого - одна задача на файл хранилища
+    return f'{PROCESS_BLOB}:{blob.sha256}'
+
+
+def enqueue_document(document):
+    """
+    Обработка нового документа. Если такой файл уже обработан - берём готовый текст,
+    если его обработка упала - пробуем снова. Возвращает статус задачи обработки файла.
+    """
+    key = blob_job_key(document.blob)
+    if enqueue(PROCESS_BLOB, key, {'blob_id': document.blob_id}):
+        # Файл загрузили снова - прежние документы с ним тоже возвращаются в обработку
+        others = Document.objects.filter(blob_id=document.blob_id).exclude(pk=document.pk)
+        blob_requeued(document.blob_id, exclude=document.pk)
+        publish_document_states(others.values('id', 'owner_id'), 'queued')
+
+    job_status = ProcessingJob.objects.filter(key=key).values_list('status', flat=True).first()
+    if job_status == 'done':
+        text = (
+            Document.objects.filter(blob_id=document.blob_id)
+            .exclude(pk=document.pk).exclude(text='')
+            .values_list('text', flat=True).first()
+        )
+        if text:
+            Document.objects.filter(pk=document.pk).update(text=text)
+    return job_status
+
+
+def prepare_process_blob(job):
+    """Параметры для процесса пула (без обращений к БД внутри пула)"""
+    blob = StoredBlob.objects.get(pk=job.payload['blob_id'])
+    document = Document.objects.filter(blob=blob).only('filename', 'content_type').first()
+    return {
+        'path': blob.path,
+        'sha256': blob.sha256,
+        'filename': document.filename if document else '',
+        'content_type': document.content_type if document else '',
+        'thumbnail_path': thumbnail_path(blob.sha256),
+        'thumbnail_width': THUMBNAIL_WIDTH,
+        'max_text_chars': MAX_TEXT_CHARS,
+    }
+
+
+def apply_process_blob(job, result):
+    # search_vector пересчитает триггер
+    if result['text']:
+        Document.objects.filter(blob_id=job.payload['blob_id']).update(text=result['text'])
+
+
+# kind -> (подготовка в главном процессе, работа в пуле, запись результата)
+HANDLERS = {
+    PROCESS_BLOB: (prepare_process_blob, processing.process_blob, apply_process_blob),
+}
+
+
+def _ms(delta):
+    return round(delta.total_seconds() * 1000, 2)
+
+
+class JobLost(Exception):
+    """Задачу забрал другой воркер (таймаут), результат этого воркера не нужен"""
+
+
+class Worker:
+    """Воркер очереди: забирает задачи пачками по числу свободных процессов пула"""
+
+    def __init__(self, concurrency=JOB_CONCURRENCY, poll_interval=JOB_POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.pool = None
+        self.pool_broken = False
+        self.stopping = False
+        self.processed = 0
+        self.failed = 0
+
+    def _new_pool(self):
+        # forkserver: дочерние процессы не наследуют соединение с БД
+        return ProcessPoolExecutor(
+            max_workers=self.concurrency,
+            mp_context=multiprocessing.get_context('forkserver'),
+        )
+
+    def claim(self, limit):
+        now = timezone.now()
+        abandoned = now - timedelta(seconds=JOB_TIMEOUT)
+        with transaction.atomic():
+            candidates = list(
+                ProcessingJob.objects.select_for_update(skip_locked=True)
+                .filter(Q(status='queued', run_after__lte=now) | Q(status='running', locked_at__lt=abandoned))
+                .order_by('run_after', 'id')[:limit]
+            )
+            # Брошенная на последней попытке: воркер, который её держал, умер или завис на ней
+            exhausted = [job for job in candidates if job.attempts >= JOB_MAX_ATTEMPTS]
+            jobs = [job for job in candidates if job.attempts < JOB_MAX_ATTEMPTS]
+            if exhausted:
+                ProcessingJob.objects.filter(pk__in=[job.pk for job in exhausted]).update(
+                    status='failed', finished_at=now,
+                    last_error=f'Задача не завершилась за {JOB_MAX_ATTEMPTS} попыток (воркер упал или завис)',
+                )
+            if jobs:
+                ProcessingJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                    status='running', locked_at=now, locked_by=self.worker_id, attempts=F('attempts') + 1,
+                )
+        for job in exhausted:
+            logger.warning('Задача %s: попытки кончились, помечена failed', job.key)
+            self.failed += 1
+            self.finished(job, 'failed')
+        for job in jobs:
+            job.status, job.locked_at, job.attempts = 'running', now, job.attempts + 1
+        return jobs
+
+    def _owned(self, job):
+        # Задача всё ещё наша: её не забрали по таймауту после нашей попытки
+        return ProcessingJob.objects.filter(
+            pk=job.pk, status='running', locked_by=self.worker_id, attempts=job.attempts,
+        )
+
+    def dispatch(self, job, running):
+        try:
+            prepare, work, _ = HANDLERS[job.kind]
+            payload = prepare(job)
+        except Exception:
+            self.retry_or_fail(job, traceback.format_exc())
+            return
+        running[self.pool.submit(work, payload)] = (job, time.perf_counter())
+
+    def complete(self, job, future, submitted):
+        try:
+            result, timings = future.result()
+        except BrokenProcessPool:
+            # Процесс пула упал (например, OOM на битом PDF) - пул пересоздаётся
+            self.pool_broken = True
+            self.retry_or_fail(job, traceback.format_exc())
+            return
+        except Exception:
+            self.retry_or_fail(job, traceback.format_exc())
+            return
+
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                _, _, apply = HANDLERS[job.kind]
+                apply(job, result)
+                timings['apply'] = round((time.perf_counter() - started) * 1000, 2)
+
+                now = timezone.now()
+                timings['queue'] = _ms(job.locked_at - job.run_after)
+                timings['pool'] = round((time.perf_counter() - submitted) * 1000, 2)
+                timings['total'] = _ms(now - job.created_at)
+                if not self._owned(job).update(status='done', timings=timings, finished_at=now, last_error=''):
+                    raise JobLost()
+        except JobLost:
+            logger.warning('Задача %s, попытка %s: забрана другим воркером, результат отброшен', job.key, job.attempts)
+            return
+        except Exception:
+            self.retry_or_fail(job, traceback.format_exc())
+            return
+        self.processed += 1
+        self.finished(job, 'done')
+
+    def finished(self, job, status):
+        # Документы с этим файлом выходят из "в обработке": сводки кабинета и push владельцам
+        if job.kind != PROCESS_BLOB:
+            return
+        try:
+            blob_processed(job.payload['blob_id'], status)
+            publish_document_states(
+                Document.objects.filter(blob_id=job.payload['blob_id']).values('id', 'owner_id'), status,
+            )
+        except Exception as e:
+            logger.warning('Не удалось обновить сводки по задаче %s: %s', job.key, e)
+
+    def retry_or_fail(self, job, error):
+        logger.warning('Задача %s, попытка %s: %s', job.key, job.attempts, error.strip().splitlines()[-1])
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            if self._owned(job).update(status='failed', last_error=error, finished_at=timezone.now()):
+                self.failed += 1
+                self.finished(job, 'failed')
+            return
+        delay = JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        self._owned(job).update(
+            status='queued', last_error=error, run_after=timezone.now() + timedelta(seconds=delay),
+        )
+
+    def expire(self, running):
+        """
+        Задачи, которые выполняются дольше JOB_RUN_TIMEOUT: неудачная попытка.
+        Процесс пула с такой задачей не освободить - новые задачи в этот пул
+        не отдаём, а когда остальные закончатся, пул пересоздаётся.
+        """
+        deadline = time.perf_counter() - JOB_RUN_TIMEOUT
+        for future, (job, submitted) in list(running.items()):
+            if submitted < deadline:
+                del running[future]
+                self.pool_broken = True
+                self.retry_or_fail(job, f'TimeoutError: задача выполнялась дольше {JOB_RUN_TIMEOUT} с\n')
+
+    def _terminate_pool(self):
+        # Зависшие процессы сами не завершатся: shutdown их не прерывает
+        for process in list((getattr(self.pool, '_processes', None) or {}).values()):
+            process.terminate()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, once=False):
+        """
+        Основной цикл. once=True - обработать то, что уже готово к запуску,
+        и выйти (повторы с задержкой не ждём).
+        """
+        self.pool = self._new_pool()
+        running = {}
+        try:
+            while not self.stopping or running:
+                free = self.concurrency - len(running)
+                if free and not self.stopping and not self.pool_broken:
+                    for job in self.claim(free):
+                        self.dispatch(job, running)
+
+                if not running:
+                    if once:
+                        break
+                    connection.close_if_unusable_or_obsolete()
+                    time.sleep(self.poll_interval)
+                    continue
+
+                done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, submitted = running.pop(future)
+                    self.complete(job, future, submitted)
+                self.expire(running)
+
+                if self.pool_broken and not running:
+                    self._terminate_pool()
+                    self.pool = self._new_pool()
+                    self.pool_broken = False
+        finally:
+            if self.pool_broken:
+                self._terminate_pool()
+            else:
+                self.pool.shutdown()
+
+    def stop(self, *args):
+        """Остановка после завершения уже взятых задач (обработчик SIGTERM)"""
+        self.stopping = True
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def stage_breakdown(jobs):
+    """Время по этапам для набора завершённых задач: {этап: {count, avg, p50, p95, max}}"""
+    stages = {}
+    for timings in jobs.values_list('timings', flat=True):
+        for stage, value in timings.items():
+            stages.setdefault(stage, []).append(value)
+    return {
+        stage: {
+            'count': len(values),
+            'avg': round(sum(values) / len(values), 2),
+            'p50': percentile(values, 0.5),
+            'p95': percentile(values, 0.95),
+            'max': max(values),
+        }
+        for stage, values in stages.items()
+    }
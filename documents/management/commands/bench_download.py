@@ -0,0 +1,73 @@
+import resource
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from documents.models import Document
+from documents.views import DocumentDownloadView
+
+MB = 1024 * 1024
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = 'Скорость отдачи документа целиком и диапазонами, прирост памяти процесса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--document', type=int, help='id документа (по умолчанию самый большой)')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--range-mb', type=int, default=1)
+
+    def handle(self, *args, **options):
+        documents = Document.objects.select_related('blob', 'owner')
+        if options['document']:
+            document = documents.filter(pk=options['document']).first()
+        else:
+            document = documents.order_by('-blob__size').first()
+        if document is None:
+            raise CommandError('Нет загруженных документов')
+
+        view = DocumentDownloadView.as_view()
+        factory = APIRequestFactory()
+        size = document.blob.size
+        range_size = min(options['range_mb'] * MB, size)
+
+        def fetch(**headers):
+            request = factory.get(f'/api/documents/{document.pk}/download/', **headers)
+            force_authenticate(request, user=document.owner)
+            response = view(request, pk=document.pk)
+            # Так же, как WSGI-сервер без sendfile: блоками по block_size
+            received = sum(len(chunk) for chunk in response.streaming_content)
+            response.close()
+            return received
+
+        rss_before = max_rss_mb()
+        for label, headers, expected in (
+            ('Файл целиком', {}, size),
+            (f'Диапазон {range_size // MB or range_size} МБ из середины',
+             {'HTTP_RANGE': f'bytes={size // 2}-{size // 2 + range_size - 1}'}, range_size),
+        ):
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                received = fetch(**headers)
+                if received != expected:
+                    raise CommandError(f'{label}: получено {received} байт вместо {expected}')
+            elapsed = time.perf_counter() - started
+            total = expected * options['repeat']
+            self.stdout.write(f'{label}: {total / MB / elapsed:.0f} МБ/с')
+
+        started = time.perf_counter()
+        for _ in range(options['repeat'] * 100):
+            request = factory.get(
+                f'/api/documents/{document.pk}/download/',
+                HTTP_IF_NONE_MATCH=f'"{document.blob.sha256}"',
+            )
+            force_authenticate(request, user=document.owner)
+            view(request, pk=document.pk)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'304 по ETag: {elapsed / (options["repeat"] * 100) * 1e6:.0f} мкс на запрос')
+        self.stdout.write(f'Прирост пикового RSS: {max_rss_mb() - rss_before:.0f} МБ (размер файла {size // MB} МБ)')
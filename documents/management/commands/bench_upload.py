@@ -0,0 +1,99 @@
+import os
+import resource
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from documents import uploads
+from documents.models import StoredBlob
+from users.models import Client
+
+MB = 1024 * 1024
+
+
+class PatternStream:
+    """Тело запроса заданной длины из повторяющегося случайного буфера (память постоянна)"""
+
+    def __init__(self, length, pattern):
+        self.remaining = length
+        self.pattern = pattern
+        self.position = 0
+
+    def read(self, size):
+        size = min(size, self.remaining, len(self.pattern) - self.position)
+        chunk = self.pattern[self.position:self.position + size]
+        self.position = (self.position + size) % len(self.pattern)
+        self.remaining -= size
+        return chunk
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = 'Пропускная способность потоковой загрузки документов (по умолчанию файл 1 ГБ)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=1024)
+        parser.add_argument('--chunk-mb', type=int, default=64, help='Размер одного PUT')
+        parser.add_argument('--keep', action='store_true', help='Не удалять загруженный файл')
+
+    def handle(self, *args, **options):
+        owner = Client.objects.order_by('pk').first()
+        if owner is None:
+            raise CommandError('Нет клиентов в БД')
+
+        size = options['size_mb'] * MB
+        chunk = options['chunk_mb'] * MB
+        # Случайный буфер: каждый запуск даёт новый SHA-256, дедупликация не мешает замеру
+        pattern = os.urandom(8 * MB + 1)
+
+        # Опорная скорость: та же запись напрямую в MEDIA_ROOT
+        os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=settings.MEDIA_ROOT) as f:
+            stream = PatternStream(size, pattern)
+            started = time.perf_counter()
+            while data := stream.read(uploads.UPLOAD_READ_SIZE):
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            disk = time.perf_counter() - started
+        self.stdout.write(f'Запись на диск без обработки: {size / MB / disk:.0f} МБ/с')
+
+        rss_before = max_rss_mb()
+        session = uploads.create_session(owner.pk, 'bench.bin', size, title='bench_upload')
+        stream = PatternStream(size, pattern)
+        rehash = 0
+        started = time.perf_counter()
+        document = None
+        while session.offset < size:
+            if session.offset and session.offset >= size // 2 and not rehash:
+                # Имитация продолжения на другом воркере: хэш досчитывается по .part
+                uploads._hashers.clear()
+                rehash_started = time.perf_counter()
+                hasher = uploads._hasher_at(session)
+                uploads._remember_hasher(session.pk, session.offset, hasher)
+                rehash = time.perf_counter() - rehash_started
+            length = min(chunk, size - session.offset)
+            # Как PUT: аренда сессии на каждую часть
+            session = uploads.claim_session(owner.pk, session.pk)
+            document = uploads.write_chunk(session, session.offset, stream, length)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'Загрузка {size // MB} МБ частями по {chunk // MB} МБ: {elapsed:.1f} с, '
+            f'{size / MB / elapsed:.0f} МБ/с (с учётом SHA-256 и fsync)'
+        )
+        self.stdout.write(f'Досчёт хэша половины файла на другом воркере: {rehash:.1f} с')
+        self.stdout.write(f'Прирост пикового RSS: {max_rss_mb() - rss_before:.0f} МБ')
+        self.stdout.write(f'SHA-256: {document.blob.sha256}')
+
+        if not options['keep']:
+            blob = document.blob
+            document.delete()
+            if not blob.documents.exists():
+                os.unlink(blob.path)
+                StoredBlob.objects.filter(pk=blob.pk).delete()
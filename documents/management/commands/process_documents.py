@@ -0,0 +1,34 @@
+import json
+import signal
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from documents.jobs import JOB_CONCURRENCY, Worker, stage_breakdown
+from documents.models import ProcessingJob
+
+
+class Command(BaseCommand):
+    help = 'Воркер фоновой обработки документов: текст для поиска и миниатюры'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=JOB_CONCURRENCY, help='Число процессов пула')
+        parser.add_argument('--once', action='store_true', help='Обработать готовые к запуску задачи и выйти')
+        parser.add_argument(
+            '--stats', type=int, metavar='MINUTES',
+            help='Не запускать воркер, а вывести время этапов по задачам за последние MINUTES минут',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            since = timezone.now() - timedelta(minutes=options['stats'])
+            jobs = ProcessingJob.objects.filter(status='done', finished_at__gte=since)
+            self.stdout.write(json.dumps(stage_breakdown(jobs), indent=2, ensure_ascii=False))
+            return
+
+        worker = Worker(concurrency=options['concurrency'])
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        worker.run(once=options['once'])
+        self.stdout.write(f'Обработано: {worker.processed}, с ошибкой: {worker.failed}')
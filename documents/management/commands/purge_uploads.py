@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from documents.uploads import UPLOAD_SESSION_TTL, purge_stale
+
+
+class Command(BaseCommand):
+    help = 'Удаление брошенных загрузок и их .part файлов (запускать по расписанию)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl', type=int, default=UPLOAD_SESSION_TTL,
+            help='Сколько секунд без активности считать загрузку брошенной',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Удалено загрузок: {purge_stale(options['ttl'])}")
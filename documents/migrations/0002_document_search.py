@@ -0,0 +1,95 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.functions.text
+
+# Текст документа индексируется не целиком: tsvector ограничен 1 МБ
+CREATE_TRIGGER = """
+CREATE FUNCTION documents_document_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple',
+            coalesce(NEW.contract_number, '') || ' ' ||
+            coalesce(NEW.counterparty_inn, '') || ' ' ||
+            coalesce(NEW.counterparty_kpp, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.counterparty_name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.filename, '')), 'C') ||
+        setweight(to_tsvector('russian', left(coalesce(NEW.text, ''), 200000)), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER documents_document_search_vector_update
+    BEFORE INSERT OR UPDATE OF contract_number, counterparty_inn, counterparty_kpp, counterparty_name, title, filename, text
+    ON documents_document
+    FOR EACH ROW EXECUTE FUNCTION documents_document_search_vector();
+
+UPDATE documents_document SET title = title;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS documents_document_search_vector_update ON documents_document;
+DROP FUNCTION IF EXISTS documents_document_search_vector();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0001_initial'),
+        # pg_trgm создаётся там
+        ('users', '0003_client_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='contract_number',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Номер договора'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='counterparty_inn',
+            field=models.CharField(blank=True, max_length=12, verbose_name='ИНН контрагента'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='counterparty_kpp',
+            field=models.CharField(blank=True, max_length=9, verbose_name='КПП контрагента'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='counterparty_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Контрагент'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='text',
+            field=models.TextField(blank=True, editable=False, verbose_name='Текст документа'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='document_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('contract_number'), name='gin_trgm_ops'), name='document_contract_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass('counterparty_inn', name='gin_trgm_ops'), name='document_cp_inn_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('counterparty_name'), name='gin_trgm_ops'), name='document_cp_name_trgm'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
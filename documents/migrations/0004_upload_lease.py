@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_processing_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='writing_token',
+            field=models.UUIDField(blank=True, editable=False, null=True, verbose_name='Запись: токен'),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='writing_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Запись: до'),
+        ),
+    ]
@@ -1,3 +1,172 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .storage import blob_path, upload_path
+
+
+class StoredBlob(models.Model):
+    """
+    Содержимое файла в хранилище с адресацией по SHA-256.
+    Одинаковые файлы разных документов хранятся один раз.
+    """
+
+    sha256 = models.CharField(_('SHA-256'), max_length=64, unique=True)
+    size = models.BigIntegerField(_('Размер, байт'))
+    created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Файл хранилища')
+        verbose_name_plural = _('Файлы хранилища')
+
+    def __str__(self):
+        return self.sha256
+
+    @property
+    def path(self):
+        return blob_path(self.sha256)
+
+
+class Document(models.Model):
+    """Документ клиента (договор, счёт, скан)"""
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_('Владелец'),
+        on_delete=models.CASCADE,
+        related_name='documents',
+    )
+    title = models.CharField(_('Название'), max_length=255)
+    filename = models.CharField(_('Имя файла'), max_length=255)
+    content_type = models.CharField(_('Тип содержимого'), max_length=100, default='application/octet-stream')
+    blob = models.ForeignKey(
+        StoredBlob,
+        verbose_name=_('Содержимое'),
+        on_delete=models.PROTECT,
+        related_name='documents',
+    )
+    # Реквизиты для поиска
+    contract_number = models.CharField(_('Номер договора'), max_length=100, blank=True)
+    counterparty_inn = models.CharField(_('ИНН контрагента'), max_length=12, blank=True)
+    counterparty_kpp = models.CharField(_('КПП контрагента'), max_length=9, blank=True)
+    counterparty_name = models.CharField(_('Контрагент'), max_length=255, blank=True)
+    text = models.TextField(_('Текст документа'), blank=True, editable=False)
+    # Полнотекстовый индекс, ведётся триггером в БД
+    search_vector = SearchVectorField(null=True, editable=False)
+    created_at = models.DateTimeField(_('Дата загрузки'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Документ')
+        verbose_name_plural = _('Документы')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', 'created_at']),
+            GinIndex(fields=['search_vector'], name='document_search_vector_gin'),
+            GinIndex(OpClass(Upper('contract_number'), name='gin_trgm_ops'), name='document_contract_trgm'),
+            GinIndex(OpClass('counterparty_inn', name='gin_trgm_ops'), name='document_cp_inn_trgm'),
+            GinIndex(OpClass(Upper('counterparty_name'), name='gin_trgm_ops'), name='document_cp_name_trgm'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class UploadSession(models.Model):
+    """
+    Возобновляемая загрузка файла частями.
+    Принятые байты лежат в MEDIA_ROOT/uploads/<id>.part, offset - сколько
+    байт уже записано; по достижении size файл переносится в хранилище.
+    """
+
+    STATUS_CHOICES = [
+        ('active', _('Загружается')),
+        ('completed', _('Завершена')),
+        ('aborted', _('Отменена')),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_('Владелец'),
+        on_delete=models.CASCADE,
+        related_name='upload_sessions',
+    )
+    filename = models.CharField(_('Имя файла'), max_length=255)
+    title = models.CharField(_('Название'), max_length=255, blank=True)
+    content_type = models.CharField(_('Тип содержимого'), max_length=100, default='application/octet-stream')
+    size = models.BigIntegerField(_('Размер, байт'))
+    offset = models.BigIntegerField(_('Принято байт'), default=0)
+    status = models.CharField(_('Статус'), max_length=20, choices=STATUS_CHOICES, default='active')
+    # Аренда на запись: какой PUT сейчас пишет и до какого времени (продлевается по ходу записи)
+    writing_token = models.UUIDField(_('Запись: токен'), null=True, blank=True, editable=False)
+    writing_until = models.DateTimeField(_('Запись: до'), null=True, blank=True, editable=False)
+    document = models.ForeignKey(
+        Document,
+        verbose_name=_('Документ'),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Дата изменения'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Сессия загрузки')
+        verbose_name_plural = _('Сессии загрузки')
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size})'
+
+    @property
+    def part_path(self):
+        return upload_path(self.pk)
+
+
+class ProcessingJob(models.Model):
+    """
+    Фоновая задача обработки документа (извлечение текста, миниатюра).
+    Очередь - сама таблица: воркеры забирают задачи через
+    SELECT ... FOR UPDATE SKIP LOCKED. key уникален, повторная постановка
+    той же задачи ничего не делает.
+    """
+
+    STATUS_CHOICES = [
+        ('queued', _('В очереди')),
+        ('running', _('Выполняется')),
+        ('done', _('Выполнена')),
+        ('failed', _('Ошибка')),
+    ]
+
+    key = models.CharField(_('Ключ задачи'), max_length=150, unique=True)
+    kind = models.CharField(_('Тип'), max_length=50)
+    payload = models.JSONField(_('Параметры'), default=dict)
+    status = models.CharField(_('Статус'), max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(_('Попыток'), default=0)
+    run_after = models.DateTimeField(_('Не раньше'), default=timezone.now)
+    locked_at = models.DateTimeField(_('Взята в работу'), null=True, blank=True)
+    locked_by = models.CharField(_('Воркер'), max_length=100, blank=True)
+    last_error = models.TextField(_('Последняя ошибка'), blank=True)
+    # Время этапов в миллисекундах: {'queue': ..., 'extract': ..., ...}
+    timings = models.JSONField(_('Время этапов, мс'), default=dict, blank=True)
+    created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
+    finished_at = models.DateTimeField(_('Дата завершения'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Задача обработки')
+        verbose_name_plural = _('Задачи обработки')
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
 
-# Create your models here.
+    def __str__(self):
+        return self.key
@@ -0,0 +1,118 @@
+"""
+Этапы обработки файла документа. Выполняются в процессах пула воркера,
+к БД не обращаются: на входе пути и параметры, на выходе результат и
+время каждого этапа.
+
+PDF и изображения обрабатываются через PyMuPDF, если он установлен;
+DOCX разбирается стандартной библиотекой (zipfile + XML).
+"""
+
+import hashlib
+import os
+import time
+import zipfile
+from xml.etree import ElementTree
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+PDF_TYPES = {'application/pdf'}
+DOCX_TYPES = {'application/vnd.openxmlformats-officedocument.wordprocessingml.document'}
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+HASH_READ_SIZE = 1024 * 1024
+
+
+class CorruptedBlob(Exception):
+    """Содержимое файла в хранилище не совпадает с его SHA-256"""
+
+
+def detect_kind(filename, content_type):
+    extension = os.path.splitext(filename)[1].lower()
+    if content_type in PDF_TYPES or extension == '.pdf':
+        return 'pdf'
+    if content_type in DOCX_TYPES or extension == '.docx':
+        return 'docx'
+    if content_type.startswith('image/'):
+        return 'image'
+    return None
+
+
+def verify_hash(path, sha256):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_READ_SIZE):
+            hasher.update(chunk)
+    if hasher.hexdigest() != sha256:
+        raise CorruptedBlob(f'{path}: ожидался {sha256}, получен {hasher.hexdigest()}')
+
+
+def extract_pdf_text(path, max_chars):
+    parts = []
+    total = 0
+    with pymupdf.open(path) as pdf:
+        for page in pdf:
+            text = page.get_text()
+            parts.append(text)
+            total += len(text)
+            if total >= max_chars:
+                break
+    return ''.join(parts)[:max_chars]
+
+
+def extract_docx_text(path, max_chars):
+    with zipfile.ZipFile(path) as archive:
+        with archive.open('word/document.xml') as f:
+            root = ElementTree.parse(f).getroot()
+    paragraphs = []
+    for paragraph in root.iter(f'{WORD_NS}p'):
+        paragraphs.append(''.join(node.text or '' for node in paragraph.iter(f'{WORD_NS}t')))
+    return '\n'.join(paragraphs)[:max_chars]
+
+
+def render_thumbnail(path, destination, width):
+    with pymupdf.open(path) as document:
+        if not document.page_count:
+            return False
+        page = document[0]
+        zoom = width / page.rect.width
+        pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    # Пишем во временный файл и переименовываем: читатели не увидят половину PNG
+    temporary = f'{destination}.{os.getpid()}.tmp'
+    pixmap.save(temporary, output='png')
+    os.replace(temporary, destination)
+    return True
+
+
+def process_blob(payload):
+    """
+    Обработка одного файла: проверка хэша, извлечение текста, миниатюра.
+    Возвращает (результат, время этапов в мс).
+    """
+    timings = {}
+
+    def stage(name, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    path = payload['path']
+    stage('hash', verify_hash, path, payload['sha256'])
+
+    kind = detect_kind(payload['filename'], payload['content_type'])
+    text = ''
+    if kind == 'docx':
+        text = stage('extract', extract_docx_text, path, payload['max_text_chars'])
+    elif kind == 'pdf' and pymupdf is not None:
+        text = stage('extract', extract_pdf_text, path, payload['max_text_chars'])
+
+    thumbnail = False
+    if kind in ('pdf', 'image') and pymupdf is not None:
+        thumbnail = stage('thumbnail', render_thumbnail, path, payload['thumbnail_path'], payload['thumbnail_width'])
+
+    # PostgreSQL не хранит NUL в text
+    return {'text': text.replace('\x00', ''), 'thumbnail': thumbnail, 'kind': kind}, timings
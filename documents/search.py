@@ -0,0 +1,13 @@
+from config.search import search_queryset
+
+# Поля с trigram-индексами (см. Document.Meta.indexes)
+DOCUMENT_SUBSTRING_LOOKUPS = (
+    'contract_number__icontains',
+    'counterparty_inn__contains',
+    'counterparty_name__icontains',
+)
+
+
+def search_documents(queryset, text):
+    """Документы по номеру договора, ИНН/КПП и названию контрагента, тексту"""
+    return search_queryset(queryset, text, DOCUMENT_SUBSTRING_LOOKUPS)
@@ -0,0 +1,41 @@
+from rest_framework import serializers
+
+from .models import Document, UploadSession
+from .uploads import MAX_UPLOAD_SIZE
+
+
+class DocumentSerializer(serializers.ModelSerializer):
+    """Документ с реквизитами содержимого"""
+    size = serializers.IntegerField(source='blob.size', read_only=True)
+    sha256 = serializers.CharField(source='blob.sha256', read_only=True)
+
+    class Meta:
+        model = Document
+        fields = ('id', 'title', 'filename', 'content_type', 'size', 'sha256',
+                  'contract_number', 'counterparty_inn', 'counterparty_kpp', 'counterparty_name',
+                  'created_at')
+        read_only_fields = ('id', 'filename', 'content_type', 'size', 'sha256', 'created_at')
+
+
+class DocumentSearchSerializer(DocumentSerializer):
+    """Результат поиска с релевантностью"""
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(DocumentSerializer.Meta):
+        fields = DocumentSerializer.Meta.fields + ('rank',)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Сессия загрузки частями"""
+
+    class Meta:
+        model = UploadSession
+        fields = ('id', 'filename', 'title', 'content_type', 'size', 'offset', 'status', 'document', 'created_at')
+        read_only_fields = ('id', 'offset', 'status', 'document', 'created_at')
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Размер файла должен быть больше нуля')
+        if value > MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(f'Максимальный размер файла - {MAX_UPLOAD_SIZE} байт')
+        return value
@@ -0,0 +1,29 @@
+"""
+Раскладка файлов документов под MEDIA_ROOT.
+
+blobs/ab/cd/<sha256> - готовые файлы (адресация по содержимому),
+uploads/<uuid>.part  - незавершённые загрузки,
+thumbs/ab/cd/<sha256>.png - миниатюры первой страницы.
+blobs и uploads на одной файловой системе, поэтому завершение загрузки -
+это os.replace без копирования.
+"""
+
+import os
+
+from django.conf import settings
+
+BLOB_ROOT = os.path.join(settings.MEDIA_ROOT, 'blobs')
+UPLOAD_ROOT = os.path.join(settings.MEDIA_ROOT, 'uploads')
+THUMBNAIL_ROOT = os.path.join(settings.MEDIA_ROOT, 'thumbs')
+
+
+def blob_path(sha256):
+    return os.path.join(BLOB_ROOT, sha256[:2], sha256[2:4], sha256)
+
+
+def upload_path(session_id):
+    return os.path.join(UPLOAD_ROOT, f'{session_id}.part')
+
+
+def thumbnail_path(sha256):
+    return os.path.join(THUMBNAIL_ROOT, sha256[:2], sha256[2:4], f'{sha256}.png')
@@ -1,3 +1,285 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from dashboard.rollups import blob_processed, check_rollups, document_added
+from users.models import Client
+
+from . import jobs, storage, uploads
+from .download import parse_range
+from .models import Document, ProcessingJob, StoredBlob, UploadSession
+
+SLEEP = 'test_sleep'
+
+
+class MediaRootMixin:
+    """Файлы документов теста - во временном каталоге"""
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        for module, name, folder in (
+            (storage, 'BLOB_ROOT', 'blobs'), (storage, 'UPLOAD_ROOT', 'uploads'), (uploads, 'UPLOAD_ROOT', 'uploads'),
+        ):
+            patcher = mock.patch.object(module, name, os.path.join(root, folder))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class WorkerDeadlineTests(TestCase):
+
+    def setUp(self):
+        # Работа в пуле - time.sleep(payload['seconds']): задача, которая «зависает»
+        handlers = {**jobs.HANDLERS, SLEEP: (lambda job: job.payload['seconds'], time.sleep, lambda job, result: None)}
+        for patcher in (
+            mock.patch.object(jobs, 'HANDLERS', handlers),
+            mock.patch.object(jobs, 'JOB_RUN_TIMEOUT', 0.5),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_hung_job_is_a_failed_attempt_and_pool_is_replaced(self):
+        jobs.enqueue(SLEEP, 'hang', {'seconds': 60})
+        worker = jobs.Worker(concurrency=1, poll_interval=0.1)
+        terminated = []
+        terminate_pool = worker._terminate_pool
+
+        def track_terminate():
+            terminated.extend(worker.pool._processes.values())
+            terminate_pool()
+
+        worker._terminate_pool = track_terminate
+        started = time.monotonic()
+        worker.run(once=True)
+
+        self.assertLess(time.monotonic() - started, 10)
+        job = ProcessingJob.objects.get(key='hang')
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('TimeoutError', job.last_error)
+        # Процесс с зависшей задачей убит, а не брошен занимать слот
+        self.assertTrue(terminated)
+        for process in terminated:
+            process.join(5)
+            self.assertFalse(process.is_alive())
+
+    def test_abandoned_job_on_last_attempt_fails_instead_of_being_reclaimed(self):
+        stale = timezone.now() - timedelta(seconds=jobs.JOB_TIMEOUT + 1)
+        ProcessingJob.objects.create(
+            key='poison', kind=SLEEP, payload={'seconds': 60}, status='running',
+            attempts=jobs.JOB_MAX_ATTEMPTS, locked_at=stale, locked_by='dead:1',
+        )
+        ProcessingJob.objects.create(
+            key='retry', kind=SLEEP, payload={'seconds': 0}, status='running',
+            attempts=1, locked_at=stale, locked_by='dead:1',
+        )
+        worker = jobs.Worker(concurrency=2)
+
+        claimed = worker.claim(2)
+
+        self.assertEqual([job.key for job in claimed], ['retry'])
+        self.assertEqual(claimed[0].attempts, 2)
+        poison = ProcessingJob.objects.get(key='poison')
+        self.assertEqual(poison.status, 'failed')
+        self.assertIsNotNone(poison.finished_at)
+        self.assertEqual(worker.failed, 1)
+
+    def test_failed_work_is_retried_with_delay(self):
+        jobs.enqueue(SLEEP, 'bad', {'seconds': -1})
+        jobs.Worker(concurrency=1, poll_interval=0.1).run(once=True)
+
+        job = ProcessingJob.objects.get(key='bad')
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('ValueError', job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+
+
+class EnqueueTests(TestCase):
+
+    def setUp(self):
+        self.owner = Client.objects.create(username='owner', inn='7701000001', legal_address='г. Москва', phone='+79990000000')
+        self.blob = StoredBlob.objects.create(sha256='a' * 64, size=1)
+
+    def add_document(self):
+        document = Document.objects.create(owner=self.owner, title='Акт', filename='act.pdf', blob=self.blob)
+        document_added(self.owner.pk, jobs.enqueue_document(document))
+        return document
+
+    def test_new_upload_requeues_failed_job(self):
+        self.add_document()
+        key = jobs.blob_job_key(self.blob)
+        ProcessingJob.objects.filter(key=key).update(status='failed', attempts=jobs.JOB_MAX_ATTEMPTS, last_error='boom')
+        blob_processed(self.blob.pk, 'failed')
+
+        self.add_document()
+
+        job = ProcessingJob.objects.get(key=key)
+        self.assertEqual((job.status, job.attempts, job.last_error), ('queued', 0, ''))
+        # Оба документа снова «в обработке» - сводка совпадает с пересчётом
+        self.assertEqual(check_rollups([self.owner.pk]), {})
+
+    def test_repeated_enqueue_of_live_job_changes_nothing(self):
+        self.add_document()
+        key = jobs.blob_job_key(self.blob)
+        ProcessingJob.objects.filter(key=key).update(status='running', attempts=2)
+
+        self.assertFalse(jobs.enqueue(jobs.PROCESS_BLOB, key, {'blob_id': self.blob.pk}))
+        self.assertEqual(ProcessingJob.objects.get(key=key).attempts, 2)
+
+
+class ResumableUploadTests(MediaRootMixin, TestCase):
+
+    content = b'0123456789' * 10
+
+    def setUp(self):
+        super().setUp()
+        self.owner = Client.objects.create(username='owner', inn='7701000001', legal_address='г. Москва', phone='+79990000000')
+        self.api = APIClient()
+        self.api.force_authenticate(self.owner)
+
+    def start(self, filename='act.pdf'):
+        response = self.api.post(
+            reverse('documents:upload_create'), {'filename': filename, 'size': len(self.content)}, format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def put(self, session_id, offset, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.api.put(
+                reverse('documents:upload_session', args=[session_id]), data,
+                content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+            )
+
+    def test_offset_mismatch_is_conflict(self):
+        session_id = self.start()
+        self.assertEqual(self.put(session_id, 0, self.content[:40]).status_code, 200)
+
+        response = self.put(session_id, 0, self.content[:40])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual((response.data['offset'], response['Upload-Offset']), (40, '40'))
+        # Конфликт не снимает и не портит принятое
+        session = UploadSession.objects.get(pk=session_id)
+        self.assertEqual((session.offset, session.writing_token), (40, None))
+        with open(session.part_path, 'rb') as f:
+            self.assertEqual(f.read(), self.content[:40])
+
+    def test_resume_on_another_worker(self):
+        session_id = self.start()
+        self.put(session_id, 0, self.content[:40])
+        # Другой воркер: незавершённого хэша в памяти нет, он досчитывается по .part
+        uploads._hashers.clear()
+
+        response = self.put(session_id, 40, self.content[40:])
+
+        self.assertEqual(response.status_code, 201)
+        document = Document.objects.select_related('blob').get(pk=response.data['id'])
+        self.assertEqual(document.blob.sha256, hashlib.sha256(self.content).hexdigest())
+        with open(document.blob.path, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(os.path.exists(UploadSession.objects.get(pk=session_id).part_path))
+
+    def test_purge_removes_idle_sessions_and_parts(self):
+        idle, writing, fresh = self.start('idle.pdf'), self.start('writing.pdf'), self.start('fresh.pdf')
+        self.put(idle, 0, self.content[:40])
+        old = timezone.now() - timedelta(seconds=uploads.UPLOAD_SESSION_TTL + 1)
+        UploadSession.objects.filter(pk__in=[idle, writing]).update(updated_at=old)
+        # В эту сессию как раз пишет PUT: аренда ещё не истекла
+        UploadSession.objects.filter(pk=writing).update(writing_until=timezone.now() + timedelta(seconds=60))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('purge_uploads', stdout=io.StringIO())
+
+        self.assertEqual({str(pk) for pk in UploadSession.objects.values_list('pk', flat=True)}, {writing, fresh})
+        self.assertEqual(sorted(os.listdir(storage.UPLOAD_ROOT)), sorted(f'{pk}.part' for pk in (writing, fresh)))
+
+    def test_same_content_is_stored_once(self):
+        first, second = self.start('a.pdf'), self.start('b.pdf')
+        documents = [self.put(session_id, 0, self.content).data['id'] for session_id in (first, second)]
+
+        blobs = set(Document.objects.filter(pk__in=documents).values_list('blob_id', flat=True))
+        self.assertEqual(len(blobs), 1)
+        self.assertEqual(StoredBlob.objects.count(), 1)
+        self.assertEqual(os.listdir(storage.UPLOAD_ROOT), [])
+        self.assertEqual(ProcessingJob.objects.filter(kind=jobs.PROCESS_BLOB).count(), 1)
+
+
+class DownloadTests(MediaRootMixin, TestCase):
+
+    content = bytes(range(100))
+
+    def setUp(self):
+        super().setUp()
+        self.owner = Client.objects.create(username='owner', inn='7701000001', legal_address='г. Москва', phone='+79990000000')
+        sha256 = hashlib.sha256(self.content).hexdigest()
+        blob = StoredBlob.objects.create(sha256=sha256, size=len(self.content))
+        os.makedirs(os.path.dirname(blob.path))
+        with open(blob.path, 'wb') as f:
+            f.write(self.content)
+        self.document = Document.objects.create(owner=self.owner, title='Акт', filename='act.pdf', blob=blob)
+        self.etag = f'"{sha256}"'
+        self.api = APIClient()
+        self.api.force_authenticate(self.owner)
+
+    def get(self, **headers):
+        return self.api.get(reverse('documents:document_download', args=[self.document.pk]), **headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=10-19', 100), (10, 19))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-5', 100), (95, 99))
+        self.assertEqual(parse_range('bytes=-500', 100), (0, 99))
+        self.assertEqual(parse_range('bytes=50-500', 100), (50, 99))
+        # Несколько диапазонов и чужие единицы - файл целиком
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_range('items=0-1', 100))
+        for header in ('bytes=100-', 'bytes=20-10', 'bytes=-0'):
+            with self.assertRaises(ValueError):
+                parse_range(header, 100)
+
+    def test_full_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response['Content-Length'], response['Accept-Ranges'], response['ETag']), ('100', 'bytes', self.etag))
+        self.assertEqual(self.body(response), self.content)
+
+    def test_range_is_partial_content(self):
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual((response['Content-Range'], response['Content-Length']), ('bytes 10-19/100', '10'))
+        self.assertEqual(self.body(response), self.content[10:20])
+
+        response = self.get(HTTP_RANGE='bytes=-5')
+        self.assertEqual(self.body(response), self.content[-5:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(HTTP_RANGE='bytes=100-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_if_range(self):
+        # Та же версия файла - диапазон, другая - файл целиком
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=self.etag)
+        self.assertEqual((response.status_code, self.body(response)), (206, self.content[:10]))
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, self.body(response)), (200, self.content))
 
-# Create your tests here.
+    def test_not_modified(self):
+        response = self.get(HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
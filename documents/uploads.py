@@ -0,0 +1,284 @@
+"""
+Потоковая возобновляемая загрузка документов.
+
+Тело каждого PUT читается из сокета блоками UPLOAD_READ_SIZE и сразу
+пишется в .part файл по смещению offset, SHA-256 считается по ходу записи.
+Память на загрузку постоянна и не зависит от размера файла. По завершении
+файл попадает в хранилище жёсткой ссылкой (без копирования), .part
+удаляется после коммита - при откате сессия по-прежнему указывает на него.
+
+Пока PUT пишет, сессия не заблокирована в БД и транзакция не открыта:
+запрос берёт короткую аренду (writing_token, writing_until), продлевает её
+по ходу записи и одной быстрой транзакцией фиксирует новый offset.
+Параллельный PUT в ту же сессию получает UploadBusy (409).
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import UnreadablePostError
+from django.utils import timezone
+
+from dashboard.rollups import document_added
+
+from .jobs import enqueue_document, publish_document_states
+from .models import Document, StoredBlob, UploadSession
+from .storage import UPLOAD_ROOT, blob_path
+
+UPLOAD_READ_SIZE = getattr(settings, 'DOCUMENTS_UPLOAD_READ_SIZE', 1024 * 1024)
+MAX_UPLOAD_SIZE = getattr(settings, 'DOCUMENTS_MAX_UPLOAD_SIZE', 10 * 1024 ** 3)
+# Сколько незавершённых хэшей держать в памяти процесса
+HASHER_CACHE_SIZE = getattr(settings, 'DOCUMENTS_HASHER_CACHE_SIZE', 1000)
+UPLOAD_LEASE = getattr(settings, 'DOCUMENTS_UPLOAD_LEASE', 60)
+UPLOAD_SESSION_TTL = getattr(settings, 'DOCUMENTS_UPLOAD_SESSION_TTL', 7 * 24 * 3600)
+
+
+class UploadConflict(Exception):
+    """Смещение клиента не совпадает с принятым сервером (или загрузка закрыта)"""
+
+    def __init__(self, offset, message='Неверное смещение загрузки'):
+        super().__init__(message)
+        self.offset = offset
+
+
+class UploadBusy(Exception):
+    """В сессию уже пишет другой запрос"""
+
+
+# Незавершённые SHA-256 по сессиям: (смещение, объект hashlib)
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def _remember_hasher(session_id, offset, hasher):
+    with _hashers_lock:
+        if len(_hashers) >= HASHER_CACHE_SIZE:
+            _hashers.pop(next(iter(_hashers)))
+        _hashers[session_id] = (offset, hasher)
+
+
+def _hasher_at(session):
+    """
+    Хэш уже принятых байт. Обычно берётся из памяти процесса; если чанк
+    пришёл на другой воркер или после перезапуска - досчитывается по .part.
+    """
+    with _hashers_lock:
+        entry = _hashers.pop(session.pk, None)
+    if entry is not None and entry[0] == session.offset:
+        return entry[1]
+
+    hasher = hashlib.sha256()
+    remaining = session.offset
+    with open(session.part_path, 'rb') as f:
+        while remaining:
+            chunk = f.read(min(UPLOAD_READ_SIZE, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher
+
+
+def create_session(owner_id, filename, size, content_type='application/octet-stream', title=''):
+    session = UploadSession.objects.create(
+        owner_id=owner_id,
+        filename=filename,
+        title=title,
+        content_type=content_type,
+        size=size,
+    )
+    os.makedirs(UPLOAD_ROOT, exist_ok=True)
+    open(session.part_path, 'wb').close()
+    _remember_hasher(session.pk, 0, hashlib.sha256())
+    return session
+
+
+def claim_session(owner_id, pk):
+    """
+    Аренда сессии на запись одним запросом. None - сессии нет; UploadBusy -
+    в неё уже пишет другой запрос. Закрытая сессия возвращается без аренды
+    (write_chunk ответит конфликтом).
+    """
+    token = uuid.uuid4()
+    now = timezone.now()
+    claimed = (
+        UploadSession.objects.filter(owner_id=owner_id, pk=pk, status='active')
+        .filter(Q(writing_until__isnull=True) | Q(writing_until__lt=now))
+        .update(writing_token=token, writing_until=now + timedelta(seconds=UPLOAD_LEASE))
+    )
+    session = UploadSession.objects.filter(owner_id=owner_id, pk=pk).first()
+    if session is not None and not claimed and session.status == 'active':
+        raise UploadBusy()
+    return session
+
+
+def _leased(session):
+    return UploadSession.objects.filter(pk=session.pk, status='active', writing_token=session.writing_token)
+
+
+def _renew_lease(session):
+    return _leased(session).update(writing_until=timezone.now() + timedelta(seconds=UPLOAD_LEASE))
+
+
+def release_session(session):
+    """Снять аренду, если запрос завершился, не дописав (ошибка, конфликт)"""
+    if session.writing_token is not None:
+        _leased(session).update(writing_token=None, writing_until=None)
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Дописывает до length байт из stream с позиции offset (сессия взята
+    claim_session). Если клиент оборвал соединение, сохраняется то, что
+    успело прийти - загрузку можно продолжить с нового session.offset.
+    Возвращает Document, если файл принят целиком, иначе None.
+    """
+    if session.status != 'active':
+        raise UploadConflict(session.offset, 'Загрузка уже завершена или отменена')
+    if offset != session.offset:
+        raise UploadConflict(session.offset)
+    if offset + length > session.size:
+        raise ValueError('Данные выходят за заявленный размер файла')
+
+    hasher = _hasher_at(session)
+    written = 0
+    renewed = time.monotonic()
+    with open(session.part_path, 'r+b') as f:
+        f.seek(offset)
+        while written < length:
+            try:
+                chunk = stream.read(min(UPLOAD_READ_SIZE, length - written))
+            except (UnreadablePostError, OSError):
+                break
+            if not chunk:
+                break
+            # Медленный клиент: аренду продлеваем заранее; если её уже забрал
+            # другой запрос, этот больше ничего не пишет
+            if time.monotonic() - renewed > UPLOAD_LEASE / 3:
+                if not _renew_lease(session):
+                    raise UploadConflict(session.offset, 'Загрузку продолжил другой запрос')
+                renewed = time.monotonic()
+            f.write(chunk)
+            hasher.update(chunk)
+            written += len(chunk)
+        # Хвост от прошлой оборванной попытки не должен попасть в файл
+        f.truncate(offset + written)
+        if offset + written == session.size:
+            f.flush()
+            os.fsync(f.fileno())
+
+    with transaction.atomic():
+        # Новый offset и снятие аренды; finalize - в той же транзакции
+        if not _leased(session).update(
+            offset=offset + written, writing_token=None, writing_until=None, updated_at=timezone.now(),
+        ):
+            raise UploadConflict(session.offset, 'Загрузку продолжил другой запрос или она отменена')
+        session.offset = offset + written
+        document = finalize(session, hasher.hexdigest()) if session.offset == session.size else None
+    # Аренда снята коммитом; при ошибке выше её снимет release_session
+    session.writing_token = session.writing_until = None
+
+    if document is None:
+        _remember_hasher(session.pk, session.offset, hasher)
+    return document
+
+
+def _store(part_path, destination):
+    """Файл в хранилище без удаления .part; повторный вызов ничего не делает"""
+    if os.path.exists(destination):
+        # Такое содержимое уже хранится - вторая копия не нужна
+        return
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    try:
+        os.link(part_path, destination)
+    except FileExistsError:
+        pass
+    except OSError:
+        # Другая файловая система - копия через временный файл
+        temporary = f'{destination}.{os.getpid()}.tmp'
+        shutil.copyfile(part_path, temporary)
+        os.replace(temporary, destination)
+
+
+def _unlink_part(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+@transaction.atomic
+def finalize(session, sha256):
+    """
+    Файл в хранилище с дедупликацией по SHA-256. .part удаляется после коммита:
+    при откате сессия остаётся активной и файл на месте, повтор снова сработает.
+    """
+    blob, _ = StoredBlob.objects.get_or_create(sha256=sha256, defaults={'size': session.size})
+    _store(session.part_path, blob_path(sha256))
+    transaction.on_commit(lambda: _unlink_part(session.part_path))
+
+    document = Document.objects.create(
+        owner_id=session.owner_id,
+        title=session.title or session.filename,
+        filename=session.filename,
+        content_type=session.content_type,
+        blob=blob,
+    )
+    session.status = 'completed'
+    session.document = document
+    session.save(update_fields=['status', 'document', 'updated_at'])
+
+    # Текст и миниатюра - в фоне, ответ на загрузку их не ждёт
+    job_status = enqueue_document(document)
+    document_added(document.owner_id, job_status)
+    publish_document_states([{'id': document.pk, 'owner_id': document.owner_id, 'title': document.title}], job_status)
+    return document
+
+
+def abort(session):
+    with _hashers_lock:
+        _hashers.pop(session.pk, None)
+    try:
+        os.unlink(session.part_path)
+    except FileNotFoundError:
+        pass
+    session.status = 'aborted'
+    session.save(update_fields=['status', 'updated_at'])
+
+
+def _unlink_parts(paths):
+    for path in paths:
+        _unlink_part(path)
+
+
+def purge_stale(ttl=UPLOAD_SESSION_TTL, batch_size=1000):
+    """
+    Удаление сессий без активности дольше ttl секунд вместе с их .part
+    файлами; возвращает число удалённых. Сессию, в которую сейчас пишет
+    PUT (аренда не истекла), не трогаем; строки блокируются, поэтому
+    одновременный claim_session дождётся удаления и получит 404.
+    """
+    removed = 0
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            sessions = list(
+                UploadSession.objects.select_for_update(skip_locked=True)
+                .filter(updated_at__lt=now - timedelta(seconds=ttl))
+                .filter(Q(writing_until__isnull=True) | Q(writing_until__lt=now))
+                .only('id')[:batch_size]
+            )
+            if not sessions:
+                return removed
+            UploadSession.objects.filter(pk__in=[session.pk for session in sessions]).delete()
+            transaction.on_commit(partial(_unlink_parts, [session.part_path for session in sessions]))
+        removed += len(sessions)
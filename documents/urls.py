@@ -1,8 +1,18 @@
 # documents/urls.py
 from django.urls import path
 
+from . import views
+
 app_name = 'documents'
 
 urlpatterns = [
-    # Пока пустой
-]
\ No newline at end of file
+    # Загрузка частями
+    path('uploads/', views.UploadCreateView.as_view(), name='upload_create'),
+    path('uploads/<uuid:pk>/', views.UploadSessionView.as_view(), name='upload_session'),
+
+    # Документы и поиск
+    path('search/', views.DocumentSearchView.as_view(), name='document_search'),
+    path('<int:pk>/', views.DocumentDetailView.as_view(), name='document_detail'),
+    path('<int:pk>/download/', views.DocumentDownloadView.as_view(), name='document_download'),
+    path('<int:pk>/thumbnail/', views.DocumentThumbnailView.as_view(), name='document_thumbnail'),
+]
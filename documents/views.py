@@ -1,9 +1,18 @@
-
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.utils import timezone
 
+from .download import download_response, thumbnail_response
+from .models import Document, UploadSession
+from .search import search_documents
+from .serializers import DocumentSearchSerializer, DocumentSerializer, UploadSessionSerializer
+from .uploads import UploadBusy, UploadConflict, abort, claim_session, create_session, release_session, write_chunk
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def document_list(request):
@@ -11,3 +20,129 @@ def document_list(request):
         'message': 'Documents API работает!',
         'time': timezone.now().isoformat()
     })
+
+
+def upload_response(session, data, status_code=status.HTTP_200_OK):
+    response = Response(data, status=status_code)
+    response['Upload-Offset'] = str(session.offset)
+    response['Upload-Length'] = str(session.size)
+    return response
+
+
+class UploadCreateView(APIView):
+    """
+    Начало загрузки: POST {filename, size, content_type, title}.
+    Затем байты отправляются PUT-запросами на uploads/<id>/ с заголовком
+    Upload-Offset; при обрыве загрузка продолжается с offset из GET/HEAD.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = create_session(owner_id=request.user.pk, **serializer.validated_data)
+        response = upload_response(session, UploadSessionSerializer(session).data, status.HTTP_201_CREATED)
+        response['Location'] = request.build_absolute_uri(f'{session.pk}/')
+        return response
+
+
+class UploadSessionView(APIView):
+    """Состояние, приём частей и отмена загрузки"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_session(self, pk, **extra):
+        queryset = UploadSession.objects.filter(owner_id=self.request.user.pk)
+        return get_object_or_404(queryset, pk=pk, **extra)
+
+    def get(self, request, pk):
+        session = self.get_session(pk)
+        return upload_response(session, UploadSessionSerializer(session).data)
+
+    def put(self, request, pk):
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return Response({'error': 'Нужен заголовок Upload-Offset'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return Response({'error': 'Нужен заголовок Content-Length'}, status=status.HTTP_411_LENGTH_REQUIRED)
+
+        try:
+            # Одна запись в сессию за раз; параллельный PUT получает 409.
+            # Пока тело читается, транзакция не открыта - только аренда сессии
+            session = claim_session(request.user.pk, pk)
+        except UploadBusy:
+            return Response({'error': 'Загрузка уже выполняется'}, status=status.HTTP_409_CONFLICT)
+        if session is None:
+            raise Http404
+
+        try:
+            # request.stream - сырое тело запроса без буферизации Django
+            document = write_chunk(session, offset, request.stream, length)
+        except UploadConflict as e:
+            return upload_response(session, {'error': str(e), 'offset': e.offset}, status.HTTP_409_CONFLICT)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            release_session(session)
+
+        if document is None:
+            return upload_response(session, UploadSessionSerializer(session).data)
+        return upload_response(session, DocumentSerializer(document).data, status.HTTP_201_CREATED)
+
+    def delete(self, request, pk):
+        session = self.get_session(pk, status='active')
+        abort(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def visible_documents(request):
+    """Документы, доступные пользователю запроса (администратору - все)"""
+    queryset = Document.objects.select_related('blob')
+    if not request.user.is_staff:
+        queryset = queryset.filter(owner_id=request.user.pk)
+    return queryset
+
+
+class DocumentDetailView(generics.RetrieveUpdateAPIView):
+    """Карточка документа; реквизиты для поиска можно изменить PATCH"""
+    serializer_class = DocumentSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return visible_documents(self.request)
+
+
+class DocumentSearchView(generics.ListAPIView):
+    """
+    Поиск документов: ?q= - номер договора, ИНН/КПП или название
+    контрагента, слова из текста. Результаты по убыванию релевантности.
+    """
+    serializer_class = DocumentSearchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return search_documents(visible_documents(self.request).defer('text'), self.request.query_params.get('q', ''))
+
+
+class DocumentDownloadView(APIView):
+    """
+    Скачивание документа: Range (206), ETag/Last-Modified (304),
+    отдача через sendfile или X-Accel-Redirect/X-Sendfile.
+    ?attachment=1 - скачать файлом вместо открытия в браузере.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        document = get_object_or_404(visible_documents(request), pk=pk)
+        return download_response(request, document, as_attachment=request.GET.get('attachment') == '1')
+
+
+class DocumentThumbnailView(APIView):
+    """PNG-миниатюра первой страницы документа"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        document = get_object_or_404(visible_documents(request), pk=pk)
+        return thumbnail_response(request, document)
@@ -1,3 +1,65 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import BankStatement, ClientBalance, IdempotencyKey, Invoice, LedgerEntry, StatementLine
+
+
+@admin.register(Invoice)
+class InvoiceAdmin(admin.ModelAdmin):
+    list_display = ('number', 'client', 'amount', 'paid_amount', 'status', 'issued_at')
+    list_filter = ('status',)
+    list_select_related = ('client',)
+    search_fields = ('number', 'client__inn')
+    raw_id_fields = ('client',)
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    """Журнал только для просмотра: проводки не изменяются и не удаляются"""
+    list_display = ('id', 'client', 'kind', 'amount', 'balance_after', 'reference', 'created_at')
+    list_filter = ('kind',)
+    list_select_related = ('client',)
+    raw_id_fields = ('client', 'invoice')
+    # COUNT(*) по всему журналу на каждой странице списка слишком дорог
+    show_full_result_count = False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ClientBalance)
+class ClientBalanceAdmin(admin.ModelAdmin):
+    list_display = ('client', 'balance', 'invoiced', 'paid', 'entries', 'updated_at')
+    list_select_related = ('client',)
+    raw_id_fields = ('client',)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('key', 'user', 'response_status', 'created_at', 'expires_at')
+    list_select_related = ('user',)
+    search_fields = ('key',)
+    raw_id_fields = ('user',)
+    readonly_fields = ('request_hash', 'response_status', 'response_body')
+
+
+@admin.register(BankStatement)
+class BankStatementAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'format', 'lines_total', 'matched_exact', 'matched_fuzzy',
+                    'unmatched', 'unknown_payer', 'duplicates', 'created_at')
+    raw_id_fields = ('uploaded_by',)
+    readonly_fields = ('timings',)
+
+
+@admin.register(StatementLine)
+class StatementLineAdmin(admin.ModelAdmin):
+    list_display = ('number', 'date', 'payer_inn', 'amount', 'status', 'invoice', 'score')
+    list_filter = ('status',)
+    list_select_related = ('invoice',)
+    search_fields = ('payer_inn', 'number')
+    raw_id_fields = ('statement', 'invoice')
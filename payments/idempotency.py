@@ -0,0 +1,81 @@
+"""
+Идемпотентные запросы по заголовку Idempotency-Key.
+
+Строка ключа вставляется в начале той же транзакции, что и проводки.
+Параллельный повтор с тем же ключом ждёт на уникальном индексе, пока
+первая транзакция не завершится: после COMMIT он получает сохранённый
+ответ, после ROLLBACK - выполняется сам. Второй проводки не бывает.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_TTL = getattr(settings, 'PAYMENTS_IDEMPOTENCY_TTL', 24 * 3600)
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(Exception):
+    """Ключ уже использован с другим телом запроса"""
+
+
+def request_fingerprint(data):
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _claim(user_id, key, fingerprint):
+    """(запись ключа, True если это повтор уже выполненного запроса)"""
+    now = timezone.now()
+    # Просроченный ключ - как будто его не было
+    IdempotencyKey.objects.filter(user_id=user_id, key=key, expires_at__lte=now).delete()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user_id=user_id,
+                key=key,
+                request_hash=fingerprint,
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL),
+            )
+        return record, False
+    except IntegrityError:
+        record = IdempotencyKey.objects.get(user_id=user_id, key=key)
+    if record.request_hash != fingerprint:
+        raise IdempotencyConflict(key)
+    return record, True
+
+
+def run_idempotent(user_id, key, fingerprint, handler):
+    """
+    Выполнить handler() -> (код ответа, тело) не больше одного раза на ключ.
+    Возвращает (код ответа, тело, повтор ли это). Если handler бросает
+    исключение, ключ откатывается вместе с транзакцией.
+    """
+    with transaction.atomic():
+        record, replayed = _claim(user_id, key, fingerprint)
+        if replayed:
+            return record.response_status, record.response_body, True
+        status_code, body = handler()
+        record.response_status, record.response_body = status_code, body
+        record.save(update_fields=['response_status', 'response_body'])
+    return status_code, body, False
+
+
+def purge_expired(batch_size=10_000):
+    """Удаление просроченных ключей пачками; возвращает число удалённых"""
+    removed = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return removed
+        removed += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
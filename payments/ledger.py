@@ -0,0 +1,217 @@
+"""
+Проводки журнала расчётов и баланс клиента.
+
+Каждая пачка проводок - INSERT в секционированный журнал плюс обновление
+строк ClientBalance затронутых клиентов в той же транзакции. Блокируются
+только эти строки баланса (SELECT ... FOR UPDATE, в порядке client_id -
+без взаимных блокировок между пачками), поэтому проводки одного клиента
+выстраиваются в очередь, а проводки разных клиентов друг друга не ждут.
+Сводки кабинета (открытые счета, сумма к оплате) меняются там же,
+push-события клиентам уходят после коммита.
+"""
+
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from config.events import make_event, publish
+from dashboard.rollups import apply_deltas
+
+from .models import ClientBalance, Invoice, LedgerEntry
+
+# Знак суммы проводки по типу; корректировка передаётся уже со знаком
+KIND_SIGNS = {
+    'invoice': -1,
+    'payment': 1,
+    'refund': -1,
+}
+# Строк в одном INSERT и UPDATE ... FROM (VALUES ...)
+UPDATE_BATCH_SIZE = 1000
+
+
+def signed_amount(kind, amount):
+    if kind == 'adjustment':
+        if amount == 0:
+            raise ValueError('Корректировка на ноль не имеет смысла')
+        return amount
+    if kind not in KIND_SIGNS:
+        raise ValueError(f'Неизвестный тип проводки: {kind}')
+    if amount <= 0:
+        raise ValueError('Сумма должна быть положительной (в копейках)')
+    return KIND_SIGNS[kind] * amount
+
+
+def lock_balances(client_ids):
+    """Строки балансов клиентов под блокировкой до конца транзакции: {client_id: ClientBalance}"""
+    client_ids = sorted(set(client_ids))
+    ClientBalance.objects.bulk_create(
+        [ClientBalance(client_id=client_id) for client_id in client_ids],
+        ignore_conflicts=True,
+    )
+    # Один порядок блокировки во всех транзакциях - нет deadlock между пачками
+    balances = ClientBalance.objects.select_for_update().filter(client_id__in=client_ids).order_by('client_id')
+    return {balance.client_id: balance for balance in balances}
+
+
+def _apply(balance, kind, value):
+    balance.balance += value
+    if kind == 'invoice':
+        balance.invoiced += -value
+    elif kind in ('payment', 'refund'):
+        balance.paid += value
+    balance.entries += 1
+
+
+def _update_from_values(sql, rows, placeholder, extra_params=()):
+    # bulk_update строит CASE WHEN на каждую строку и для тысяч строк упирается в CPU
+    for start in range(0, len(rows), UPDATE_BATCH_SIZE):
+        batch = rows[start:start + UPDATE_BATCH_SIZE]
+        values = ', '.join([placeholder] * len(batch))
+        params = list(extra_params) + [param for row in batch for param in row]
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(values=values), params)
+
+
+def _write_balances(balances, now):
+    rows = sorted(
+        (b.client_id, b.balance, b.invoiced, b.paid, b.entries, b.last_entry_id)
+        for b in balances
+    )
+    _update_from_values(
+        'UPDATE payments_clientbalance AS b SET balance = v.balance, invoiced = v.invoiced, '
+        'paid = v.paid, entries = v.entries, last_entry_id = v.last_entry_id, updated_at = %s '
+        'FROM (VALUES {values}) AS v(client_id, balance, invoiced, paid, entries, last_entry_id) '
+        'WHERE b.client_id = v.client_id',
+        rows,
+        '(%s::bigint, %s::bigint, %s::bigint, %s::bigint, %s::bigint, %s::bigint)',
+        [now],
+    )
+
+
+def _write_invoice_payments(invoice_payments, now):
+    """Оплаченные суммы по счетам; счёт закрывается, когда оплачен полностью"""
+    _update_from_values(
+        'UPDATE payments_invoice AS i SET paid_amount = i.paid_amount + v.paid, '
+        "status = CASE WHEN i.status = 'open' AND i.paid_amount + v.paid >= i.amount THEN 'paid' ELSE i.status END, "
+        "paid_at = CASE WHEN i.status = 'open' AND i.paid_amount + v.paid >= i.amount THEN %s ELSE i.paid_at END "
+        'FROM (VALUES {values}) AS v(id, paid) WHERE i.id = v.id',
+        sorted(invoice_payments.items()),
+        '(%s::bigint, %s::bigint)',
+        [now],
+    )
+
+
+def _invoice_rollup_deltas(invoice_payments, deltas):
+    """
+    Изменение открытых счетов и суммы к оплате от оплат по счетам (счета
+    блокируются до записи). Возвращает [(client_id, id счёта)] закрываемых счетов.
+    """
+    invoices = (
+        Invoice.objects.select_for_update().filter(pk__in=invoice_payments, status='open')
+        .order_by('pk').values_list('pk', 'client_id', 'amount', 'paid_amount')
+    )
+    closed = []
+    for pk, client_id, amount, paid_amount in invoices:
+        paid_after = paid_amount + invoice_payments[pk]
+        delta = deltas[client_id]
+        delta['invoices_outstanding'] += max(amount - paid_after, 0) - max(amount - paid_amount, 0)
+        if paid_after >= amount:
+            delta['invoices_open'] -= 1
+            closed.append((client_id, pk))
+    return closed
+
+
+def _ledger_events(entries, balances, closed_invoices):
+    """Push-события пачки: новые проводки, итоговый баланс и закрытые счета по клиентам"""
+    events = defaultdict(list)
+    for entry in entries:
+        events[entry.client_id].append(make_event('ledger', {
+            'id': entry.pk,
+            'kind': entry.kind,
+            'amount': entry.amount,
+            'invoice': entry.invoice_id,
+            'reference': entry.reference,
+            'created_at': entry.created_at,
+        }))
+    for client_id in events:
+        events[client_id].append(make_event('balance', {'balance': balances[client_id].balance}, key='balance'))
+    for client_id, invoice_id in closed_invoices:
+        events[client_id].append(make_event('invoice', {'id': invoice_id, 'status': 'paid'}, key=f'invoice:{invoice_id}'))
+    return events
+
+
+def post_entries(postings):
+    """
+    Пачка проводок одной транзакцией. postings - словари с ключами
+    client_id, kind, amount (в копейках; для счёта, оплаты и возврата -
+    положительная), необязательные invoice_id, reference, purpose, created_at.
+    """
+    now = timezone.now()
+    values = [signed_amount(posting['kind'], posting['amount']) for posting in postings]
+    with transaction.atomic():
+        balances = lock_balances(posting['client_id'] for posting in postings)
+        entries = []
+        invoice_payments = defaultdict(int)
+        rollup_deltas = defaultdict(lambda: defaultdict(int))
+        for posting, value in zip(postings, values):
+            balance = balances[posting['client_id']]
+            _apply(balance, posting['kind'], value)
+            entries.append(LedgerEntry(
+                client_id=posting['client_id'],
+                kind=posting['kind'],
+                amount=value,
+                balance_after=balance.balance,
+                invoice_id=posting.get('invoice_id'),
+                reference=posting.get('reference', ''),
+                purpose=posting.get('purpose', ''),
+                created_at=posting.get('created_at') or now,
+            ))
+            if posting['kind'] == 'payment' and posting.get('invoice_id'):
+                invoice_payments[posting['invoice_id']] += value
+            elif posting['kind'] == 'invoice' and posting.get('invoice_id'):
+                rollup_deltas[posting['client_id']]['invoices_open'] += 1
+                rollup_deltas[posting['client_id']]['invoices_outstanding'] += -value
+
+        LedgerEntry.objects.bulk_create(entries, batch_size=UPDATE_BATCH_SIZE)
+        for entry in entries:
+            balances[entry.client_id].last_entry_id = entry.pk
+        _write_balances(balances.values(), now)
+        closed_invoices = []
+        if invoice_payments:
+            closed_invoices = _invoice_rollup_deltas(invoice_payments, rollup_deltas)
+            _write_invoice_payments(invoice_payments, now)
+        apply_deltas(rollup_deltas)
+        publish(_ledger_events(entries, balances, closed_invoices))
+    return entries
+
+
+def post_entry(client_id, kind, amount, invoice=None, reference='', purpose='', created_at=None):
+    """Одна проводка; amount в копейках (для счёта и оплаты - положительный)"""
+    return post_entries([{
+        'client_id': client_id,
+        'kind': kind,
+        'amount': amount,
+        'invoice_id': invoice.pk if invoice is not None else None,
+        'reference': reference,
+        'purpose': purpose,
+        'created_at': created_at,
+    }])[0]
+
+
+def issue_invoice(client_id, number, amount, purpose=''):
+    """Выставить счёт: строка Invoice и проводка на его сумму"""
+    with transaction.atomic():
+        invoice = Invoice.objects.create(client_id=client_id, number=number, amount=amount, purpose=purpose)
+        post_entry(client_id, 'invoice', amount, invoice=invoice, reference=number, purpose=purpose)
+    return invoice
+
+
+def record_payment(client_id, amount, invoice=None, reference='', purpose=''):
+    """Оплата от клиента; если указан счёт - он закрывается при полной оплате"""
+    return post_entry(client_id, 'payment', amount, invoice=invoice, reference=reference, purpose=purpose)
+
+
+def get_balance(client_id):
+    """Баланс без блокировки - одна строка по первичному ключу"""
+    return ClientBalance.objects.filter(client_id=client_id).first() or ClientBalance(client_id=client_id)
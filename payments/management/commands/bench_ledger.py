@@ -0,0 +1,156 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from payments.models import LedgerEntry
+from payments.pagination import LedgerPagination
+from payments.partitions import ensure_partitions
+from payments.views import BalanceView, LedgerListView
+from users.models import Client
+
+# Синтетические проводки генерирует сам PostgreSQL: по сети идёт только запрос.
+# balance_after у них 0, балансы пересчитываются одним запросом в конце.
+SEED_SQL = """
+INSERT INTO payments_ledgerentry (kind, amount, balance_after, reference, purpose, created_at, client_id)
+SELECT
+    CASE WHEN g %% 3 = 0 THEN 'invoice' ELSE 'payment' END,
+    CASE WHEN g %% 3 = 0 THEN -(100000 + g %% 5000000) ELSE 50000 + g %% 3000000 END,
+    0, '', '',
+    %(since)s::timestamptz + random() * %(span)s * interval '1 second',
+    (%(clients)s::bigint[])[1 + floor(random() * %(count)s)::int]
+FROM generate_series(1, %(batch)s) AS g
+"""
+
+ENSURE_BALANCES_SQL = """
+INSERT INTO payments_clientbalance (client_id, balance, invoiced, paid, entries, updated_at)
+SELECT unnest(%(clients)s::bigint[]), 0, 0, 0, 0, now()
+ON CONFLICT (client_id) DO NOTHING
+"""
+
+REBUILD_BALANCES_SQL = """
+INSERT INTO payments_clientbalance (client_id, balance, invoiced, paid, entries, last_entry_id, updated_at)
+SELECT client_id, sum(amount),
+       coalesce(-sum(amount) FILTER (WHERE kind = 'invoice'), 0),
+       coalesce(sum(amount) FILTER (WHERE kind IN ('payment', 'refund')), 0),
+       count(*), max(id), now()
+FROM payments_ledgerentry WHERE client_id = ANY(%(clients)s::bigint[])
+GROUP BY client_id
+ON CONFLICT (client_id) DO UPDATE SET
+    balance = EXCLUDED.balance, invoiced = EXCLUDED.invoiced, paid = EXCLUDED.paid,
+    entries = EXCLUDED.entries, last_entry_id = EXCLUDED.last_entry_id, updated_at = EXCLUDED.updated_at
+"""
+
+
+def summary(timings):
+    timings = sorted(timings)
+    return f'p50 {statistics.median(timings):.2f} мс, p95 {timings[int(len(timings) * 0.95)]:.2f} мс'
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполнение журнала расчётов (по умолчанию 50 млн проводок) с замерами выписки, '
+        'глубокой страницы и баланса после каждого шага. Запускать на отдельной БД.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50_000_000)
+        parser.add_argument('--steps', type=int, default=5, help='Сколько замеров по мере роста журнала')
+        parser.add_argument('--batch', type=int, default=1_000_000, help='Строк на один INSERT ... SELECT')
+        parser.add_argument('--clients', type=int, default=10_000)
+        parser.add_argument('--months', type=int, default=24, help='За сколько месяцев распределить проводки')
+        parser.add_argument('--samples', type=int, default=200, help='Запросов на каждый замер')
+        parser.add_argument('--deep', type=int, default=1000, help='Позиция в выписке для замера глубокой страницы')
+
+    def handle(self, *args, **options):
+        missing = options['clients'] - Client.objects.filter(username__startswith='seed_').count()
+        if missing > 0:
+            call_command('seed_clients', missing, stdout=self.stdout)
+        # Только синтетические клиенты seed_*: реальные балансы не трогаем
+        clients = list(
+            Client.objects.filter(username__startswith='seed_')
+            .order_by('id').values_list('id', flat=True)[:options['clients']]
+        )
+
+        now = timezone.now()
+        since = now - timedelta(days=30 * options['months'])
+        ensure_partitions(since)
+        with connection.cursor() as cursor:
+            cursor.execute(ENSURE_BALANCES_SQL, {'clients': clients})
+
+        admin = Client.objects.filter(is_staff=True).first() or Client.objects.first()
+        admin.is_staff = True
+        self.factory = APIRequestFactory()
+        self.admin = admin
+
+        step_rows = options['rows'] // options['steps']
+        inserted = 0
+        for step in range(1, options['steps'] + 1):
+            started = time.perf_counter()
+            target = step_rows * step if step < options['steps'] else options['rows']
+            while inserted < target:
+                batch = min(options['batch'], target - inserted)
+                with connection.cursor() as cursor:
+                    cursor.execute(SEED_SQL, {
+                        'since': since, 'span': (now - since).total_seconds(),
+                        'clients': clients, 'count': len(clients), 'batch': batch,
+                    })
+                inserted += batch
+                self.stdout.write(f'\rДобавлено {inserted}/{options["rows"]}', ending='')
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE payments_ledgerentry')
+            self.stdout.write(f'\nШаг {step}: +{step_rows} строк за {time.perf_counter() - started:.1f} с')
+            self.measure(random.sample(clients, min(options['samples'], len(clients))), options['deep'])
+
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(REBUILD_BALANCES_SQL, {'clients': clients})
+        self.stdout.write(f'Балансы пересчитаны по журналу за {time.perf_counter() - started:.1f} с')
+
+    def request(self, view, url):
+        request = self.factory.get(url)
+        force_authenticate(request, user=self.admin)
+        started = time.perf_counter()
+        response = view(request)
+        response.render()
+        elapsed = (time.perf_counter() - started) * 1000
+        assert response.status_code == 200, response.data
+        return elapsed
+
+    def measure(self, sample, deep):
+        ledger_view = LedgerListView.as_view()
+        balance_view = BalanceView.as_view()
+        pagination = LedgerPagination()
+        first_page, deep_page, balance, full_sum = [], [], [], []
+
+        for client_id in sample:
+            first_page.append(self.request(ledger_view, f'/?client={client_id}'))
+
+            row = (
+                LedgerEntry.objects.filter(client_id=client_id)
+                .order_by(*pagination.ordering).only('id', 'created_at')[deep:deep + 1]
+            )
+            row = list(row)
+            if row:
+                cursor = pagination.encode_cursor(row[0])
+                deep_page.append(self.request(ledger_view, f'/?client={client_id}&cursor={cursor}'))
+
+            balance.append(self.request(balance_view, f'/?client={client_id}'))
+
+            # Для сравнения: баланс как SUM по всей истории клиента
+            started = time.perf_counter()
+            LedgerEntry.objects.filter(client_id=client_id).aggregate(Sum('amount'))
+            full_sum.append((time.perf_counter() - started) * 1000)
+
+        self.stdout.write(f'  выписка, 1-я страница: {summary(first_page)}')
+        if deep_page:
+            self.stdout.write(f'  выписка, с позиции {deep}: {summary(deep_page)}')
+        self.stdout.write(f'  баланс (ClientBalance):  {summary(balance)}')
+        self.stdout.write(f'  SUM по журналу:          {summary(full_sum)}')
@@ -0,0 +1,122 @@
+import random
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from payments.models import ClientBalance, LedgerEntry
+from payments.views import PostingView
+from users.models import Client
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Конкурентные проводки через PostingView: N писателей на небольшом наборе "горячих" '
+        'клиентов и для сравнения на разных клиентах; доля повторов с тем же Idempotency-Key. '
+        'Проверяет, что балансы сходятся с журналом и повторы не создали проводок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=64)
+        parser.add_argument('--postings', type=int, default=200, help='Проводок на одного писателя')
+        parser.add_argument('--hot', type=int, default=4, help='Сколько горячих клиентов')
+        parser.add_argument('--retry-ratio', type=float, default=0.1, help='Доля запросов, отправляемых повторно')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Бенчмарк блокировок имеет смысл только на PostgreSQL')
+        clients = list(
+            Client.objects.filter(username__startswith='seed_')
+            .order_by('id').values_list('id', flat=True)[:max(options['writers'], options['hot'])]
+        )
+        if len(clients) < options['writers']:
+            raise CommandError(f"Нужно не меньше {options['writers']} клиентов seed_* (manage.py seed_clients)")
+
+        self.admin = Client.objects.filter(is_staff=True).first() or Client.objects.first()
+        self.admin.is_staff = True
+
+        for name, targets in (('горячие клиенты', clients[:options['hot']]), ('разные клиенты', clients)):
+            self.run_scenario(name, targets, options)
+
+    def run_scenario(self, name, targets, options):
+        writers = options['writers']
+        before = self.snapshot(targets)
+        barrier = threading.Barrier(writers)
+        view = PostingView.as_view()
+        factory = APIRequestFactory()
+
+        def writer(number):
+            rng = random.Random(number)
+            latencies, statuses, sent = [], {}, 0
+            barrier.wait()
+            try:
+                for _ in range(options['postings']):
+                    body = {
+                        'client': targets[number % len(targets)] if len(targets) >= writers else rng.choice(targets),
+                        'kind': 'payment',
+                        'amount': rng.randint(100, 10_000_000),
+                        'reference': f'bench-{number}',
+                    }
+                    key = str(uuid.uuid4())
+                    attempts = 2 if rng.random() < options['retry_ratio'] else 1
+                    for _ in range(attempts):
+                        request = factory.post('/', body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+                        force_authenticate(request, user=self.admin)
+                        started = time.perf_counter()
+                        response = view(request)
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                    sent += 1
+            finally:
+                connection.close()
+            return latencies, statuses, sent
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=writers) as pool:
+            results = list(pool.map(writer, range(writers)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(value for result in results for value in result[0])
+        statuses = {}
+        for result in results:
+            for code, count in result[1].items():
+                statuses[code] = statuses.get(code, 0) + count
+        unique = sum(result[2] for result in results)
+
+        after = self.snapshot(targets)
+        new_entries = after['entries'] - before['entries']
+        self.stdout.write(
+            f'{name} ({len(targets)}): {len(latencies) / elapsed:.0f} запросов/с, '
+            f'p50 {statistics.median(latencies):.1f} мс, p95 {percentile(latencies, 0.95):.1f} мс, '
+            f'p99 {percentile(latencies, 0.99):.1f} мс, статусы {statuses}'
+        )
+        self.stdout.write(
+            f'  уникальных запросов {unique}, новых проводок {new_entries}, '
+            f'баланс = сумме журнала: {after["balances"] == after["ledger"]}'
+        )
+        if new_entries != unique or after['balances'] != after['ledger']:
+            raise CommandError('Нарушена идемпотентность или баланс разошёлся с журналом')
+
+    def snapshot(self, targets):
+        ledger = dict(
+            LedgerEntry.objects.filter(client_id__in=targets)
+            .values_list('client_id').annotate(total=Sum('amount')).values_list('client_id', 'total')
+        )
+        counts = (
+            LedgerEntry.objects.filter(client_id__in=targets)
+            .aggregate(count=Count('id'))['count']
+        )
+        balances = dict(
+            ClientBalance.objects.filter(client_id__in=targets, entries__gt=0).values_list('client_id', 'balance')
+        )
+        return {'ledger': ledger, 'balances': balances, 'entries': counts}
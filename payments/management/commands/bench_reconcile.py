@@ -0,0 +1,121 @@
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from payments.models import Invoice
+from payments.reconciliation import Reconciler, iter_1c
+from users.models import Client
+
+PURPOSES = (
+    'Оплата по счёту {number} за услуги электронного документооборота',
+    'Оплата за подключение к ЭДО по счету {number}, НДС не облагается',
+    'Абонентская плата ЭДО, счёт {number}',
+)
+
+
+def document_1c(number, amount, inn, purpose):
+    return (
+        'СекцияДокумент=Платежное поручение\n'
+        f'Номер={number}\n'
+        'Дата=01.10.2026\n'
+        f'Сумма={amount // 100}.{amount % 100:02d}\n'
+        f'ПлательщикИНН={inn}\n'
+        f'НазначениеПлатежа={purpose}\n'
+        'КонецДокумента\n'
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверка синтетической выписки 1C (по умолчанию 100 тыс. строк) с открытыми счетами: '
+        'время этапов и сравнение с построчными запросами ORM. Запускать на отдельной БД.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=100_000)
+        parser.add_argument('--invoices', type=int, default=100_000)
+        parser.add_argument('--clients', type=int, default=20_000)
+        parser.add_argument('--baseline-sample', type=int, default=1000, help='Строк для замера построчного подхода')
+
+    def handle(self, *args, **options):
+        missing = options['clients'] - Client.objects.filter(username__startswith='seed_').count()
+        if missing > 0:
+            call_command('seed_clients', missing, stdout=self.stdout)
+        clients = list(
+            Client.objects.filter(username__startswith='seed_')
+            .order_by('id').values_list('id', 'inn')[:options['clients']]
+        )
+
+        tag = uuid.uuid4().hex[:8].upper()
+        started = time.perf_counter()
+        invoices = []
+        for number in range(options['invoices']):
+            client_id, inn = random.choice(clients)
+            invoices.append(Invoice(
+                client_id=client_id,
+                number=f'B{tag}-{number}',
+                amount=random.randint(1000, 500_000) * 100,
+                purpose='Услуги ЭДО',
+            ))
+        Invoice.objects.bulk_create(invoices, batch_size=5000)
+        self.stdout.write(f'Счетов создано: {len(invoices)} за {time.perf_counter() - started:.1f} с')
+        inn_by_client = dict(clients)
+
+        fd, path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w', encoding='cp1251') as f:
+            f.write('1CClientBankExchange\nВерсияФормата=1.03\nКодировка=Windows\n')
+            for line in range(options['lines']):
+                invoice = random.choice(invoices)
+                inn = inn_by_client[invoice.client_id]
+                purpose = random.choice(PURPOSES).format(number=invoice.number)
+                roll = random.random()
+                if roll < 0.6:
+                    amount = invoice.amount
+                elif roll < 0.8:
+                    # Частичная оплата: сопоставляется по номеру счёта в назначении
+                    amount = invoice.amount // 2
+                elif roll < 0.9:
+                    amount, purpose = random.randint(100, 100_000) * 100, 'Аванс'
+                else:
+                    inn, amount, purpose = '7700000000', random.randint(100, 100_000) * 100, 'Оплата'
+                f.write(document_1c(f'{line}', amount, inn, purpose))
+            f.write('КонецФайла\n')
+
+        try:
+            self.baseline(path, options['baseline_sample'], options['lines'])
+            for attempt in ('первая загрузка', 'повторная загрузка'):
+                started = time.perf_counter()
+                with open(path, encoding='cp1251') as source:
+                    statement = Reconciler().run(source, '1c', filename=f'bench-{tag}')
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{attempt}: {elapsed:.1f} с ({statement.lines_total / elapsed:.0f} строк/с); '
+                    f'точно {statement.matched_exact}, по назначению {statement.matched_fuzzy}, '
+                    f'без счёта {statement.unmatched}, неизвестный плательщик {statement.unknown_payer}, '
+                    f'дубликаты {statement.duplicates}; этапы, мс: {statement.timings}'
+                )
+        finally:
+            os.unlink(path)
+
+    def baseline(self, path, sample, total):
+        """Построчный подход: два запроса ORM на каждую строку выписки (без записи)"""
+        with open(path, encoding='cp1251') as source:
+            rows = [row for _, row in zip(range(sample), iter_1c(source))]
+        started = time.perf_counter()
+        for row in rows:
+            client = Client.objects.filter(inn=row.payer_inn).only('id').first()
+            if client is not None:
+                Invoice.objects.filter(
+                    client=client, status='open', amount=F('paid_amount') + row.amount,
+                ).only('id').first()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'построчно через ORM: {len(rows)} строк за {elapsed:.2f} с, '
+            f'оценка на {total} строк - {elapsed / max(len(rows), 1) * total:.0f} с'
+        )
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.partitions import PARTITIONS_AHEAD, PartitionError, ensure_partitions
+
+
+class Command(BaseCommand):
+    help = 'Создание месячных секций журнала расчётов заранее (запускать по расписанию)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=PARTITIONS_AHEAD, help='На сколько месяцев вперёд')
+        parser.add_argument('--since', help='С какого месяца (YYYY-MM), например для загрузки истории')
+
+    def handle(self, *args, **options):
+        start = datetime.strptime(options['since'], '%Y-%m') if options['since'] else None
+        try:
+            created = ensure_partitions(start, options['ahead'])
+        except PartitionError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Создано секций: {len(created)}{': ' + ', '.join(created) if created else ''}")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from payments.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Удаление просроченных ключей идемпотентности (запускать по расписанию)'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Удалено ключей: {purge_expired()}')
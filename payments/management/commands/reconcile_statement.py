@@ -0,0 +1,42 @@
+import codecs
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.reconciliation import PARSERS, Reconciler, StatementFormatError
+from payments.serializers import BankStatementSerializer
+
+
+class Command(BaseCommand):
+    help = 'Сверка банковской выписки (1C или CSV) с открытыми счетами и зачисление оплат'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=list(PARSERS), help='По умолчанию - по расширению (.csv или 1C)')
+        parser.add_argument('--encoding', help='По умолчанию windows-1251 для 1C и UTF-8 для CSV')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--dry-run', action='store_true', help='Только сопоставить, ничего не записывая')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else '1c')
+        encoding = options['encoding'] or ('cp1251' if fmt == '1c' else 'utf-8-sig')
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            raise CommandError(f'Неизвестная кодировка: {encoding}')
+
+        reconciler_kwargs = {'dry_run': options['dry_run']}
+        if options['batch_size']:
+            reconciler_kwargs['batch_size'] = options['batch_size']
+        started = time.perf_counter()
+        try:
+            with open(path, encoding=encoding, newline='') as source:
+                statement = Reconciler(**reconciler_kwargs).run(source, fmt, filename=os.path.basename(path))
+        except (OSError, StatementFormatError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(json.dumps(BankStatementSerializer(statement).data, ensure_ascii=False, indent=2))
+        self.stdout.write(f'Готово за {time.perf_counter() - started:.1f} с')
@@ -0,0 +1,135 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# Первичный ключ секционированной таблицы обязан включать ключ секционирования,
+# поэтому PK (id, created_at); id по-прежнему уникален (identity).
+# UPDATE и DELETE запрещены триггером - журнал только пополняется.
+CREATE_LEDGER = """
+CREATE TABLE payments_ledgerentry (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    kind varchar(20) NOT NULL,
+    amount bigint NOT NULL,
+    balance_after bigint NOT NULL,
+    reference varchar(100) NOT NULL,
+    purpose text NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    client_id bigint NOT NULL REFERENCES users_client (id) DEFERRABLE INITIALLY DEFERRED,
+    invoice_id bigint NULL REFERENCES payments_invoice (id) DEFERRABLE INITIALLY DEFERRED,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX ledger_client_created_idx ON payments_ledgerentry (client_id, created_at, id);
+CREATE INDEX payments_ledgerentry_invoice_id_idx ON payments_ledgerentry (invoice_id) WHERE invoice_id IS NOT NULL;
+
+CREATE TABLE payments_ledgerentry_default PARTITION OF payments_ledgerentry DEFAULT;
+
+CREATE FUNCTION payments_ledgerentry_append_only() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'payments_ledgerentry: % запрещён, журнал только пополняется', TG_OP;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER payments_ledgerentry_append_only
+    BEFORE UPDATE OR DELETE ON payments_ledgerentry
+    FOR EACH STATEMENT EXECUTE FUNCTION payments_ledgerentry_append_only();
+"""
+
+DROP_LEDGER = """
+DROP TABLE IF EXISTS payments_ledgerentry;
+DROP FUNCTION IF EXISTS payments_ledgerentry_append_only();
+"""
+
+
+def create_partitions(apps, schema_editor):
+    from payments.partitions import ensure_partitions
+
+    ensure_partitions(using=schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0003_client_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientBalance',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, primary_key=True, related_name='balance', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Клиент')),
+                ('balance', models.BigIntegerField(default=0, verbose_name='Баланс, коп.')),
+                ('invoiced', models.BigIntegerField(default=0, verbose_name='Выставлено счетов, коп.')),
+                ('paid', models.BigIntegerField(default=0, verbose_name='Оплачено, коп.')),
+                ('entries', models.PositiveBigIntegerField(default=0, verbose_name='Проводок')),
+                ('last_entry_id', models.BigIntegerField(blank=True, null=True, verbose_name='Последняя проводка')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Баланс клиента',
+                'verbose_name_plural': 'Балансы клиентов',
+            },
+        ),
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.CharField(max_length=50, unique=True, verbose_name='Номер счёта')),
+                ('amount', models.BigIntegerField(verbose_name='Сумма, коп.')),
+                ('paid_amount', models.BigIntegerField(default=0, verbose_name='Оплачено, коп.')),
+                ('purpose', models.TextField(blank=True, verbose_name='Назначение платежа')),
+                ('status', models.CharField(choices=[('open', 'Ожидает оплаты'), ('paid', 'Оплачен'), ('cancelled', 'Отменён')], default='open', max_length=20, verbose_name='Статус')),
+                ('issued_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата выставления')),
+                ('paid_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата оплаты')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='invoices', to=settings.AUTH_USER_MODEL, verbose_name='Клиент')),
+            ],
+            options={
+                'verbose_name': 'Счёт',
+                'verbose_name_plural': 'Счета',
+                'ordering': ['-issued_at'],
+            },
+        ),
+        migrations.SeparateDatabaseAndState(
+            # Секционированную таблицу Django создать не умеет - схема вручную
+            database_operations=[
+                migrations.RunSQL(CREATE_LEDGER, DROP_LEDGER),
+                migrations.RunPython(create_partitions, migrations.RunPython.noop),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='LedgerEntry',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('kind', models.CharField(choices=[('invoice', 'Счёт'), ('payment', 'Оплата'), ('refund', 'Возврат'), ('adjustment', 'Корректировка')], max_length=20, verbose_name='Тип')),
+                        ('amount', models.BigIntegerField(verbose_name='Сумма, коп.')),
+                        ('balance_after', models.BigIntegerField(verbose_name='Баланс после, коп.')),
+                        ('reference', models.CharField(blank=True, max_length=100, verbose_name='Номер платёжного документа')),
+                        ('purpose', models.TextField(blank=True, verbose_name='Назначение')),
+                        ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата проводки')),
+                        ('client', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to=settings.AUTH_USER_MODEL, verbose_name='Клиент')),
+                        ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to='payments.invoice', verbose_name='Счёт')),
+                    ],
+                    options={
+                        'verbose_name': 'Проводка',
+                        'verbose_name_plural': 'Журнал расчётов',
+                        'ordering': ['-created_at', '-id'],
+                        'indexes': [models.Index(fields=['client', 'created_at', 'id'], name='ledger_client_created_idx')],
+                    },
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['client', 'status'], name='payments_in_client__8fc948_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='invoice',
+            constraint=models.CheckConstraint(check=models.Q(('amount__gt', 0)), name='invoice_amount_positive'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('payments', '0002_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankStatement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(blank=True, max_length=255, verbose_name='Имя файла')),
+                ('format', models.CharField(choices=[('1c', '1C (1CClientBankExchange)'), ('csv', 'CSV')], max_length=10, verbose_name='Формат')),
+                ('lines_total', models.PositiveIntegerField(default=0, verbose_name='Строк')),
+                ('matched_exact', models.PositiveIntegerField(default=0, verbose_name='Точных совпадений')),
+                ('matched_fuzzy', models.PositiveIntegerField(default=0, verbose_name='Совпадений по назначению')),
+                ('unmatched', models.PositiveIntegerField(default=0, verbose_name='Без счёта')),
+                ('unknown_payer', models.PositiveIntegerField(default=0, verbose_name='Плательщик не клиент')),
+                ('duplicates', models.PositiveIntegerField(default=0, verbose_name='Уже загружены')),
+                ('timings', models.JSONField(blank=True, default=dict, verbose_name='Время этапов, мс')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Загрузил')),
+            ],
+            options={
+                'verbose_name': 'Банковская выписка',
+                'verbose_name_plural': 'Банковские выписки',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatementLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64, unique=True, verbose_name='Отпечаток')),
+                ('number', models.CharField(blank=True, max_length=50, verbose_name='Номер документа')),
+                ('date', models.DateField(blank=True, null=True, verbose_name='Дата')),
+                ('amount', models.BigIntegerField(verbose_name='Сумма, коп.')),
+                ('payer_inn', models.CharField(blank=True, max_length=12, verbose_name='ИНН плательщика')),
+                ('purpose', models.TextField(blank=True, verbose_name='Назначение платежа')),
+                ('status', models.CharField(choices=[('exact', 'Счёт найден по ИНН и сумме'), ('fuzzy', 'Счёт найден по назначению'), ('unmatched', 'Зачислено без счёта'), ('unknown', 'Плательщик не найден')], max_length=20, verbose_name='Результат')),
+                ('score', models.FloatField(blank=True, null=True, verbose_name='Сходство назначения')),
+                ('ledger_entry_id', models.BigIntegerField(blank=True, null=True, verbose_name='Проводка')),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='statement_lines', to='payments.invoice', verbose_name='Счёт')),
+                ('statement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='payments.bankstatement', verbose_name='Выписка')),
+            ],
+            options={
+                'verbose_name': 'Строка выписки',
+                'verbose_name_plural': 'Строки выписок',
+                'indexes': [models.Index(fields=['statement', 'status'], name='payments_st_stateme_2a6196_idx')],
+            },
+        ),
+    ]
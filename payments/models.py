@@ -1,3 +1,255 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class AppendOnlyError(Exception):
+    """Попытка изменить или удалить проводку журнала"""
+
+
+class Invoice(models.Model):
+    """Счёт клиенту. Суммы - в копейках"""
+
+    STATUS_CHOICES = [
+        ('open', _('Ожидает оплаты')),
+        ('paid', _('Оплачен')),
+        ('cancelled', _('Отменён')),
+    ]
+
+    client = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_('Клиент'),
+        on_delete=models.PROTECT,
+        related_name='invoices',
+    )
+    number = models.CharField(_('Номер счёта'), max_length=50, unique=True)
+    amount = models.BigIntegerField(_('Сумма, коп.'))
+    paid_amount = models.BigIntegerField(_('Оплачено, коп.'), default=0)
+    purpose = models.TextField(_('Назначение платежа'), blank=True)
+    status = models.CharField(_('Статус'), max_length=20, choices=STATUS_CHOICES, default='open')
+    issued_at = models.DateTimeField(_('Дата выставления'), default=timezone.now)
+    paid_at = models.DateTimeField(_('Дата оплаты'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Счёт')
+        verbose_name_plural = _('Счета')
+        ordering = ['-issued_at']
+        indexes = [
+            models.Index(fields=['client', 'status']),
+        ]
+        constraints = [
+            models.CheckConstraint(check=models.Q(amount__gt=0), name='invoice_amount_positive'),
+        ]
+
+    def __str__(self):
+        return self.number
+
+
+class LedgerEntry(models.Model):
+    """
+    Проводка журнала расчётов с клиентом. Только добавление: исправление -
+    это новая проводка (adjustment), а не UPDATE.
+
+    Сумма в копейках со знаком: счёт и возврат уменьшают баланс клиента,
+    оплата увеличивает. balance_after - баланс клиента после проводки.
+
+    В PostgreSQL таблица секционирована по месяцам created_at
+    (PRIMARY KEY (id, created_at)), UPDATE и DELETE запрещены триггером.
+    Схема создаётся миграцией 0001 вручную, секции - ensure_partitions.
+    """
+
+    KIND_CHOICES = [
+        ('invoice', _('Счёт')),
+        ('payment', _('Оплата')),
+        ('refund', _('Возврат')),
+        ('adjustment', _('Корректировка')),
+    ]
+
+    client = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_('Клиент'),
+        on_delete=models.PROTECT,
+        related_name='ledger_entries',
+        db_index=False,
+    )
+    kind = models.CharField(_('Тип'), max_length=20, choices=KIND_CHOICES)
+    amount = models.BigIntegerField(_('Сумма, коп.'))
+    balance_after = models.BigIntegerField(_('Баланс после, коп.'))
+    invoice = models.ForeignKey(
+        Invoice,
+        verbose_name=_('Счёт'),
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='ledger_entries',
+    )
+    reference = models.CharField(_('Номер платёжного документа'), max_length=100, blank=True)
+    purpose = models.TextField(_('Назначение'), blank=True)
+    created_at = models.DateTimeField(_('Дата проводки'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('Проводка')
+        verbose_name_plural = _('Журнал расчётов')
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Выписка клиента и курсорная пагинация по (created_at, id)
+            models.Index(fields=['client', 'created_at', 'id'], name='ledger_client_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.amount} ({self.client_id})'
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise AppendOnlyError('Проводки журнала не изменяются')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise AppendOnlyError('Проводки журнала не удаляются')
+
+
+class ClientBalance(models.Model):
+    """
+    Текущий баланс клиента - нарастающий итог журнала. Обновляется в той же
+    транзакции, что и проводка, поэтому баланс читается одной строкой,
+    без SUM по истории.
+    """
+
+    client = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_('Клиент'),
+        on_delete=models.PROTECT,
+        primary_key=True,
+        related_name='balance',
+    )
+    balance = models.BigIntegerField(_('Баланс, коп.'), default=0)
+    invoiced = models.BigIntegerField(_('Выставлено счетов, коп.'), default=0)
+    paid = models.BigIntegerField(_('Оплачено, коп.'), default=0)
+    entries = models.PositiveBigIntegerField(_('Проводок'), default=0)
+    last_entry_id = models.BigIntegerField(_('Последняя проводка'), null=True, blank=True)
+    updated_at = models.DateTimeField(_('Дата изменения'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Баланс клиента')
+        verbose_name_plural = _('Балансы клиентов')
+
+    def __str__(self):
+        return f'{self.client_id}: {self.balance}'
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ответ на запрос с заголовком Idempotency-Key. Сохраняется в той же
+    транзакции, что и проводки: повтор запроса получает тот же ответ,
+    а не вторую проводку. Хранится PAYMENTS_IDEMPOTENCY_TTL секунд.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_('Отправитель'),
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    key = models.CharField(_('Ключ'), max_length=255)
+    # SHA-256 тела запроса: тот же ключ с другим телом - ошибка клиента
+    request_hash = models.CharField(_('Хэш запроса'), max_length=64)
+    response_status = models.PositiveSmallIntegerField(_('Код ответа'), null=True, blank=True)
+    response_body = models.JSONField(_('Ответ'), null=True, blank=True)
+    created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
+    expires_at = models.DateTimeField(_('Действует до'), db_index=True)
+
+    class Meta:
+        verbose_name = _('Ключ идемпотентности')
+        verbose_name_plural = _('Ключи идемпотентности')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_key_unique'),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class BankStatement(models.Model):
+    """Загруженная банковская выписка и итоги её сверки со счетами"""
+
+    FORMAT_CHOICES = [
+        ('1c', _('1C (1CClientBankExchange)')),
+        ('csv', _('CSV')),
+    ]
+
+    filename = models.CharField(_('Имя файла'), max_length=255, blank=True)
+    format = models.CharField(_('Формат'), max_length=10, choices=FORMAT_CHOICES)
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_('Загрузил'),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    lines_total = models.PositiveIntegerField(_('Строк'), default=0)
+    matched_exact = models.PositiveIntegerField(_('Точных совпадений'), default=0)
+    matched_fuzzy = models.PositiveIntegerField(_('Совпадений по назначению'), default=0)
+    unmatched = models.PositiveIntegerField(_('Без счёта'), default=0)
+    unknown_payer = models.PositiveIntegerField(_('Плательщик не клиент'), default=0)
+    duplicates = models.PositiveIntegerField(_('Уже загружены'), default=0)
+    # Время этапов в миллисекундах: {'load': ..., 'match': ..., 'write': ...}
+    timings = models.JSONField(_('Время этапов, мс'), default=dict, blank=True)
+    created_at = models.DateTimeField(_('Дата загрузки'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Банковская выписка')
+        verbose_name_plural = _('Банковские выписки')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.filename or f'Выписка {self.pk}'
+
+
+class StatementLine(models.Model):
+    """
+    Строка выписки и результат её сверки. fingerprint - SHA-256 реквизитов
+    платежа: повторная загрузка той же выписки не проводит оплату дважды.
+    """
+
+    STATUS_CHOICES = [
+        ('exact', _('Счёт найден по ИНН и сумме')),
+        ('fuzzy', _('Счёт найден по назначению')),
+        ('unmatched', _('Зачислено без счёта')),
+        ('unknown', _('Плательщик не найден')),
+    ]
+
+    statement = models.ForeignKey(
+        BankStatement,
+        verbose_name=_('Выписка'),
+        on_delete=models.CASCADE,
+        related_name='lines',
+    )
+    fingerprint = models.CharField(_('Отпечаток'), max_length=64, unique=True)
+    number = models.CharField(_('Номер документа'), max_length=50, blank=True)
+    date = models.DateField(_('Дата'), null=True, blank=True)
+    amount = models.BigIntegerField(_('Сумма, коп.'))
+    payer_inn = models.CharField(_('ИНН плательщика'), max_length=12, blank=True)
+    purpose = models.TextField(_('Назначение платежа'), blank=True)
+    status = models.CharField(_('Результат'), max_length=20, choices=STATUS_CHOICES)
+    invoice = models.ForeignKey(
+        Invoice,
+        verbose_name=_('Счёт'),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='statement_lines',
+    )
+    score = models.FloatField(_('Сходство назначения'), null=True, blank=True)
+    ledger_entry_id = models.BigIntegerField(_('Проводка'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Строка выписки')
+        verbose_name_plural = _('Строки выписок')
+        indexes = [
+            models.Index(fields=['statement', 'status']),
+        ]
+
+    def __str__(self):
+        return f'{self.number} {self.payer_inn} {self.amount}'
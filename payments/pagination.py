@@ -0,0 +1,14 @@
+from users.api.pagination import KeysetPagination
+
+
+class LedgerPagination(KeysetPagination):
+    """Выписка клиента по (created_at, id) по убыванию - индекс ledger_client_created_idx"""
+    date_field = 'created_at'
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    max_page_size = 500
+
+    def filter_after(self, queryset, date, pk):
+        # Сравнение строк партиции не отсекает: отдельное created_at <= d лишнее по смыслу,
+        # но по нему планировщик не читает партиции месяцев новее курсора
+        return super().filter_after(queryset, date, pk).filter(created_at__lte=date)
@@ -0,0 +1,83 @@
+"""
+Помесячные секции журнала расчётов (payments_ledgerentry).
+
+Секция payments_ledgerentry_yYYYYmMM покрывает [1-е число месяца, 1-е число
+следующего) по UTC. Секции создаются заранее (миграция, manage.py
+create_ledger_partitions по расписанию); строки вне созданных месяцев
+попадают в payments_ledgerentry_default.
+"""
+
+from datetime import date, datetime, timezone
+
+from django.conf import settings
+from django.db import connection
+
+LEDGER_TABLE = 'payments_ledgerentry'
+DEFAULT_PARTITION = f'{LEDGER_TABLE}_default'
+PARTITIONS_AHEAD = getattr(settings, 'LEDGER_PARTITIONS_AHEAD', 3)
+
+
+class PartitionError(Exception):
+    """Секцию нельзя создать: строки этого месяца уже лежат в секции по умолчанию"""
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{LEDGER_TABLE}_y{month.year}m{month.month:02d}'
+
+
+def _bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc).isoformat()
+
+
+def existing_partitions(using=connection):
+    with using.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [LEDGER_TABLE],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def create_partition(month, using=connection):
+    """Секция на месяц; False - уже существует"""
+    name = partition_name(month)
+    if name in existing_partitions(using):
+        return False
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    with using.cursor() as cursor:
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s)',
+            [lower, upper],
+        )
+        if cursor.fetchone()[0]:
+            raise PartitionError(f'{name}: проводки за этот месяц уже лежат в {DEFAULT_PARTITION}')
+        cursor.execute(
+            f"CREATE TABLE {name} PARTITION OF {LEDGER_TABLE} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        )
+    return True
+
+
+def ensure_partitions(start=None, months_ahead=PARTITIONS_AHEAD, using=connection):
+    """Секции с месяца start (по умолчанию текущего) на months_ahead месяцев вперёд"""
+    month = month_start(start or datetime.now(timezone.utc))
+    end = add_months(month_start(datetime.now(timezone.utc)), months_ahead)
+    created = []
+    while month <= end:
+        if create_partition(month, using):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
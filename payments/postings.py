@@ -0,0 +1,116 @@
+"""
+Проводки от банковской интеграции: разрешение клиентов и счетов пачкой
+и импорт выписки пачками с отдельным коммитом на каждую.
+
+Каждая пачка импорта идемпотентна сама по себе (ключ <Idempotency-Key>:<номер>):
+повтор того же файла после обрыва пропускает уже проведённые пачки
+и продолжает с первой непроведённой.
+"""
+
+from itertools import islice
+
+from django.conf import settings
+from rest_framework import status
+
+from users.models import Client
+
+from .idempotency import request_fingerprint, run_idempotent
+from .ledger import post_entries
+from .models import Invoice
+from .serializers import PostingSerializer
+
+POSTING_BATCH_SIZE = getattr(settings, 'PAYMENTS_POSTING_BATCH_SIZE', 500)
+
+
+def resolve_postings(items):
+    """
+    Проверенные PostingSerializer данные -> [(проводка для post_entries или None, ошибки)].
+    Клиенты и счета всей пачки ищутся двумя запросами.
+    """
+    ids = {item['client'] for item in items if 'client' in item}
+    inns = {item['inn'] for item in items if 'inn' in item}
+    numbers = {item['invoice'] for item in items if item.get('invoice')}
+
+    known_ids = set(Client.objects.filter(id__in=ids).values_list('id', flat=True)) if ids else set()
+    by_inn = dict(Client.objects.filter(inn__in=inns).values_list('inn', 'id')) if inns else {}
+    invoices = {
+        number: (pk, client_id)
+        for number, pk, client_id in Invoice.objects.filter(number__in=numbers).values_list('number', 'id', 'client_id')
+    } if numbers else {}
+
+    resolved = []
+    for item in items:
+        client_id = item['client'] if 'client' in item else by_inn.get(item['inn'])
+        if client_id is None or ('client' in item and client_id not in known_ids):
+            resolved.append((None, ['Клиент не найден']))
+            continue
+        invoice_id = None
+        if item.get('invoice'):
+            invoice_id, invoice_client = invoices.get(item['invoice'], (None, None))
+            if invoice_id is None or invoice_client != client_id:
+                resolved.append((None, [f"Счёт {item['invoice']} клиента не найден"]))
+                continue
+        resolved.append(({
+            'client_id': client_id,
+            'kind': item['kind'],
+            'amount': item['amount'],
+            'invoice_id': invoice_id,
+            'reference': item.get('reference', ''),
+            'purpose': item.get('purpose', ''),
+        }, []))
+    return resolved
+
+
+def _clean(record):
+    # Пустые колонки CSV - это отсутствующие поля, а не пустые значения
+    return {key: value for key, value in record.items() if value not in ('', None)}
+
+
+class PostingImporter:
+    """Импорт проводок из выписки: пачка - одна транзакция и один ключ идемпотентности"""
+
+    def __init__(self, batch_size=POSTING_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def post_batch(self, numbered):
+        errors = []
+        valid = []
+        for number, record in numbered:
+            if '__error__' in record:
+                errors.append({'row': number, 'errors': [record['__error__']]})
+                continue
+            serializer = PostingSerializer(data=_clean(record))
+            if not serializer.is_valid():
+                errors.append({'row': number, 'errors': serializer.errors})
+                continue
+            valid.append((number, serializer.validated_data))
+
+        postings = []
+        for (number, _), (posting, posting_errors) in zip(valid, resolve_postings([data for _, data in valid])):
+            if posting_errors:
+                errors.append({'row': number, 'errors': posting_errors})
+            else:
+                postings.append(posting)
+        if postings:
+            post_entries(postings)
+        return status.HTTP_200_OK, {'posted': len(postings), 'errors': errors}
+
+    def run(self, user_id, key, records):
+        numbered = enumerate(records, start=1)
+        total = posted = failed = replayed = 0
+        index = 0
+        while True:
+            batch = list(islice(numbered, self.batch_size))
+            if not batch:
+                break
+            index += 1
+            total += len(batch)
+            _, body, was_replayed = run_idempotent(
+                user_id, f'{key}:{index}', request_fingerprint(batch), lambda: self.post_batch(batch),
+            )
+            replayed += was_replayed
+            posted += body['posted']
+            failed += len(body['errors'])
+            yield from body['errors']
+
+        yield {'summary': {'total': total, 'posted': posted, 'failed': failed, 'replayed_batches': replayed}}
@@ -0,0 +1,307 @@
+"""
+Сверка банковской выписки с открытыми счетами.
+
+1. Открытые счета загружаются одним запросом (с ИНН клиента через JOIN)
+   в хэш-индексы: (ИНН, остаток к оплате) -> счета и ИНН -> счета.
+2. Выписка (1C или CSV) сначала разбирается целиком: битая строка или
+   кодировка отклоняет файл до первой проводки, а не после части оплат.
+   Для каждой строки ищется точное совпадение по (ИНН плательщика, сумма),
+   затем - счёт того же клиента с похожим назначением платежа (номер
+   счёта, общие слова).
+3. Результаты пишутся пачками: StatementLine через bulk_create, оплаты -
+   через ledger.post_entries (балансы и статусы счетов обновляются там же).
+
+Никаких запросов к БД на отдельную строку выписки: 100 тыс. строк - это
+несколько сотен запросов, а не сотни тысяч.
+"""
+
+import csv
+import hashlib
+import re
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+
+from users.models import Client
+
+from .ledger import post_entries
+from .models import BankStatement, Invoice, StatementLine
+
+RECONCILE_BATCH_SIZE = getattr(settings, 'PAYMENTS_RECONCILE_BATCH_SIZE', 5000)
+# Минимальное сходство назначения платежа для сопоставления без точной суммы
+FUZZY_THRESHOLD = getattr(settings, 'PAYMENTS_RECONCILE_FUZZY_THRESHOLD', 0.5)
+# ИНН нашей организации: исходящие платежи в выписке пропускаются
+OWN_INN = getattr(settings, 'PAYMENTS_OWN_INN', '')
+
+TOKEN_RE = re.compile(r'[0-9A-ZА-Я]+(?:[-/][0-9A-ZА-Я]+)*')
+# Слова, которые есть почти в каждом назначении и ничего не различают
+STOP_WORDS = {
+    'ОПЛАТА', 'ПО', 'СЧЕТУ', 'СЧЕТ', 'СЧ', 'ОТ', 'ЗА', 'В', 'Т', 'Ч', 'НДС', 'БЕЗ', 'СУММА',
+    'ДОГОВОРУ', 'ДОГ', 'N', 'Г', 'РУБ', 'КОП',
+}
+
+# Результат сверки строки -> счётчик в BankStatement
+STATUS_COUNTERS = {
+    'exact': 'matched_exact',
+    'fuzzy': 'matched_fuzzy',
+    'unmatched': 'unmatched',
+    'unknown': 'unknown_payer',
+}
+
+StatementRow = namedtuple('StatementRow', 'row number date amount payer_inn purpose')
+OpenInvoice = namedtuple('OpenInvoice', 'id number client_id inn outstanding tokens')
+
+
+class StatementFormatError(ValueError):
+    """Строка или файл выписки не разбирается"""
+
+
+def parse_amount(value):
+    """'1 234,56' / '1234.56' -> 123456 копеек"""
+    try:
+        amount = Decimal(value.replace('\xa0', '').replace(' ', '').replace(',', '.'))
+    except (InvalidOperation, AttributeError):
+        raise StatementFormatError(f'Некорректная сумма: {value!r}')
+    return int((amount * 100).to_integral_value())
+
+
+def parse_date(value):
+    for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def tokens(text):
+    normalized = text.upper().replace('Ё', 'Е')
+    return {token for token in TOKEN_RE.findall(normalized) if token not in STOP_WORDS}
+
+
+def _row_amount(row, value):
+    try:
+        return parse_amount(value)
+    except StatementFormatError as e:
+        raise StatementFormatError(f'Строка {row}: {e}')
+
+
+def iter_1c(lines):
+    """Документы из файла обмена 1CClientBankExchange"""
+    document = None
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if line.startswith('СекцияДокумент'):
+            document = {'__row__': number}
+        elif line == 'КонецДокумента' and document is not None:
+            yield StatementRow(
+                row=document['__row__'],
+                number=document.get('Номер', ''),
+                date=parse_date(document.get('Дата', '')),
+                amount=_row_amount(document['__row__'], document.get('Сумма', '')),
+                payer_inn=document.get('ПлательщикИНН', ''),
+                purpose=document.get('НазначениеПлатежа', ''),
+            )
+            document = None
+        elif document is not None and '=' in line:
+            key, _, value = line.partition('=')
+            document[key] = value
+
+
+def iter_statement_csv(lines):
+    """CSV с колонками number, date, amount, payer_inn, purpose"""
+    for number, record in enumerate(csv.DictReader(lines), start=2):
+        yield StatementRow(
+            row=number,
+            number=record.get('number', ''),
+            date=parse_date(record.get('date', '')),
+            amount=_row_amount(number, record.get('amount', '')),
+            payer_inn=(record.get('payer_inn') or '').strip(),
+            purpose=record.get('purpose', ''),
+        )
+
+
+PARSERS = {
+    '1c': iter_1c,
+    'csv': iter_statement_csv,
+}
+
+
+def line_fingerprint(row):
+    raw = f'{row.date}|{row.number}|{row.payer_inn}|{row.amount}|{row.purpose}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class InvoiceIndex:
+    """Открытые счета в памяти: по (ИНН, остаток) и по ИНН"""
+
+    def __init__(self):
+        self.by_amount = defaultdict(list)
+        self.by_inn = defaultdict(list)
+        self.clients = {}
+
+    @classmethod
+    def load(cls):
+        index = cls()
+        rows = (
+            Invoice.objects.filter(status='open')
+            .values_list('id', 'number', 'client_id', 'client__inn', 'amount', 'paid_amount', 'purpose')
+            .order_by('issued_at', 'id')
+            .iterator(chunk_size=10_000)
+        )
+        for pk, number, client_id, inn, amount, paid, purpose in rows:
+            number_key = number.upper().replace('Ё', 'Е')
+            invoice = OpenInvoice(pk, number_key, client_id, inn, amount - paid, tokens(f'{number} {purpose}'))
+            index.by_amount[(inn, invoice.outstanding)].append(invoice)
+            index.by_inn[inn].append(invoice)
+            index.clients[inn] = client_id
+        return index
+
+    def resolve_clients(self, inns):
+        """
+        Плательщики без открытых счетов тоже могут быть клиентами - оплата
+        зачисляется на баланс. Неизвестные ИНН пачки ищутся одним запросом.
+        """
+        missing = {inn for inn in inns if inn not in self.clients}
+        if not missing:
+            return
+        found = dict(Client.objects.filter(inn__in=missing).values_list('inn', 'id'))
+        for inn in missing:
+            self.clients[inn] = found.get(inn)
+
+    def remove(self, invoice):
+        self.by_amount[(invoice.inn, invoice.outstanding)].remove(invoice)
+        self.by_inn[invoice.inn].remove(invoice)
+
+    def match(self, row):
+        """(счёт или None, статус, сходство)"""
+        row_tokens = tokens(row.purpose)
+        exact = self.by_amount.get((row.payer_inn, row.amount))
+        if exact:
+            # Несколько счетов на ту же сумму - предпочитаем тот, чей номер в назначении
+            invoice = next((inv for inv in exact if inv.number in row_tokens), exact[0])
+            self.remove(invoice)
+            return invoice, 'exact', None
+
+        best, best_score = None, 0.0
+        for invoice in self.by_inn.get(row.payer_inn, ()):
+            if invoice.number in row_tokens:
+                score = 1.0
+            elif invoice.tokens and row_tokens:
+                score = len(invoice.tokens & row_tokens) / len(invoice.tokens | row_tokens)
+            else:
+                score = 0.0
+            if score > best_score:
+                best, best_score = invoice, score
+        if best is not None and best_score >= FUZZY_THRESHOLD:
+            self.remove(best)
+            if best.outstanding > row.amount:
+                # Частичная оплата: остаток счёта снова доступен для сверки
+                rest = best._replace(outstanding=best.outstanding - row.amount)
+                self.by_amount[(rest.inn, rest.outstanding)].append(rest)
+                self.by_inn[rest.inn].append(rest)
+            return best, 'fuzzy', round(best_score, 3)
+
+        if self.clients.get(row.payer_inn) is not None:
+            return None, 'unmatched', None
+        return None, 'unknown', None
+
+
+class Reconciler:
+    """Сверка одной выписки; результат - BankStatement с итогами"""
+
+    def __init__(self, batch_size=RECONCILE_BATCH_SIZE, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.timings = defaultdict(float)
+
+    def _timed(self, stage, started):
+        self.timings[stage] += (time.perf_counter() - started) * 1000
+
+    def run(self, lines, fmt, filename='', user_id=None):
+        if fmt not in PARSERS:
+            raise StatementFormatError(f'Неизвестный формат выписки: {fmt}')
+
+        started = time.perf_counter()
+        index = InvoiceIndex.load()
+        self._timed('load', started)
+
+        # StatementFormatError и UnicodeDecodeError - до сохранения выписки и проводок
+        started = time.perf_counter()
+        rows = [row for row in PARSERS[fmt](lines) if not OWN_INN or row.payer_inn != OWN_INN]
+        self._timed('parse', started)
+
+        statement = BankStatement(filename=filename, format=fmt, uploaded_by_id=user_id)
+        if not self.dry_run:
+            statement.save()
+        counters = defaultdict(int)
+
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            counters['lines_total'] += len(batch)
+            self.process_batch(statement, batch, index, counters)
+
+        for field, value in counters.items():
+            setattr(statement, field, value)
+        statement.timings = {stage: round(value, 2) for stage, value in self.timings.items()}
+        if not self.dry_run:
+            statement.save()
+        return statement
+
+    def process_batch(self, statement, batch, index, counters):
+        started = time.perf_counter()
+        fingerprints = [line_fingerprint(row) for row in batch]
+        seen = set(
+            StatementLine.objects.filter(fingerprint__in=fingerprints).values_list('fingerprint', flat=True)
+        )
+        index.resolve_clients({row.payer_inn for row in batch})
+        self._timed('lookup', started)
+
+        started = time.perf_counter()
+        lines, postings = [], []
+        for row, fingerprint in zip(batch, fingerprints):
+            if fingerprint in seen:
+                counters['duplicates'] += 1
+                continue
+            # Одна и та же строка дважды в одном файле
+            seen.add(fingerprint)
+            invoice, status, score = index.match(row)
+            counters[STATUS_COUNTERS[status]] += 1
+            line = StatementLine(
+                statement=statement,
+                fingerprint=fingerprint,
+                number=row.number[:50],
+                date=row.date,
+                amount=row.amount,
+                payer_inn=row.payer_inn[:12],
+                purpose=row.purpose,
+                status=status,
+                invoice_id=invoice.id if invoice else None,
+                score=score,
+            )
+            lines.append(line)
+            if status != 'unknown' and row.amount > 0:
+                postings.append((line, {
+                    'client_id': invoice.client_id if invoice else index.clients[row.payer_inn],
+                    'kind': 'payment',
+                    'amount': row.amount,
+                    'invoice_id': invoice.id if invoice else None,
+                    'reference': row.number[:100],
+                    'purpose': row.purpose,
+                }))
+        self._timed('match', started)
+
+        if self.dry_run or not lines:
+            return
+        started = time.perf_counter()
+        with transaction.atomic():
+            if postings:
+                entries = post_entries([posting for _, posting in postings])
+                for (line, _), entry in zip(postings, entries):
+                    line.ledger_entry_id = entry.pk
+            StatementLine.objects.bulk_create(lines, batch_size=self.batch_size)
+        self._timed('write', started)
@@ -0,0 +1,60 @@
+from rest_framework import serializers
+
+from .ledger import signed_amount
+from .models import BankStatement, ClientBalance, LedgerEntry
+
+# Счета выставляются отдельно (ledger.issue_invoice), не через проводки
+POSTING_KINDS = ('payment', 'refund', 'adjustment')
+
+
+class LedgerEntrySerializer(serializers.ModelSerializer):
+    """Проводка журнала; суммы в копейках"""
+
+    class Meta:
+        model = LedgerEntry
+        fields = ('id', 'kind', 'amount', 'balance_after', 'invoice', 'reference', 'purpose', 'created_at')
+        read_only_fields = fields
+
+
+class ClientBalanceSerializer(serializers.ModelSerializer):
+    """Текущий баланс клиента; суммы в копейках"""
+
+    class Meta:
+        model = ClientBalance
+        fields = ('client', 'balance', 'invoiced', 'paid', 'entries', 'last_entry_id', 'updated_at')
+        read_only_fields = fields
+
+
+class PostingSerializer(serializers.Serializer):
+    """
+    Проводка от банковской интеграции. Клиент - по id или ИНН,
+    счёт - по номеру; сумма в копейках.
+    """
+    client = serializers.IntegerField(required=False)
+    inn = serializers.RegexField(
+        r'^(\d{10}|\d{12})$', required=False, error_messages={'invalid': 'ИНН - 10 или 12 цифр'},
+    )
+    kind = serializers.ChoiceField(choices=POSTING_KINDS)
+    amount = serializers.IntegerField()
+    invoice = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    purpose = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate(self, attrs):
+        if ('client' in attrs) == ('inn' in attrs):
+            raise serializers.ValidationError('Укажите клиента: client или inn')
+        try:
+            signed_amount(attrs['kind'], attrs['amount'])
+        except ValueError as e:
+            raise serializers.ValidationError({'amount': str(e)})
+        return attrs
+
+
+class BankStatementSerializer(serializers.ModelSerializer):
+    """Итоги сверки выписки"""
+
+    class Meta:
+        model = BankStatement
+        fields = ('id', 'filename', 'format', 'lines_total', 'matched_exact', 'matched_fuzzy',
+                  'unmatched', 'unknown_payer', 'duplicates', 'timings', 'created_at')
+        read_only_fields = fields
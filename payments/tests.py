@@ -1,3 +1,228 @@
+from datetime import date, timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import Client
+from users.serializers import get_tokens_for_user
+
+from .idempotency import IdempotencyConflict, request_fingerprint, run_idempotent
+from .ledger import issue_invoice, post_entries, record_payment
+from .models import BankStatement, ClientBalance, IdempotencyKey, Invoice, LedgerEntry, StatementLine
+from .postings import PostingImporter
+from .reconciliation import InvoiceIndex, StatementRow
+
+
+def make_client(username, inn):
+    return Client.objects.create(username=username, inn=inn, legal_address='г. Москва', phone='+79990000000')
+
+
+class IdempotencyTests(TestCase):
+
+    def setUp(self):
+        self.client_obj = make_client('payer', '7701000001')
+        self.calls = 0
+
+    def handler(self):
+        self.calls += 1
+        return 201, {'call': self.calls}
+
+    def run_key(self, key, data, handler=None):
+        return run_idempotent(self.client_obj.pk, key, request_fingerprint(data), handler or self.handler)
+
+    def test_replay_returns_saved_response(self):
+        self.assertEqual(self.run_key('k1', {'amount': 100}), (201, {'call': 1}, False))
+        self.assertEqual(self.run_key('k1', {'amount': 100}), (201, {'call': 1}, True))
+        self.assertEqual(self.calls, 1)
+
+    def test_same_key_with_other_body_conflicts(self):
+        self.run_key('k1', {'amount': 100})
+        with self.assertRaises(IdempotencyConflict):
+            self.run_key('k1', {'amount': 200})
+        self.assertEqual(self.calls, 1)
+
+    def test_failed_handler_releases_key(self):
+        def failing():
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            self.run_key('k1', {'amount': 100}, failing)
+        self.assertFalse(IdempotencyKey.objects.filter(key='k1').exists())
+        self.assertEqual(self.run_key('k1', {'amount': 100}), (201, {'call': 1}, False))
+
+    def test_expired_key_runs_again(self):
+        self.run_key('k1', {'amount': 100})
+        IdempotencyKey.objects.filter(key='k1').update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.run_key('k1', {'amount': 200}), (201, {'call': 2}, False))
+
+
+class PostEntriesTests(TestCase):
+
+    def setUp(self):
+        self.client_obj = make_client('payer', '7701000001')
+        self.other = make_client('other', '7701000002')
+
+    def test_balance_follows_entries(self):
+        entries = post_entries([
+            {'client_id': self.client_obj.pk, 'kind': 'invoice', 'amount': 10000},
+            {'client_id': self.other.pk, 'kind': 'payment', 'amount': 500},
+            {'client_id': self.client_obj.pk, 'kind': 'payment', 'amount': 3000},
+            {'client_id': self.client_obj.pk, 'kind': 'adjustment', 'amount': -100},
+        ])
+        self.assertEqual([entry.amount for entry in entries], [-10000, 500, 3000, -100])
+        self.assertEqual([entry.balance_after for entry in entries], [-10000, 500, -7000, -7100])
+
+        balance = ClientBalance.objects.get(client=self.client_obj)
+        self.assertEqual((balance.balance, balance.invoiced, balance.paid, balance.entries), (-7100, 10000, 3000, 3))
+        self.assertEqual(balance.last_entry_id, entries[3].pk)
+        self.assertEqual(ClientBalance.objects.get(client=self.other).balance, 500)
+
+    def test_invalid_posting_writes_nothing(self):
+        with self.assertRaises(ValueError):
+            post_entries([
+                {'client_id': self.client_obj.pk, 'kind': 'payment', 'amount': 100},
+                {'client_id': self.client_obj.pk, 'kind': 'payment', 'amount': -5},
+            ])
+        self.assertFalse(LedgerEntry.objects.exists())
+        self.assertFalse(ClientBalance.objects.exists())
+
+    def test_payments_close_invoice(self):
+        invoice = issue_invoice(self.client_obj.pk, 'СЧ-1', 10000)
+        record_payment(self.client_obj.pk, 4000, invoice=invoice)
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.paid_amount, invoice.status, invoice.paid_at), (4000, 'open', None))
+
+        record_payment(self.client_obj.pk, 6000, invoice=invoice)
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.paid_amount, invoice.status), (10000, 'paid'))
+        self.assertIsNotNone(invoice.paid_at)
+        self.assertEqual(ClientBalance.objects.get(client=self.client_obj).balance, 0)
+
+
+class PostingImporterTests(TestCase):
+
+    def setUp(self):
+        self.client_obj = make_client('payer', '7701000001')
+        self.records = [
+            {'inn': '7701000001', 'kind': 'payment', 'amount': '100'},
+            {'inn': '7701000001', 'kind': 'payment', 'amount': '200'},
+            {'inn': '7709999999', 'kind': 'payment', 'amount': '300'},
+            {'client': str(self.client_obj.pk), 'kind': 'refund', 'amount': '50'},
+        ]
+
+    def run_import(self, records):
+        return list(PostingImporter(batch_size=2).run(self.client_obj.pk, 'statement-1', records))
+
+    def test_rerun_resumes_after_last_posted_batch(self):
+        # Обрыв после первой пачки: повтор того же файла не проводит её второй раз
+        first = self.run_import(self.records[:2])
+        self.assertEqual(first[-1]['summary'], {'total': 2, 'posted': 2, 'failed': 0, 'replayed_batches': 0})
+
+        events = self.run_import(self.records)
+        self.assertEqual(events[0], {'row': 3, 'errors': ['Клиент не найден']})
+        self.assertEqual(events[-1]['summary'], {'total': 4, 'posted': 3, 'failed': 1, 'replayed_batches': 1})
+        self.assertEqual(
+            sorted(LedgerEntry.objects.values_list('amount', flat=True)), [-50, 100, 200],
+        )
+        self.assertEqual(ClientBalance.objects.get(client=self.client_obj).balance, 250)
+
+    def test_changed_batch_conflicts(self):
+        self.run_import(self.records[:2])
+        changed = [dict(self.records[0], amount='101')] + self.records[1:]
+        with self.assertRaises(IdempotencyConflict):
+            self.run_import(changed)
+
+
+class InvoiceIndexTests(TestCase):
+
+    def setUp(self):
+        self.client_obj = make_client('payer', '7701000001')
+        make_client('no-invoices', '7701000002')
+        self.first = issue_invoice(self.client_obj.pk, 'СЧ-101', 10000, purpose='Услуги хостинга')
+        self.second = issue_invoice(self.client_obj.pk, 'СЧ-102', 10000, purpose='Поддержка')
+        Invoice.objects.filter(pk=self.second.pk).update(issued_at=timezone.now() + timedelta(minutes=1))
+        self.index = InvoiceIndex.load()
+        self.index.resolve_clients({'7701000001', '7701000002', '7709999999'})
+
+    def row(self, amount, payer_inn='7701000001', purpose=''):
+        return StatementRow(row=1, number='1', date=date(2026, 10, 1), amount=amount, payer_inn=payer_inn, purpose=purpose)
+
+    def test_exact_prefers_invoice_named_in_purpose(self):
+        invoice, status, score = self.index.match(self.row(10000, purpose='Оплата по счету СЧ-102'))
+        self.assertEqual((invoice.id, status, score), (self.second.pk, 'exact', None))
+        invoice, status, _ = self.index.match(self.row(10000))
+        self.assertEqual((invoice.id, status), (self.first.pk, 'exact'))
+        self.assertEqual(self.index.match(self.row(10000))[1], 'unmatched')
+
+    def test_fuzzy_by_purpose_words(self):
+        invoice, status, score = self.index.match(self.row(9000, purpose='За услуги хостинга'))
+        self.assertEqual((invoice.id, status, score), (self.first.pk, 'fuzzy', 0.667))
+
+    def test_partial_payment_leaves_rest_for_matching(self):
+        invoice, status, _ = self.index.match(self.row(4000, purpose='Оплата СЧ-101'))
+        self.assertEqual((invoice.id, status), (self.first.pk, 'fuzzy'))
+        invoice, status, _ = self.index.match(self.row(6000))
+        self.assertEqual((invoice.id, status, invoice.outstanding), (self.first.pk, 'exact', 6000))
+
+    def test_unmatched_and_unknown_payers(self):
+        self.assertEqual(self.index.match(self.row(777, purpose='Аванс')), (None, 'unmatched', None))
+        self.assertEqual(self.index.match(self.row(10000, payer_inn='7701000002')), (None, 'unmatched', None))
+        self.assertEqual(self.index.match(self.row(10000, payer_inn='7709999999')), (None, 'unknown', None))
+
+
+class StatementReconcileViewTests(TestCase):
+    """Загрузка выписки с JWT: request.user - ClientTokenUser, а не Client"""
+
+    url = '/api/payments/statements/'
+
+    def setUp(self):
+        self.admin = Client.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin-pass', inn='7800000000',
+        )
+        self.payer = make_client('payer', '7701000001')
+        self.invoice = issue_invoice(self.payer.pk, 'СЧ-101', 10000, purpose='Услуги хостинга')
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.admin)['access']}")
+
+    def post(self, body, query='?type=csv'):
+        return self.api.post(self.url + query, body.encode(), content_type='text/csv')
+
+    def test_reconciles_and_posts_payments(self):
+        response = self.post(
+            'number,date,amount,payer_inn,purpose\n'
+            '1,01.10.2026,100.00,7701000001,Оплата по счету СЧ-101\n'
+            '2,01.10.2026,5.00,7709999999,Аванс\n'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data['lines_total'], response.data['matched_exact'], response.data['unknown_payer']), (2, 1, 1),
+        )
+        statement = BankStatement.objects.get(pk=response.data['id'])
+        self.assertEqual(statement.uploaded_by_id, self.admin.pk)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, 'paid')
+
+        # Повторная загрузка той же выписки оплату второй раз не проводит
+        again = self.post('number,date,amount,payer_inn,purpose\n1,01.10.2026,100.00,7701000001,Оплата по счету СЧ-101\n')
+        self.assertEqual(again.data['duplicates'], 1)
+        self.assertEqual(ClientBalance.objects.get(client=self.payer).balance, 0)
+
+    def test_bad_row_rejects_whole_file(self):
+        response = self.post(
+            'number,date,amount,payer_inn,purpose\n'
+            '1,01.10.2026,100.00,7701000001,СЧ-101\n'
+            '2,01.10.2026,abc,7701000001,СЧ-101\n'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(BankStatement.objects.exists())
+        self.assertFalse(StatementLine.objects.exists())
+        self.assertEqual(LedgerEntry.objects.filter(kind='payment').count(), 0)
+
+    def test_unknown_encoding(self):
+        response = self.post('number\n', query='?type=csv&encoding=no-such-codec')
+        self.assertEqual(response.status_code, 400)
 
-# Create your tests here.
+    def test_requires_admin(self):
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.payer)['access']}")
+        self.assertEqual(self.post('number\n').status_code, 403)
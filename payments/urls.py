@@ -1,8 +1,19 @@
 # payments/urls.py
 from django.urls import path
 
+from . import views
+
 app_name = 'payments'
 
 urlpatterns = [
-    # Пока пустой
-]
\ No newline at end of file
+    # Журнал расчётов и баланс
+    path('ledger/', views.LedgerListView.as_view(), name='ledger'),
+    path('balance/', views.BalanceView.as_view(), name='balance'),
+
+    # Проводки от банковской интеграции (Idempotency-Key обязателен)
+    path('postings/', views.PostingView.as_view(), name='posting'),
+    path('postings/import/', views.PostingImportView.as_view(), name='posting_import'),
+
+    # Сверка банковских выписок со счетами
+    path('statements/', views.StatementReconcileView.as_view(), name='statement_reconcile'),
+]
@@ -1,8 +1,26 @@
+import codecs
 
+from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from rest_framework.views import APIView
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from users.bulk_import import decode_lines, iter_records, stream_report
+
+from .idempotency import (
+    IDEMPOTENCY_HEADER, MAX_KEY_LENGTH, IdempotencyConflict, request_fingerprint, run_idempotent,
+)
+from .ledger import get_balance, post_entries
+from .models import LedgerEntry
+from .pagination import LedgerPagination
+from .postings import PostingImporter, resolve_postings
+from .reconciliation import PARSERS, Reconciler, StatementFormatError
+from .serializers import BankStatementSerializer, ClientBalanceSerializer, LedgerEntrySerializer, PostingSerializer
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -11,3 +29,174 @@ def payment_list(request):
         'message': 'Payments API работает!',
         'time': timezone.now().isoformat()
     })
+
+
+def requested_client_id(request):
+    """Клиент запроса; администратор может указать любого через ?client="""
+    client_id = request.query_params.get('client')
+    if client_id and request.user.is_staff:
+        try:
+            return int(client_id)
+        except ValueError:
+            raise ValidationError({'client': 'Ожидается id клиента'})
+    return request.user.pk
+
+
+def _parse_date_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({name: 'Ожидается дата в формате ISO 8601'})
+    return parsed
+
+
+class LedgerListView(generics.ListAPIView):
+    """
+    Выписка по счёту клиента, новые проводки первыми.
+    ?kind=payment - только оплаты, ?since= / ?until= - период (ISO 8601;
+    отсекает лишние месячные секции), ?cursor= - следующая страница.
+    """
+    serializer_class = LedgerEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LedgerPagination
+
+    def get_queryset(self):
+        queryset = LedgerEntry.objects.filter(client_id=requested_client_id(self.request))
+        kind = self.request.query_params.get('kind')
+        if kind:
+            queryset = queryset.filter(kind=kind)
+        since = _parse_date_param(self.request, 'since')
+        if since:
+            queryset = queryset.filter(created_at__gte=since)
+        until = _parse_date_param(self.request, 'until')
+        if until:
+            queryset = queryset.filter(created_at__lt=until)
+        return queryset
+
+
+class BalanceView(APIView):
+    """Текущий баланс клиента - одна строка, без суммирования журнала"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(ClientBalanceSerializer(get_balance(requested_client_id(request))).data)
+
+
+def idempotency_key(request, max_length=MAX_KEY_LENGTH):
+    key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+    if not key or len(key) > max_length:
+        raise ValidationError({IDEMPOTENCY_HEADER: f'Нужен заголовок {IDEMPOTENCY_HEADER} (до {max_length} символов)'})
+    return key
+
+
+class PostingView(APIView):
+    """
+    Проводка от банковской интеграции (оплата, возврат, корректировка).
+    Заголовок Idempotency-Key обязателен: повтор с тем же ключом возвращает
+    исходный ответ с Idempotent-Replayed: true и вторую проводку не создаёт.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        key = idempotency_key(request)
+        serializer = PostingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        def handler():
+            [(posting, errors)] = resolve_postings([serializer.validated_data])
+            if errors:
+                raise ValidationError({'errors': errors})
+            [entry] = post_entries([posting])
+            return status.HTTP_201_CREATED, LedgerEntrySerializer(entry).data
+
+        try:
+            status_code, body, replayed = run_idempotent(
+                request.user.pk, key, request_fingerprint(request.data), handler,
+            )
+        except IdempotencyConflict:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} уже использован с другим телом запроса'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        response = Response(body, status=status_code)
+        if replayed:
+            response['Idempotent-Replayed'] = 'true'
+        return response
+
+
+class PostingImportView(APIView):
+    """
+    Импорт проводок из банковской выписки: CSV (text/csv) или JSONL
+    (application/x-ndjson) с полями как у postings/. Тело читается
+    построчно, каждая пачка проводится отдельной транзакцией; при повторе
+    с тем же Idempotency-Key уже проведённые пачки пропускаются.
+    В ответ построчно идёт отчёт об ошибках в JSONL.
+    Только под WSGI (gunicorn): ASGI буферизует синхронный поток ответа
+    целиком, поэтому config.asgi отвечает на этот путь 421.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    formats = {
+        'text/csv': 'csv',
+        'application/x-ndjson': 'jsonl',
+        'application/jsonl': 'jsonl',
+    }
+
+    def post(self, request):
+        # К ключу добавляется номер пачки
+        key = idempotency_key(request, MAX_KEY_LENGTH - 12)
+        content_type = request.content_type.split(';')[0].strip()
+        # ?format= занят согласованием содержимого DRF
+        fmt = request.query_params.get('type') or self.formats.get(content_type)
+        if fmt not in ('csv', 'jsonl'):
+            return Response(
+                {'detail': 'Поддерживаются text/csv и application/x-ndjson'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+
+        records = iter_records(decode_lines(request._request), fmt)
+        return StreamingHttpResponse(
+            stream_report(self.import_events(request.user.pk, key, records)),
+            content_type='application/x-ndjson; charset=utf-8',
+        )
+
+    def import_events(self, user_id, key, records):
+        try:
+            yield from PostingImporter().run(user_id, key, records)
+        except IdempotencyConflict:
+            yield {'error': f'{IDEMPOTENCY_HEADER} уже использован с другим содержимым выписки'}
+
+
+class StatementReconcileView(APIView):
+    """
+    Сверка банковской выписки с открытыми счетами (только для администраторов).
+    Тело - файл выписки: ?type=1c (1CClientBankExchange, по умолчанию в
+    windows-1251) или ?type=csv; ?encoding= - другая кодировка,
+    ?dry_run=1 - только посчитать совпадения, ничего не записывая.
+    Повторная загрузка той же выписки оплаты повторно не проводит.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    default_encodings = {'1c': 'cp1251', 'csv': 'utf-8-sig'}
+
+    def post(self, request):
+        fmt = request.query_params.get('type', '1c')
+        if fmt not in PARSERS:
+            return Response(
+                {'detail': f"Поддерживаются форматы: {', '.join(PARSERS)}"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        encoding = request.query_params.get('encoding') or self.default_encodings[fmt]
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            return Response({'error': f'Неизвестная кодировка: {encoding}'}, status=status.HTTP_400_BAD_REQUEST)
+        reconciler = Reconciler(dry_run=request.query_params.get('dry_run') == '1')
+        try:
+            statement = reconciler.run(
+                decode_lines(request._request, encoding), fmt,
+                filename=request.query_params.get('filename', ''), user_id=request.user.pk,
+            )
+        except (StatementFormatError, UnicodeDecodeError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(BankStatementSerializer(statement).data)
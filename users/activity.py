@@ -0,0 +1,151 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .profile_cache import invalidate_profile
+
+logger = logging.getLogger(__name__)
+
+# Максимальная задержка записи last_activity в БД (секунды)
+ACTIVITY_FLUSH_INTERVAL = getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', 30)
+ACTIVITY_FLUSH_BATCH_SIZE = getattr(settings, 'ACTIVITY_FLUSH_BATCH_SIZE', 1000)
+ACTIVITY_REDIS_KEY = 'activity:pending'
+
+
+class ActivityTracker:
+    """
+    Накопитель отметок последней активности клиентов.
+
+    Отметки складываются в Redis-хэш (или в буфер процесса, если Redis
+    недоступен) и сбрасываются в PostgreSQL пачками одним
+    UPDATE ... FROM (VALUES ...) вместо сохранения всей строки Client.
+    """
+
+    def __init__(self, flush_interval=ACTIVITY_FLUSH_INTERVAL, batch_size=ACTIVITY_FLUSH_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._buffer = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _redis(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+
+    def touch(self, client_id, when=None):
+        """Отметить активность клиента (без записи в БД)"""
+        when = when or timezone.now()
+        try:
+            self._redis().hset(ACTIVITY_REDIS_KEY, client_id, when.isoformat())
+        except Exception:
+            with self._lock:
+                self._buffer[client_id] = when
+        self.ensure_background_flush()
+
+    async def atouch(self, client_id, when=None):
+        """Асинхронный вариант touch через redis.asyncio"""
+        from config.async_redis import get_async_redis, is_redis_cache
+
+        when = when or timezone.now()
+        try:
+            if not is_redis_cache():
+                raise RuntimeError('Кэш не Redis')
+            await get_async_redis().hset(ACTIVITY_REDIS_KEY, client_id, when.isoformat())
+        except Exception:
+            with self._lock:
+                self._buffer[client_id] = when
+        self.ensure_background_flush()
+
+    def _drain(self):
+        """Забираем накопленные отметки из буфера процесса и из Redis"""
+        with self._lock:
+            pending, self._buffer = self._buffer, {}
+
+        try:
+            # HGETALL + DEL в одной транзакции: новые отметки не теряются
+            pipe = self._redis().pipeline(transaction=True)
+            pipe.hgetall(ACTIVITY_REDIS_KEY)
+            pipe.delete(ACTIVITY_REDIS_KEY)
+            stored, _ = pipe.execute()
+            for client_id, value in stored.items():
+                client_id = int(client_id)
+                when = parse_datetime(value.decode())
+                if client_id not in pending or pending[client_id] < when:
+                    pending[client_id] = when
+        except Exception as e:
+            logger.warning('Не удалось прочитать отметки активности из Redis: %s', e)
+
+        return pending
+
+    def flush(self):
+        """Записать накопленные отметки в БД. Возвращает число обновлённых клиентов"""
+        pending = self._drain()
+        if not pending:
+            return 0
+
+        from .models import Client
+
+        try:
+            return self._write(Client, pending)
+        except Exception:
+            # Возвращаем отметки в буфер, чтобы не потерять их до следующего сброса
+            with self._lock:
+                for client_id, when in pending.items():
+                    if client_id not in self._buffer or self._buffer[client_id] < when:
+                        self._buffer[client_id] = when
+            raise
+
+    def _write(self, Client, pending):
+        table = connection.ops.quote_name(Client._meta.db_table)
+        items = sorted(pending.items())
+        updated = 0
+        for start in range(0, len(items), self.batch_size):
+            batch = items[start:start + self.batch_size]
+            values = ', '.join(['(%s::bigint, %s::timestamptz)'] * len(batch))
+            params = [param for item in batch for param in item]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} AS c SET last_activity = v.ts '
+                    f'FROM (VALUES {values}) AS v(id, ts) '
+                    f'WHERE c.id = v.id AND c.last_activity < v.ts',
+                    params,
+                )
+                updated += cursor.rowcount
+
+        # last_activity входит в кэшированный профиль
+        for client_id, _ in items:
+            invalidate_profile(client_id)
+        return updated
+
+    def ensure_background_flush(self):
+        """Запускает фоновый поток сброса (один на процесс)"""
+        if not self.flush_interval or (self._thread and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='activity-flush', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception('Ошибка сброса отметок активности: %s', e)
+            finally:
+                connection.close()
+
+    def stop(self):
+        self._stop.set()
+
+
+activity_tracker = ActivityTracker()
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import Client
+from .search import search_clients
 
 @admin.register(Client)
 class ClientAdmin(UserAdmin):
@@ -14,4 +15,14 @@ class ClientAdmin(UserAdmin):
         ('Статус системы', {'fields': ('status', 'last_activity')}),
     )
     
-    readonly_fields = ('registration_date', 'last_activity')
\ No newline at end of file
+    readonly_fields = ('registration_date', 'last_activity')
+
+    # Сессия, пользователь и запросы самой страницы (config.query_audit); связи
+    # groups/user_permissions в списке не показываются - N+1 по ним здесь быть не должно
+    query_budgets = {'changelist_view': 6, 'change_view': 10}
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по GIN-индексам вместо LIKE '%...%' по четырём колонкам
+        if not search_term.strip():
+            return queryset, False
+        return search_clients(queryset, search_term), False
\ No newline at end of file
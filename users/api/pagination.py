@@ -0,0 +1,106 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import BooleanField, F, Field, Func, Value
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def row_before(date_field, date, pk):
+    """
+    Условие (date_field, id) < (date, pk) сравнением строк. В отличие от
+    date < d OR (date = d AND id < pk) PostgreSQL превращает его в одну
+    границу поиска по индексу (date_field, id), а не в фильтр после чтения.
+    """
+    return Func(
+        Func(F(date_field), F('id'), function='ROW', output_field=Field()),
+        Func(Value(date), Value(pk), function='ROW', output_field=Field()),
+        template='%(expressions)s',
+        arg_joiner=' < ',
+        output_field=BooleanField(),
+    )
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация по (date_field, id) по убыванию.
+    Не делает COUNT(*) и OFFSET: каждая страница - это индексный поиск
+    от последней строки предыдущей страницы.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+    max_page_size = 100
+    date_field = 'registration_date'
+    ordering = ('-registration_date', '-id')
+    invalid_cursor_message = 'Неверный курсор'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode()).decode()
+            date_value, pk = raw.rsplit('|', 1)
+            date = parse_datetime(date_value)
+            if date is None:
+                raise ValueError(date_value)
+            return date, int(pk)
+        except (TypeError, ValueError, binascii.Error, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, item):
+        raw = f'{getattr(item, self.date_field).isoformat()}|{item.pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def filter_after(self, queryset, date, pk):
+        """Строки после курсора в порядке ordering"""
+        return queryset.filter(row_before(self.date_field, date, pk))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = self.filter_after(queryset, *cursor)
+
+        # Берём на одну строку больше, чтобы узнать, есть ли следующая страница
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -4,6 +4,14 @@ from ..models import Client
 
 class UserSerializer(serializers.ModelSerializer):
     """Сериализатор для пользователя"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Разреженный набор полей (?fields=id,username)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Client
         fields = ('id', 'username', 'email', 'inn', 'kpp', 
@@ -12,6 +20,14 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'registration_date', 'is_active', 'is_staff')
 
 
+class ClientSearchSerializer(UserSerializer):
+    """Результат поиска клиентов с релевантностью"""
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ('rank',)
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     """Сериализатор для регистрации"""
     password = serializers.CharField(write_only=True, min_length=8)
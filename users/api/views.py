@@ -1,15 +1,28 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import logout
+from django.http import StreamingHttpResponse
 
+from config.db_router import replica_reads
+
+from .pagination import KeysetPagination
 from .serializers import (
     UserSerializer, RegisterSerializer, 
-    LoginSerializer, TokenSerializer
+    LoginSerializer, TokenSerializer, ClientSearchSerializer
 )
+from ..authentication import resolve_client
+from ..bulk_import import ClientImporter, decode_lines, iter_records, stream_report
 from ..models import Client
+from ..revocation import revocation_store
+from ..search import search_clients
+from ..throttling import LOGIN_THROTTLES, REGISTER_THROTTLES
+from ..serializers import get_tokens_for_user
 
 
 class RegisterView(generics.CreateAPIView):
@@ -17,6 +30,7 @@ class RegisterView(generics.CreateAPIView):
     queryset = Client.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = REGISTER_THROTTLES
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -24,18 +38,19 @@ class RegisterView(generics.CreateAPIView):
         user = serializer.save()
         
         # Генерируем токены
-        refresh = RefreshToken.for_user(user)
+        tokens = get_tokens_for_user(user)
         
         return Response({
             'user': UserSerializer(user).data,
-            'refresh': str(refresh),
-            'access': str(refresh.access_token),
+            'refresh': tokens['refresh'],
+            'access': tokens['access'],
         }, status=status.HTTP_201_CREATED)
 
 
 class LoginView(TokenObtainPairView):
     """Вход пользователя"""
     serializer_class = LoginSerializer
+    throttle_classes = LOGIN_THROTTLES
     
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -43,12 +58,12 @@ class LoginView(TokenObtainPairView):
         user = serializer.validated_data['user']
         
         # Генерируем токены
-        refresh = RefreshToken.for_user(user)
+        tokens = get_tokens_for_user(user)
         
         return Response({
             'user': UserSerializer(user).data,
-            'refresh': str(refresh),
-            'access': str(refresh.access_token),
+            'refresh': tokens['refresh'],
+            'access': tokens['access'],
         })
 
 
@@ -60,7 +75,11 @@ class LogoutView(APIView):
         try:
             refresh_token = request.data["refresh"]
             token = RefreshToken(refresh_token)
-            token.blacklist()
+            if token.get(api_settings.USER_ID_CLAIM) != request.user.pk:
+                raise TokenError('Токен выдан другому пользователю')
+            revocation_store.revoke_token(token)
+            if request.auth is not None:
+                revocation_store.revoke_token(request.auth)
             logout(request)
             return Response({"detail": "Успешный выход"}, status=status.HTTP_200_OK)
         except Exception as e:
@@ -73,11 +92,106 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        # Полный профиль есть только в модели, а не в пользователе из токена
+        return resolve_client(self.request.user)
 
 
 class UserListView(generics.ListAPIView):
-    """Список пользователей (только для администраторов)"""
+    """
+    Список пользователей (только для администраторов).
+    ?pagination=cursor (или ?cursor=...) - курсорная пагинация без COUNT(*),
+    ?status= / ?client_type= - фильтры, ?fields= - только нужные колонки.
+    """
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
     queryset = Client.objects.all()
+    filter_fields = ('status', 'client_type')
+    # COUNT(*) и страница; при курсорной пагинации - только страница (config.query_audit)
+    query_budget = 4
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
+
+    def get_requested_fields(self):
+        raw = self.request.query_params.get('fields')
+        if not raw:
+            return None
+        fields = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = set(fields) - set(UserSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError({'fields': f"Неизвестные поля: {', '.join(sorted(unknown))}"})
+        return fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for name in self.filter_fields:
+            value = self.request.query_params.get(name)
+            if value:
+                queryset = queryset.filter(**{name: value})
+
+        fields = self.get_requested_fields()
+        if fields:
+            # Колонки ключа пагинации нужны всегда
+            queryset = queryset.only(*set(fields) | {'id', 'registration_date'})
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        # Только чтение: страница и COUNT(*) - с реплики
+        with replica_reads():
+            return super().list(request, *args, **kwargs)
+
+
+class ClientSearchView(generics.ListAPIView):
+    """
+    Поиск клиентов (только для администраторов): ?q= - ИНН или его часть,
+    название компании, логин, email, ФИО, адрес. По убыванию релевантности.
+    """
+    serializer_class = ClientSearchSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_queryset(self):
+        return search_clients(Client.objects.all(), self.request.query_params.get('q', ''))
+
+
+class ClientBulkImportView(APIView):
+    """
+    Массовый импорт клиентов (только для администраторов).
+    Тело запроса - CSV (text/csv) или JSONL (application/x-ndjson),
+    читается построчно; в ответ построчно идёт отчёт об ошибках в JSONL.
+    Только под WSGI (gunicorn): ASGI буферизует синхронный поток ответа
+    целиком, поэтому config.asgi отвечает на этот путь 421.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    formats = {
+        'text/csv': 'csv',
+        'application/x-ndjson': 'jsonl',
+        'application/jsonl': 'jsonl',
+    }
+
+    def post(self, request):
+        content_type = request.content_type.split(';')[0].strip()
+        fmt = request.query_params.get('format') or self.formats.get(content_type)
+        if fmt not in ('csv', 'jsonl'):
+            return Response(
+                {"detail": "Поддерживаются text/csv и application/x-ndjson"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+
+        importer = ClientImporter(dry_run=request.query_params.get('dry_run') == '1')
+        # Тело не буферизуется: HttpRequest отдаёт его построчно
+        records = iter_records(decode_lines(request._request), fmt)
+        return StreamingHttpResponse(
+            stream_report(importer.run(records)),
+            content_type='application/x-ndjson; charset=utf-8',
+        )
@@ -4,3 +4,7 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
     verbose_name = 'Пользователи'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from config import db_router  # noqa: F401  проверка DATABASE_APPS (config.E001)
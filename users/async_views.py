@@ -0,0 +1,157 @@
+"""
+Асинхронные (ASGI) варианты входа, обновления токена, проверки токена
+и профиля. Запросы к Redis идут через redis.asyncio, к БД - через async ORM,
+хэширование паролей - через пул процессов без блокировки event loop.
+"""
+
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from rest_framework.exceptions import Throttled
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .activity import activity_tracker
+from .authentication import CHECK_ACCESS_REVOCATION
+from .hashing import HashingUnavailable, hashing_service
+from .models import Client
+from .profile_cache import aget_profile_payload, profile_response, wrap_verify
+from .revocation import revocation_store
+from .serializers import ClientSerializer, RevocableTokenRefreshSerializer, get_tokens_for_user
+from .state import aget_client_state
+from .throttling import acheck_login_rate
+
+logger = logging.getLogger(__name__)
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def parse_json(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+async def authenticate_token(raw_token):
+    """Проверка access токена: (id клиента, токен) или None"""
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return None
+
+    if CHECK_ACCESS_REVOCATION:
+        try:
+            if await revocation_store.ais_revoked(token[api_settings.JTI_CLAIM]):
+                return None
+        except Exception as e:
+            logger.warning('Не удалось проверить отзыв токена: %s', e)
+
+    client_id = token.get(api_settings.USER_ID_CLAIM)
+    state = await aget_client_state(client_id)
+    if not state or not state['is_active']:
+        return None
+    return client_id, token
+
+
+async def authenticate_request(request):
+    """Проверка JWT из заголовка Authorization; возвращает id клиента или None"""
+    header = request.headers.get('Authorization', '').split()
+    if len(header) != 2 or header[0] not in api_settings.AUTH_HEADER_TYPES:
+        return None
+    result = await authenticate_token(header[1])
+    return result[0] if result else None
+
+
+class AsyncLoginView(View):
+    """Вход в систему (async)"""
+
+    async def post(self, request):
+        data = parse_json(request)
+        if not data or not data.get('username') or not data.get('password'):
+            return json_response({
+                'error': 'Ошибка авторизации',
+                'details': 'Необходимо указать имя пользователя и пароль'
+            }, status=400)
+
+        wait = await acheck_login_rate(request, data['username'])
+        if wait is not None:
+            error = Throttled(wait)
+            response = json_response({'detail': str(error.detail)}, status=error.status_code)
+            response['Retry-After'] = str(wait)
+            return response
+
+        user = await Client.objects.filter(username=data['username']).afirst()
+        try:
+            if user is None:
+                # Выравниваем время ответа для несуществующего пользователя
+                await hashing_service.amake_password(data['password'])
+                valid = must_update = False
+            else:
+                valid, must_update = await hashing_service.acheck_password(data['password'], user.password)
+        except HashingUnavailable as e:
+            return json_response({'detail': str(e.detail)}, status=e.status_code)
+
+        if not valid or not user.is_active:
+            return json_response({
+                'error': 'Ошибка авторизации',
+                'details': 'Неверные учетные данные'
+            }, status=401)
+
+        if must_update:
+            try:
+                new_password = await hashing_service.amake_password(data['password'])
+                await Client.objects.filter(pk=user.pk).aupdate(password=new_password)
+            except HashingUnavailable:
+                pass
+
+        await activity_tracker.atouch(user.pk)
+        return json_response({
+            'success': True,
+            'message': 'Вход выполнен успешно',
+            'user': ClientSerializer(user).data,
+            'tokens': get_tokens_for_user(user),
+        })
+
+
+class AsyncTokenRefreshView(View):
+    """Обновление access токена (async, без обращений к БД)"""
+
+    async def post(self, request):
+        serializer = RevocableTokenRefreshSerializer(data=parse_json(request) or {})
+        try:
+            # Проверка отзыва ходит в Redis синхронным клиентом
+            if not await sync_to_async(serializer.is_valid, thread_sensitive=False)():
+                return json_response(serializer.errors, status=400)
+        except TokenError as e:
+            error = InvalidToken(e.args[0])
+            return json_response(error.detail, status=error.status_code)
+        return json_response(serializer.validated_data)
+
+
+class AsyncVerifyTokenView(View):
+    """Проверка токена (async)"""
+
+    async def get(self, request):
+        client_id = await authenticate_request(request)
+        if client_id is None:
+            return json_response({'valid': False}, status=401)
+        payload = wrap_verify(await aget_profile_payload(client_id))
+        return profile_response(request, payload)
+
+
+class AsyncUserProfileView(View):
+    """Профиль пользователя (async)"""
+
+    async def get(self, request):
+        client_id = await authenticate_request(request)
+        if client_id is None:
+            return json_response({'detail': 'Учетные данные не были предоставлены.'}, status=401)
+        return profile_response(request, await aget_profile_payload(client_id))
@@ -0,0 +1,191 @@
+import logging
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from config.db_router import note_client
+
+from .revocation import revocation_store
+from .state import get_client_state
+
+logger = logging.getLogger(__name__)
+
+# Проверять отзыв access токенов (с Bloom-фильтром - без похода в Redis)
+CHECK_ACCESS_REVOCATION = getattr(settings, 'JWT_CHECK_ACCESS_REVOCATION', True)
+
+# Реквизиты, которые кладутся в токен при выдаче (для клиента API).
+# Сервер доверяет из них только неизменяемому ИНН, остальное - из кэша состояния
+TOKEN_CLAIMS = ('username', 'email', 'inn', 'client_type', 'company_name')
+
+
+def add_client_claims(token, user):
+    """Добавляет реквизиты клиента в JWT токен"""
+    token['username'] = user.username
+    token['email'] = user.email
+    token['inn'] = user.inn
+    token['client_type'] = user.client_type
+    token['company_name'] = user.company_name or ''
+    return token
+
+
+class ClientTokenUser(TokenUser):
+    """
+    Облегчённый клиент, собранный из токена.
+    Из claims берутся только id и ИНН; реквизиты, активность и права -
+    из кэша состояния, который сбрасывается при сохранении клиента.
+    Остальные поля модели неявно не подгружаются: нужна модель -
+    resolve_client(user).
+    """
+
+    def __init__(self, token, state=None):
+        super().__init__(token)
+        self._state = state
+
+    def __str__(self):
+        if self.company_name:
+            return f"{self.company_name} (ИНН: {self.inn})"
+        return f"{self.username} (ИНН: {self.inn})"
+
+    @cached_property
+    def state(self):
+        if self._state is None:
+            self._state = get_client_state(self.id) or {}
+        return self._state
+
+    @cached_property
+    def client(self):
+        """Полноценная модель Client (один запрос к БД при первом обращении)"""
+        from .models import Client
+        return Client.objects.get(pk=self.id)
+
+    @cached_property
+    def inn(self):
+        # ИНН не меняется, в старых токенах его может не быть
+        if 'inn' in self.token:
+            return self.token['inn']
+        return self.client.inn
+
+    @property
+    def username(self):
+        return self.state.get('username', '')
+
+    @property
+    def email(self):
+        return self.state.get('email', '')
+
+    @property
+    def client_type(self):
+        return self.state.get('client_type')
+
+    @property
+    def company_name(self):
+        return self.state.get('company_name')
+
+    @property
+    def is_active(self):
+        return self.state.get('is_active', False)
+
+    @property
+    def status(self):
+        return self.state.get('status')
+
+    @property
+    def is_staff(self):
+        return self.state.get('is_staff', False)
+
+    @property
+    def is_superuser(self):
+        return self.state.get('is_superuser', False)
+
+    @property
+    def is_verified(self):
+        return self.status == 'active'
+
+    @property
+    def can_use_system(self):
+        return self.status in ['active', 'pending'] and self.is_active
+
+    @property
+    def groups(self):
+        return self.client.groups
+
+    @property
+    def user_permissions(self):
+        return self.client.user_permissions
+
+    def get_all_permissions(self, obj=None):
+        return set(self.state.get('permissions', []))
+
+    def has_perm(self, perm, obj=None):
+        if self.is_active and self.is_superuser:
+            return True
+        return perm in self.get_all_permissions(obj)
+
+    def has_perms(self, perm_list, obj=None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, module):
+        if self.is_active and self.is_superuser:
+            return True
+        return any(perm.startswith(f'{module}.') for perm in self.get_all_permissions())
+
+    def __getattr__(self, attr):
+        # Молча читать модель нельзя: лишний запрос на каждый запрос API
+        # и поля мимо кэша состояния. Нужна модель - resolve_client(user)
+        if not attr.startswith('_') and attr not in ('token', 'client'):
+            logger.error('ClientTokenUser: обращение к полю %r, которого нет в токене и состоянии', attr)
+        raise AttributeError(
+            f"'{type(self).__name__}' has no attribute '{attr}'; use resolve_client(user).{attr}"
+        )
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT аутентификация без выборки строки Client на каждый запрос.
+    Реквизиты берутся из токена, активность и права - из кэша состояния.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if CHECK_ACCESS_REVOCATION and is_access_revoked(validated_token):
+            raise InvalidToken(_('Token is blacklisted'))
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        state = get_client_state(user_id)
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not state['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        note_client(user_id)
+        return ClientTokenUser(validated_token, state)
+
+
+def is_access_revoked(token):
+    """
+    Отзыв access токена. Если Redis недоступен, токен пропускается:
+    access токены короткоживущие, а refresh проверяется всегда.
+    """
+    try:
+        return revocation_store.is_token_revoked(token)
+    except Exception as e:
+        logger.warning('Не удалось проверить отзыв токена: %s', e)
+        return False
+
+
+def resolve_client(user):
+    """Возвращает модель Client для пользователя запроса (для записи)"""
+    if isinstance(user, ClientTokenUser):
+        return user.client
+    return user
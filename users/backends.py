@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .hashing import HashingUnavailable, hashing_service
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend, проверяющий пароль через пул хэширования.
+    Устаревшие хэши (другой алгоритм или параметры) прозрачно
+    перехэшируются после успешного входа.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Выравниваем время ответа для несуществующего пользователя
+            hashing_service.make_password(password)
+            return None
+
+        valid, must_update = hashing_service.check_password(password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+
+        if must_update:
+            self.upgrade_password(user, password)
+        return user
+
+    def upgrade_password(self, user, password):
+        try:
+            user.password = hashing_service.make_password(password)
+        except HashingUnavailable:
+            # Не критично: обновим при следующем входе
+            return
+        UserModel._default_manager.filter(pk=user.pk).update(password=user.password)
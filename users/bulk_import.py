@@ -0,0 +1,266 @@
+import csv
+import json
+import re
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .hashing import hashing_service
+from .models import Client
+from .stats import refresh_client_statistics
+
+IMPORT_BATCH_SIZE = getattr(settings, 'CLIENT_IMPORT_BATCH_SIZE', 2000)
+
+IMPORT_FIELDS = (
+    'username', 'email', 'password', 'password_hash',
+    'first_name', 'last_name',
+    'inn', 'kpp', 'company_name',
+    'legal_address', 'physical_address',
+    'phone', 'client_type',
+)
+REQUIRED_FIELDS = ('username', 'inn', 'legal_address', 'phone')
+UNIQUE_FIELDS = ('username', 'email', 'inn')
+
+INN_RE = re.compile(r'^(\d{10}|\d{12})$')
+KPP_RE = re.compile(r'^\d{4}[\dA-Z]{2}\d{3}$')
+PHONE_RE = re.compile(r'^\+\d{10,15}$')
+PHONE_JUNK_RE = re.compile(r'[\s()\-]')
+CLIENT_TYPES = {choice[0] for choice in Client.CLIENT_TYPE_CHOICES}
+
+
+def iter_csv(lines):
+    """Построчный разбор CSV с заголовком"""
+    yield from csv.DictReader(lines)
+
+
+def iter_jsonl(lines):
+    """Построчный разбор JSONL: одна запись - одна строка"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = {'__error__': f'Некорректный JSON: {e}'}
+        yield record if isinstance(record, dict) else {'__error__': 'Ожидался JSON-объект'}
+
+
+def iter_records(lines, fmt):
+    if fmt == 'csv':
+        return iter_csv(lines)
+    if fmt == 'jsonl':
+        return iter_jsonl(lines)
+    raise ValueError(f'Неизвестный формат: {fmt}')
+
+
+def decode_lines(binary_lines, encoding='utf-8'):
+    """Байтовые строки из файла или тела запроса -> текстовые строки"""
+    for line in binary_lines:
+        yield line.decode(encoding) if isinstance(line, bytes) else line
+
+
+def _clean(record):
+    row = {}
+    for field in IMPORT_FIELDS:
+        value = record.get(field)
+        if value is None:
+            continue
+        value = str(value).strip()
+        if value:
+            row[field] = value
+    return row
+
+
+def validate_batch(records):
+    """
+    Проверка пачки записей целиком: каждое правило - один проход по колонке.
+    Возвращает список (номер строки, данные, ошибки).
+    """
+    rows = [(number, _clean(record), {}) for number, record in records]
+
+    for (_, row, errors), (_, record) in zip(rows, records):
+        if '__error__' in record:
+            errors['__all__'] = record['__error__']
+
+    for field in REQUIRED_FIELDS:
+        for _, row, errors in rows:
+            if field not in row:
+                errors[field] = 'Обязательное поле'
+
+    for _, row, errors in rows:
+        inn = row.get('inn')
+        if inn is not None and not INN_RE.match(inn):
+            errors['inn'] = 'ИНН должен содержать 10 или 12 цифр'
+
+    for _, row, errors in rows:
+        if 'phone' in row:
+            row['phone'] = PHONE_JUNK_RE.sub('', row['phone'])
+            if not PHONE_RE.match(row['phone']):
+                errors['phone'] = 'Телефон должен быть в формате +7XXXXXXXXXX'
+
+    for _, row, errors in rows:
+        client_type = row.setdefault('client_type', 'organization')
+        if client_type not in CLIENT_TYPES:
+            errors['client_type'] = 'Неизвестный тип клиента'
+        if client_type != 'organization':
+            row.pop('kpp', None)
+        elif 'kpp' in row and not KPP_RE.match(row['kpp']):
+            errors['kpp'] = 'КПП должен содержать 9 символов'
+
+    for _, row, errors in rows:
+        encoded = row.get('password_hash')
+        if encoded is not None:
+            try:
+                identify_hasher(encoded)
+            except ValueError:
+                errors['password_hash'] = 'Неизвестный формат хэша пароля'
+
+    return rows
+
+
+def find_duplicates(rows, seen):
+    """
+    Дубликаты username/email/ИНН: внутри файла (seen) и в БД -
+    один запрос на всю пачку.
+    """
+    candidates = {field: set() for field in UNIQUE_FIELDS}
+    for _, row, errors in rows:
+        if errors:
+            continue
+        for field in UNIQUE_FIELDS:
+            if field in row:
+                candidates[field].add(row[field])
+
+    condition = Q()
+    for field, values in candidates.items():
+        if values:
+            condition |= Q(**{f'{field}__in': values})
+    existing = {field: set() for field in UNIQUE_FIELDS}
+    if condition:
+        for values in Client.objects.filter(condition).values_list(*UNIQUE_FIELDS):
+            for field, value in zip(UNIQUE_FIELDS, values):
+                existing[field].add(value)
+
+    for _, row, errors in rows:
+        if errors:
+            continue
+        for field in UNIQUE_FIELDS:
+            value = row.get(field)
+            if value is None:
+                continue
+            if value in existing[field]:
+                errors[field] = 'Уже зарегистрирован'
+            elif value in seen[field]:
+                errors[field] = 'Повторяется в файле'
+        if not errors:
+            for field in UNIQUE_FIELDS:
+                if field in row:
+                    seen[field].add(row[field])
+
+
+class ClientImporter:
+    """
+    Потоковый импорт клиентов: чтение пачками, проверка пачкой,
+    хэширование паролей в пуле hashing_service и bulk_create.
+    Результат - поток событий (ошибки по строкам и итог).
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, hasher=hashing_service, dry_run=False):
+        self.batch_size = batch_size
+        self.hasher = hasher
+        self.dry_run = dry_run
+
+    def build_clients(self, rows):
+        raw_passwords = [row['password'] for _, row, _ in rows if 'password' in row]
+        hashed = iter(self.hasher.make_passwords(raw_passwords))
+
+        clients = []
+        for _, row, _ in rows:
+            data = {key: value for key, value in row.items() if key not in ('password', 'password_hash')}
+            client = Client(is_active=True, **data)
+            if 'password' in row:
+                client.password = next(hashed)
+            elif 'password_hash' in row:
+                client.password = row['password_hash']
+            else:
+                client.set_unusable_password()
+            clients.append(client)
+        return clients
+
+    def insert_rows(self, rows, clients):
+        """
+        Пачка уже вставлена параллельной регистрацией частично: вставляем по
+        одной строке в своей точке сохранения. Возвращает конфликтующие строки
+        с ошибками по полям.
+        """
+        conflicts = []
+        for (number, row, errors), client in zip(rows, clients):
+            try:
+                with transaction.atomic():
+                    Client.objects.bulk_create([client])
+            except IntegrityError:
+                for field in UNIQUE_FIELDS:
+                    value = row.get(field)
+                    if value is not None and Client.objects.filter(**{field: value}).exists():
+                        errors[field] = 'Уже зарегистрирован'
+                if not errors:
+                    errors['__all__'] = 'Нарушено ограничение уникальности'
+                conflicts.append((number, row, errors))
+        return conflicts
+
+    def run(self, records):
+        seen = {field: set() for field in UNIQUE_FIELDS}
+        numbered = enumerate(records, start=1)
+        total = created = failed = 0
+
+        while True:
+            batch = list(islice(numbered, self.batch_size))
+            if not batch:
+                break
+            total += len(batch)
+
+            rows = validate_batch(batch)
+            find_duplicates(rows, seen)
+
+            valid = []
+            for number, row, errors in rows:
+                if errors:
+                    failed += 1
+                    yield {'row': number, 'username': row.get('username'), 'errors': errors}
+                else:
+                    valid.append((number, row, errors))
+
+            conflicts = []
+            if valid and not self.dry_run:
+                clients = self.build_clients(valid)
+                try:
+                    with transaction.atomic():
+                        Client.objects.bulk_create(clients, batch_size=self.batch_size)
+                except IntegrityError:
+                    # Между find_duplicates и вставкой те же username/email/ИНН успели
+                    # зарегистрировать - не теряем остальную пачку
+                    conflicts = self.insert_rows(valid, clients)
+            for number, row, errors in conflicts:
+                failed += 1
+                yield {'row': number, 'username': row.get('username'), 'errors': errors}
+            created += len(valid) - len(conflicts)
+
+        if created and not self.dry_run:
+            # bulk_create не вызывает сигналы - выравниваем счётчики статистики
+            refresh_client_statistics()
+
+        yield {'summary': {'total': total, 'created': created, 'failed': failed, 'dry_run': self.dry_run}}
+
+
+def stream_report(events):
+    """События импорта в формате JSONL"""
+    for event in events:
+        yield json.dumps(event, ensure_ascii=False) + '\n'
+
+
+def open_text(path):
+    return open(path, encoding='utf-8-sig', newline='')
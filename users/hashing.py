@@ -0,0 +1,247 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, identify_hasher, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from config.metrics import measure
+
+# Размер пула процессов (0 - хэшировать в текущем потоке) и лимит очереди
+HASHING_WORKERS = getattr(settings, 'HASHING_WORKERS', 0)
+HASHING_MAX_QUEUE = getattr(settings, 'HASHING_MAX_QUEUE', 64)
+HASHING_START_METHOD = getattr(settings, 'HASHING_START_METHOD', 'forkserver')
+# Паролей в одной задаче пула при пакетном хэшировании (импорт)
+HASHING_BATCH_CHUNK = getattr(settings, 'HASHING_BATCH_CHUNK', 64)
+
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервис проверки паролей перегружен, повторите попытку позже'
+    default_code = 'hashing_unavailable'
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _timed(fn, args):
+    # monotonic общий для процессов одной машины: по нему считаем ожидание в очереди
+    started = time.monotonic()
+    result = fn(*args)
+    return result, started, time.monotonic()
+
+
+def _hash(password):
+    return make_password(password)
+
+
+def _hash_many(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def _verify(password, encoded):
+    """Проверка пароля; второй элемент - нужно ли перехэшировать текущим алгоритмом"""
+    hasher = identify_hasher(encoded)
+    valid = hasher.verify(password, encoded)
+    if not valid:
+        return False, False
+    preferred = get_hasher('default')
+    must_update = hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+    return True, must_update
+
+
+class HashingMetrics:
+    """Счётчики и гистограммы времени хэширования и ожидания в очереди"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.hash_ms = self._empty()
+        self.queue_wait_ms = self._empty()
+
+    @staticmethod
+    def _empty():
+        return {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+
+    @staticmethod
+    def _observe(histogram, value):
+        histogram['count'] += 1
+        histogram['sum'] += value
+        histogram['max'] = max(histogram['max'], value)
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if value <= bound:
+                histogram['buckets'][index] += 1
+                break
+        else:
+            histogram['buckets'][-1] += 1
+
+    def observe(self, queue_wait_ms, hash_ms):
+        with self._lock:
+            self._observe(self.queue_wait_ms, queue_wait_ms)
+            self._observe(self.hash_ms, hash_ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'failed': self.failed,
+                'in_flight': self.in_flight,
+                'bucket_bounds_ms': list(LATENCY_BUCKETS_MS),
+                'hash_ms': {**self.hash_ms, 'buckets': list(self.hash_ms['buckets'])},
+                'queue_wait_ms': {**self.queue_wait_ms, 'buckets': list(self.queue_wait_ms['buckets'])},
+            }
+
+
+class HashingService:
+    """
+    Хэширование паролей в ограниченном пуле процессов.
+    Если в работе и в очереди уже workers + max_queue задач, новая
+    задача сразу отклоняется с HashingUnavailable (503), а не ждёт.
+    """
+
+    def __init__(self, workers=HASHING_WORKERS, max_queue=HASHING_MAX_QUEUE, start_method=HASHING_START_METHOD):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.start_method = start_method
+        self.metrics = HashingMetrics()
+        self._slots = threading.BoundedSemaphore(max(1, workers) + max_queue)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=_init_worker,
+                    )
+        return self._pool
+
+    def _acquire(self, blocking=False):
+        if not self._slots.acquire(blocking=blocking):
+            with self.metrics._lock:
+                self.metrics.rejected += 1
+            raise HashingUnavailable()
+        with self.metrics._lock:
+            self.metrics.submitted += 1
+            self.metrics.in_flight += 1
+        return time.monotonic()
+
+    def _release(self, failed):
+        with self.metrics._lock:
+            self.metrics.in_flight -= 1
+            if failed:
+                self.metrics.failed += 1
+        self._slots.release()
+
+    def _finish(self, submitted, timed):
+        result, started, finished = timed
+        self.metrics.observe((started - submitted) * 1000, (finished - started) * 1000)
+        return result
+
+    def _run(self, fn, *args, blocking=False):
+        submitted = self._acquire(blocking)
+        failed = True
+        try:
+            with measure('hashing'):
+                if self.workers:
+                    timed = self.pool.submit(_timed, fn, args).result()
+                else:
+                    timed = _timed(fn, args)
+            failed = False
+        finally:
+            self._release(failed)
+        return self._finish(submitted, timed)
+
+    async def _arun(self, fn, *args):
+        """То же для async-представлений: event loop не блокируется"""
+        submitted = self._acquire()
+        failed = True
+        try:
+            with measure('hashing'):
+                if self.workers:
+                    timed = await asyncio.wrap_future(self.pool.submit(_timed, fn, args))
+                else:
+                    timed = await asyncio.to_thread(_timed, fn, args)
+            failed = False
+        finally:
+            self._release(failed)
+        return self._finish(submitted, timed)
+
+    def make_password(self, password):
+        return self._run(_hash, password)
+
+    def make_passwords(self, passwords, chunksize=HASHING_BATCH_CHUNK):
+        """
+        Хэши пачки паролей (импорт) в том же пуле. Задача - chunksize паролей,
+        в работе не больше workers задач пачки: остальная очередь остаётся
+        входам и регистрациям. Свободный слот ждём, а не отклоняем.
+        """
+        chunks = [passwords[start:start + chunksize] for start in range(0, len(passwords), chunksize)]
+        if not self.workers:
+            return [hashed for chunk in chunks for hashed in self._run(_hash_many, chunk, blocking=True)]
+
+        in_flight = threading.BoundedSemaphore(self.workers)
+
+        def done(future):
+            self._release(future.cancelled() or future.exception() is not None)
+            in_flight.release()
+
+        tasks = []
+        for chunk in chunks:
+            in_flight.acquire()
+            submitted = self._acquire(blocking=True)
+            try:
+                future = self.pool.submit(_timed, _hash_many, (chunk,))
+            except BaseException:
+                self._release(True)
+                in_flight.release()
+                raise
+            future.add_done_callback(done)
+            tasks.append((submitted, future))
+        return [hashed for submitted, future in tasks for hashed in self._finish(submitted, future.result())]
+
+    def check_password(self, password, encoded):
+        """Возвращает (пароль верный, нужно ли обновить хэш)"""
+        if password is None or not encoded or encoded.startswith('!'):
+            return False, False
+        try:
+            identify_hasher(encoded)
+        except ValueError:
+            return False, False
+        return self._run(_verify, password, encoded)
+
+    async def amake_password(self, password):
+        return await self._arun(_hash, password)
+
+    async def acheck_password(self, password, encoded):
+        if password is None or not encoded or encoded.startswith('!'):
+            return False, False
+        try:
+            identify_hasher(encoded)
+        except ValueError:
+            return False, False
+        return await self._arun(_verify, password, encoded)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+hashing_service = HashingService()
@@ -1,10 +1,168 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework import status
+from django.conf import settings
 from django.db import connection
 from django.core.cache import cache
+from django.http import HttpResponse
 from datetime import datetime
 
+from config.profiler import PROFILER_MAX_SECONDS, ProfilerBusy, get_profile, list_profiles, start_profiling
+
+from .hashing import hashing_service
+from .stats import get_client_statistics
+
+# Таймаут проверки одной зависимости (секунды)
+HEALTH_CHECK_TIMEOUT = getattr(settings, 'HEALTH_CHECK_TIMEOUT', 2)
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='health')
+
+# Не больше одной выполняющейся проверки на зависимость: параллельные запросы
+# ждут уже запущенную, а зависшая проба занимает один поток пула, а не копит
+# новые с каждым запросом readiness
+_in_flight = {}
+_in_flight_lock = threading.RLock()
+
+
+def check_postgresql():
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            result = cursor.fetchone()
+            if not result or result[0] != 1:
+                raise Exception("Неверный ответ от базы данных")
+    finally:
+        # Поток пула живёт долго: соединение переиспользуется, пока оно исправно
+        connection.close_if_unusable_or_obsolete()
+
+
+def check_redis():
+    cache.set('health_check', 'ok', 10)
+    if cache.get('health_check') != 'ok':
+        raise Exception("Redis не отвечает")
+
+
+def _submit(name, check):
+    """Запущенная проверка зависимости или новая, если её нет"""
+    with _in_flight_lock:
+        future = _in_flight.get(name)
+        if future is None:
+            future = _in_flight[name] = _executor.submit(check)
+            future.add_done_callback(lambda done: _forget(name, done))
+        return future
+
+
+def _forget(name, future):
+    with _in_flight_lock:
+        if _in_flight.get(name) is future:
+            del _in_flight[name]
+
+
+def run_checks(checks, timeout=HEALTH_CHECK_TIMEOUT):
+    """
+    Параллельный запуск проверок, каждая со своим таймаутом. Если прошлая
+    проверка той же зависимости ещё идёт (или висит), ждём её результат,
+    а не запускаем новую.
+    """
+    futures = {name: _submit(name, check) for name, check in checks.items()}
+    results = {}
+    for name, future in futures.items():
+        try:
+            future.result(timeout=timeout)
+            results[name] = None
+        except FutureTimeout:
+            results[name] = f'Таймаут проверки ({timeout} с)'
+        except Exception as e:
+            results[name] = str(e)
+    return results
+
+
+class LivenessView(APIView):
+    """Liveness: процесс жив и отвечает, зависимости не проверяются"""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        return Response({'status': 'alive'})
+
+
+class ReadinessView(APIView):
+    """Readiness: доступны ли PostgreSQL и Redis"""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        errors = run_checks({'postgresql': check_postgresql, 'redis': check_redis})
+        ready = not any(errors.values())
+        return Response({
+            'status': 'ready' if ready else 'not_ready',
+            'services': {
+                name: {'status': 'healthy'} if error is None else {'status': 'unhealthy', 'message': error}
+                for name, error in errors.items()
+            },
+        }, status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class HashingMetricsView(APIView):
+    """Метрики пула хэширования паролей (для администраторов)"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'workers': hashing_service.workers,
+            'max_queue': hashing_service.max_queue,
+            **hashing_service.metrics.snapshot(),
+        })
+
+
+class ProfilerView(APIView):
+    """
+    Сэмплирующий профилировщик (для администраторов).
+    POST {"seconds": 30, "prefix": "/api/users/"} - профилировать процесс,
+    принявший запрос; GET - последние сессии; GET ?id= - collapsed-стеки
+    для flamegraph (202, пока сессия идёт; 410, если процесс умер, не
+    записав их).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        profile_id = request.query_params.get('id')
+        if not profile_id:
+            return Response({'profiles': list_profiles()})
+        profile = get_profile(profile_id)
+        if profile is None:
+            return Response({'detail': 'Сессия не найдена'}, status=status.HTTP_404_NOT_FOUND)
+        meta, collapsed = profile
+        if collapsed is None:
+            code = status.HTTP_202_ACCEPTED if meta['status'] == 'running' else status.HTTP_410_GONE
+            return Response(meta, status=code)
+        response = HttpResponse(collapsed, content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{profile_id}.collapsed"'
+        return response
+
+    def post(self, request):
+        try:
+            seconds = float(request.data.get('seconds', 30))
+        except (TypeError, ValueError):
+            seconds = 0
+        if not 0 < seconds <= PROFILER_MAX_SECONDS:
+            return Response(
+                {'seconds': f'От 0 до {PROFILER_MAX_SECONDS} секунд'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        prefix = request.data.get('prefix') or '/'
+        if not isinstance(prefix, str) or not prefix.startswith('/'):
+            return Response({'prefix': 'Префикс пути должен начинаться с /'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            profiler = start_profiling(seconds, prefix)
+        except ProfilerBusy as e:
+            return Response({'detail': f'Уже идёт сессия {e}'}, status=status.HTTP_409_CONFLICT)
+        return Response(profiler.meta(), status=status.HTTP_202_ACCEPTED)
+
+
 class HealthCheckView(APIView):
     permission_classes = [AllowAny]
     
@@ -33,59 +191,41 @@ class HealthCheckView(APIView):
             }
             health_status['status'] = 'unhealthy'
         
+        errors = run_checks({'postgresql': check_postgresql, 'redis': check_redis})
+
         # 2. Проверка PostgreSQL
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT 1")
-                result = cursor.fetchone()
-                if result and result[0] == 1:
-                    health_status['services']['postgresql'] = {
-                        'status': 'healthy',
-                        'message': 'PostgreSQL доступен',
-                        'database': connection.settings_dict['NAME'],
-                        'host': connection.settings_dict['HOST'],
-                        'port': connection.settings_dict.get('PORT', 5432)
-                    }
-                else:
-                    raise Exception("Неверный ответ от базы данных")
-        except Exception as e:
+        if errors['postgresql'] is None:
+            health_status['services']['postgresql'] = {
+                'status': 'healthy',
+                'message': 'PostgreSQL доступен',
+                'database': connection.settings_dict['NAME'],
+                'host': connection.settings_dict['HOST'],
+                'port': connection.settings_dict.get('PORT', 5432)
+            }
+        else:
             health_status['services']['postgresql'] = {
                 'status': 'unhealthy',
-                'message': str(e)
+                'message': errors['postgresql']
             }
             health_status['status'] = 'unhealthy'
         
         # 3. Проверка Redis
-        try:
-            cache.set('health_check', 'ok', 10)
-            if cache.get('health_check') == 'ok':
-                health_status['services']['redis'] = {
-                    'status': 'healthy',
-                    'message': 'Redis доступен',
-                    'port': 6379
-                }
-            else:
-                raise Exception("Redis не отвечает")
-        except Exception as e:
+        if errors['redis'] is None:
+            health_status['services']['redis'] = {
+                'status': 'healthy',
+                'message': 'Redis доступен',
+                'port': 6379
+            }
+        else:
             health_status['services']['redis'] = {
                 'status': 'unhealthy',
-                'message': str(e)
+                'message': errors['redis']
             }
             health_status['status'] = 'unhealthy'
         
-        # 4. Статистика пользователей
+        # 4. Статистика пользователей (счётчики + кэшированный агрегат)
         try:
-            from .models import Client
-            total_users = Client.objects.count()
-            active_users = Client.objects.filter(is_active=True).count()
-            health_status['statistics'] = {
-                'total_users': total_users,
-                'active_users': active_users,
-                'pending_users': Client.objects.filter(status='pending').count(),
-                'active_companies': Client.objects.filter(status='active', client_type='organization').count(),
-                'individuals': Client.objects.filter(client_type='individual').count(),
-                'organizations': Client.objects.filter(client_type='organization').count()
-            }
+            health_status['statistics'] = get_client_statistics()
         except Exception as e:
             health_status['statistics'] = {
                 'error': str(e)
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from users.activity import ActivityTracker
+from users.models import Client
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест: число записей в БД на вход до и после пакетного трекера активности'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=10000)
+        parser.add_argument('--clients', type=int, default=500)
+
+    def handle(self, *args, **options):
+        clients = list(Client.objects.order_by('pk')[:options['clients']])
+        if not clients:
+            self.stderr.write('Нет клиентов в БД')
+            return
+        logins = options['logins']
+
+        # До: полное сохранение строки на каждый вход
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for i in range(logins):
+                user = clients[i % len(clients)]
+                user.last_activity = timezone.now()
+                user.save()
+            elapsed = time.perf_counter() - started
+        self.report('save() на каждый вход', logins, len(queries), elapsed)
+
+        # После: отметки в трекере и один пакетный сброс
+        tracker = ActivityTracker(flush_interval=0)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for i in range(logins):
+                tracker.touch(clients[i % len(clients)].pk)
+            tracker.flush()
+            elapsed = time.perf_counter() - started
+        self.report('ActivityTracker', logins, len(queries), elapsed)
+
+    def report(self, label, logins, writes, elapsed):
+        self.stdout.write(
+            f'{label}: {writes} SQL запросов на {logins} входов '
+            f'({writes / logins:.4f} на вход), {logins / elapsed:.0f} входов/с'
+        )
@@ -0,0 +1,208 @@
+import asyncio
+import itertools
+import json
+import subprocess
+from urllib.parse import quote
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from config.loadgen import build_request, raise_nofile_limit, run_load
+from documents.models import Document
+from users.models import Client
+from users.serializers import get_tokens_for_user
+
+from .seed_dataset import SEED_PASSWORD
+
+SCENARIOS = (
+    'login', 'token_refresh', 'profile', 'health', 'user_list',
+    'documents_search', 'document_detail', 'ledger', 'balance', 'dashboard',
+)
+
+
+def compare(results, baseline, tolerance):
+    """Регрессии относительно базовой линии: RPS ниже, p95/p99 выше больше чем на tolerance, больше ошибок"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        if base['rps'] and result['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['rps']} req/s, было {base['rps']}")
+        for key in ('p95_ms', 'p99_ms'):
+            if base[key] and result[key] and result[key] > base[key] * (1 + tolerance):
+                regressions.append(f'{name}: {key} {result[key]}, было {base[key]}')
+        if base.get('ok_share') and result['ok_share'] is not None and result['ok_share'] < base['ok_share'] - 0.01:
+            regressions.append(f"{name}: успешных ответов {result['ok_share']:.1%}, было {base['ok_share']:.1%}")
+    return regressions
+
+
+def changes(results, baseline):
+    """Строки сравнения с базовой линией по сценариям: RPS и задержки, было -> стало"""
+    def change(old, new):
+        if not old or new is None:
+            return f'{old} -> {new}'
+        return f'{old} -> {new} ({(new - old) / old:+.0%})'
+
+    lines = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        lines.append(
+            f"{name}: req/s {change(base['rps'], result['rps'])}, "
+            + ', '.join(f'{key} {change(base[key], result[key])}' for key in ('p50_ms', 'p95_ms', 'p99_ms'))
+        )
+    return lines
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузка на основные эндпоинты API по HTTP (config.loadgen): RPS и p50/p95/p99 в JSON, '
+        'сравнение с сохранённой базовой линией (--baseline), при регрессии - код возврата 1. '
+        'Данные - manage.py seed_dataset; сервер - локальные контейнеры PostgreSQL/Redis '
+        '(docker-compose.bench.yml снимает лимиты троттлинга и аудит запросов).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000')
+        parser.add_argument('--connections', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=15, help='Секунд на сценарий')
+        parser.add_argument('--users', type=int, default=1000, help='Сколько клиентов seed_* чередуются в запросах')
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--password', default=SEED_PASSWORD)
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"Через запятую: {', '.join(SCENARIOS)}")
+        parser.add_argument('--label', default='', help='Метка прогона в JSON, например runserver или gunicorn')
+        parser.add_argument('--output', help='Сохранить результаты в JSON (его же можно взять базовой линией)')
+        parser.add_argument('--baseline', help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--tolerance', type=float, default=0.15, help='Допустимое ухудшение, доля')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        prefix = options['prefix']
+        clients = list(
+            Client.objects.filter(username__startswith=f'{prefix}_', is_staff=False).order_by('id')[:options['users']]
+        )
+        if not clients:
+            raise CommandError(f'Нет клиентов {prefix}_* (manage.py seed_dataset)')
+        admin = Client.objects.filter(username=f'{prefix}_admin').first() or Client.objects.filter(is_staff=True).first()
+        if admin is None and 'user_list' in scenarios:
+            raise CommandError('Для user_list нужен администратор (manage.py seed_dataset создаёт его)')
+        raise_nofile_limit(options['connections'])
+
+        # Токены выпускаются локально: подготовка не нагружает хэширование паролей на сервере
+        tokens = {client.pk: get_tokens_for_user(client) for client in clients}
+        requests = self.build_requests(scenarios, clients, admin, tokens, options)
+
+        results = {}
+        for name in scenarios:
+            result = asyncio.run(run_load(
+                name, options['url'],
+                connections=options['connections'], duration=options['duration'],
+                make_request=itertools.cycle(requests[name]).__next__,
+            )).as_dict()
+            results[name] = result
+            self.stdout.write(
+                f"{name}: {result['rps']} req/s, p50 {result['p50_ms']} мс, p95 {result['p95_ms']} мс, "
+                f"p99 {result['p99_ms']} мс, ошибок {result['errors']}, статусы {result['statuses']}"
+            )
+            if result['ok_share'] is not None and result['ok_share'] < 0.99:
+                self.stdout.write(self.style.WARNING(
+                    f"  успешных ответов {result['ok_share']:.1%} - троттлинг или ошибки сервера, цифры не показательны"
+                ))
+
+        report = {
+            'meta': {
+                'label': options['label'],
+                'started_at': timezone.now().isoformat(),
+                'revision': git_revision(),
+                'url': options['url'],
+                'connections': options['connections'],
+                'duration': options['duration'],
+                'users': len(clients),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты: {options['output']}")
+
+        if baseline is not None:
+            base_meta = baseline['meta']
+            self.stdout.write(f"\nОтносительно {base_meta.get('label') or options['baseline']} (ревизия {base_meta.get('revision')}):")
+            for line in changes(results, baseline):
+                self.stdout.write(f'  {line}')
+            regressions = compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError(
+                    f"Регрессии относительно {options['baseline']} (ревизия {baseline['meta'].get('revision')}):\n"
+                    + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS(f"Регрессий нет (допуск {options['tolerance']:.0%})"))
+
+    def build_requests(self, scenarios, clients, admin, tokens, options):
+        """Заранее собранные запросы каждого сценария; генератор нагрузки перебирает их по кругу"""
+        url = options['url']
+
+        def bearer(client_id):
+            return {'Authorization': f"Bearer {tokens[client_id]['access']}"}
+
+        def per_client(path, **kwargs):
+            return [build_request('GET', f'{url}{path}', bearer(client.pk), **kwargs) for client in clients]
+
+        requests = {
+            'login': [
+                build_request('POST', f'{url}/api/users/login/', body={'username': client.username, 'password': options['password']})
+                for client in clients
+            ],
+            'token_refresh': [
+                build_request('POST', f'{url}/api/users/token/refresh/', body={'refresh': tokens[client.pk]['refresh']})
+                for client in clients
+            ],
+            'profile': per_client('/api/users/profile/'),
+            'health': [build_request('GET', f'{url}/api/users/health/')],
+            'ledger': per_client('/api/payments/ledger/'),
+            'balance': per_client('/api/payments/balance/'),
+            'dashboard': per_client('/api/dashboard/'),
+        }
+        if 'user_list' in scenarios:
+            admin_headers = {'Authorization': f"Bearer {get_tokens_for_user(admin)['access']}"}
+            requests['user_list'] = [
+                build_request('GET', f'{url}/api/users/clients/?page={page}', admin_headers) for page in range(1, 51)
+            ]
+
+        documents = list(
+            Document.objects.filter(owner__in=clients)
+            .order_by('owner_id', 'id').values_list('pk', 'owner_id', 'contract_number', 'counterparty_name')
+        )
+        if {'documents_search', 'document_detail'} & set(scenarios) and not documents:
+            raise CommandError('У клиентов нет документов (manage.py seed_dataset)')
+        requests['document_detail'] = [
+            build_request('GET', f'{url}/api/documents/{pk}/', bearer(owner_id))
+            for pk, owner_id, _, _ in documents
+        ]
+        requests['documents_search'] = [
+            build_request('GET', f'{url}/api/documents/search/?q={quote(query)}', bearer(owner_id))
+            for _, owner_id, contract_number, counterparty in documents
+            for query in (contract_number, counterparty)
+            if query
+        ]
+        return requests
@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from users.authentication import StatelessJWTAuthentication
+from users.models import Client
+from users.serializers import get_tokens_for_user
+
+
+def make_view(auth_class):
+    class BenchView(APIView):
+        authentication_classes = [auth_class]
+        permission_classes = [IsAuthenticated]
+
+        def get(self, request):
+            return Response({'id': request.user.pk, 'inn': request.user.inn})
+
+    return BenchView.as_view()
+
+
+class Command(BaseCommand):
+    help = 'Сравнение запросов/сек для JWTAuthentication и StatelessJWTAuthentication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--username', default='bench_auth_user')
+
+    def handle(self, *args, **options):
+        client, _ = Client.objects.get_or_create(
+            username=options['username'],
+            defaults={
+                'email': f"{options['username']}@example.com",
+                'inn': '7700000001',
+                'legal_address': 'Москва',
+                'phone': '+70000000000',
+                'is_active': True,
+            },
+        )
+        access = get_tokens_for_user(client)['access']
+        factory = APIRequestFactory()
+
+        for label, auth_class in (
+            ('JWTAuthentication (до)', JWTAuthentication),
+            ('StatelessJWTAuthentication (после)', StatelessJWTAuthentication),
+        ):
+            view = make_view(auth_class)
+            # Прогрев: заполняем кэш состояния
+            view(factory.get('/', HTTP_AUTHORIZATION=f'Bearer {access}'))
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(options['requests']):
+                    response = view(factory.get('/', HTTP_AUTHORIZATION=f'Bearer {access}'))
+                    assert response.status_code == 200, response.data
+                elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{label}: {options['requests'] / elapsed:.0f} req/s, "
+                f"SQL запросов на запрос: {len(queries) / options['requests']:.2f}"
+            )
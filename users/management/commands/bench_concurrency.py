@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from config.loadgen import raise_nofile_limit, run_load
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение синхронных (WSGI) и асинхронных (ASGI) эндпоинтов профиля и проверки '
+        'токена при большом числе одновременных соединений: RPS, p50/p99'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync-url', default='http://localhost:8000', help='Сервер WSGI (gunicorn/runserver)')
+        parser.add_argument('--async-url', default='http://localhost:8002', help='Сервер ASGI (uvicorn)')
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+
+    def handle(self, *args, **options):
+        raise_nofile_limit(options['connections'])
+
+        response = requests.post(
+            f"{options['sync_url']}/api/users/login/",
+            json={'username': options['username'], 'password': options['password']},
+            timeout=30,
+        )
+        if response.status_code != 200:
+            raise CommandError(f'Не удалось войти: {response.status_code} {response.text[:200]}')
+        headers = {'Authorization': f"Bearer {response.json()['tokens']['access']}"}
+
+        scenarios = [
+            ('sync profile', f"{options['sync_url']}/api/users/profile/"),
+            ('async profile', f"{options['async_url']}/api/users/async/profile/"),
+            ('sync verify', f"{options['sync_url']}/api/users/verify/"),
+            ('async verify', f"{options['async_url']}/api/users/async/verify/"),
+        ]
+        results = []
+        for name, url in scenarios:
+            result = asyncio.run(run_load(
+                name, url, headers=headers,
+                connections=options['connections'], duration=options['duration'],
+            )).as_dict()
+            results.append(result)
+            self.stdout.write(
+                f"{name}: {result['rps']} req/s, p50 {result['p50_ms']} мс, "
+                f"p99 {result['p99_ms']} мс, ошибок {result['errors']}, статусы {result['statuses']}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
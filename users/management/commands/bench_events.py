@@ -0,0 +1,103 @@
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+
+from config.async_redis import is_redis_cache
+from config.events import EVENTS_FLUSH_INTERVAL, EVENTS_SSE_PATH, hub, make_event, send_events, sse_application
+from users.models import Client
+from users.serializers import get_tokens_for_user
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Простаивающие SSE-подключения в одном процессе (через ASGI-приложение, без сети): '
+        'память на подключение и время доставки события всем подключениям'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=10_000)
+        parser.add_argument('--clients', type=int, default=2000, help='Подключения распределяются по клиентам seed_*')
+        parser.add_argument('--rounds', type=int, default=3, help='Сколько раз разослать событие всем')
+
+    def handle(self, *args, **options):
+        clients = list(Client.objects.filter(username__startswith='seed_').order_by('id')[:options['clients']])
+        if not clients:
+            raise CommandError('Нет клиентов seed_* (manage.py seed_clients)')
+        tokens = [(client.pk, get_tokens_for_user(client)['access']) for client in clients]
+        self.stdout.write(f"Доставка через {'Redis pub/sub' if is_redis_cache() else 'процесс (без Redis)'}")
+        asyncio.run(self.run(tokens, options))
+
+    async def run(self, tokens, options):
+        disconnect = asyncio.Event()
+        # round -> время получения каждым подключением
+        received = {}
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        def make_send():
+            async def send(message):
+                body = message.get('body', b'')
+                if b'event: bench' in body:
+                    received.setdefault(body.count(b'event: bench'), []).append(time.perf_counter())
+            return send
+
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        tasks = []
+        for number in range(options['connections']):
+            client_id, token = tokens[number % len(tokens)]
+            scope = {
+                'type': 'http', 'method': 'GET', 'path': EVENTS_SSE_PATH, 'query_string': b'',
+                'headers': [(b'authorization', f'Bearer {token}'.encode())],
+            }
+            tasks.append(asyncio.ensure_future(sse_application(scope, receive, make_send())))
+        while hub.connection_count < options['connections']:
+            if all(task.done() for task in tasks):
+                raise CommandError('Подключения завершились, не дождавшись событий (токены отклонены?)')
+            await asyncio.sleep(0.05)
+        memory = tracemalloc.get_traced_memory()[0] - memory_before
+        tracemalloc.stop()
+        self.stdout.write(
+            # Время подключения не выводится: под tracemalloc оно в разы больше настоящего
+            f"Подключений: {hub.connection_count}, "
+            f"память ~{memory / options['connections'] / 1024:.1f} КБ на подключение "
+            f"({memory / 2 ** 20:.0f} МБ всего)"
+        )
+
+        client_ids = sorted({client_id for client_id, _ in tokens})
+        for round_number in range(1, options['rounds'] + 1):
+            received.clear()
+            started = time.perf_counter()
+            # Несколько событий на клиента схлопываются в одну запись подключению
+            await sync_to_async(send_events)({
+                client_id: [make_event('bench', {'round': round_number, 'n': n}) for n in range(round_number)]
+                for client_id in client_ids
+            })
+            deadline = time.perf_counter() + EVENTS_FLUSH_INTERVAL + 30
+            while sum(len(times) for times in received.values()) < options['connections']:
+                if time.perf_counter() > deadline:
+                    break
+                await asyncio.sleep(0.01)
+            latencies = sorted((moment - started) * 1000 for times in received.values() for moment in times)
+            if not latencies:
+                raise CommandError('События не доставлены')
+            self.stdout.write(
+                f'Раунд {round_number}: доставлено {len(latencies)}/{options["connections"]}, '
+                f'записей с {round_number} событиями: {len(received.get(round_number, ()))}, '
+                f'p50 {statistics.median(latencies):.0f} мс, p99 {percentile(latencies, 0.99):.0f} мс '
+                f'(окно накопления {EVENTS_FLUSH_INTERVAL * 1000:.0f} мс)'
+            )
+
+        disconnect.set()
+        await asyncio.gather(*tasks)
+        self.stdout.write(f'После отключения: {hub.connection_count} подключений')
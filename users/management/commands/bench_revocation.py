@@ -0,0 +1,81 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.settings import api_settings
+
+from config.async_redis import is_redis_cache
+from users.revocation import REVOCATION_KEY_PREFIX, REVOCATION_STREAM_KEY, RevocationStore
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест хранилища отзыва токенов: запись N отзывов и время проверки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10_000_000)
+        parser.add_argument('--checks', type=int, default=100_000)
+        parser.add_argument('--batch', type=int, default=10_000)
+        parser.add_argument('--keep', action='store_true', help='Не удалять данные теста')
+
+    def handle(self, *args, **options):
+        if not is_redis_cache():
+            raise CommandError('Тест требует Redis в CACHES["default"]')
+
+        count = options['count']
+        store = RevocationStore(capacity=count)
+        client = store._redis()
+        if client.xlen(REVOCATION_STREAM_KEY):
+            # Тест удаляет все ключи revoked:* - только на отдельном Redis
+            raise CommandError('В Redis уже есть отозванные токены, запустите тест на пустом Redis')
+        exp = int(time.time() + api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+        memory_before = client.info('memory')['used_memory']
+
+        # Пишем пачками через pipeline, как revoke(), но без round-trip на каждый jti
+        revoked = []
+        started = time.perf_counter()
+        for offset in range(0, count, options['batch']):
+            pipe = client.pipeline(transaction=False)
+            for _ in range(min(options['batch'], count - offset)):
+                jti = uuid.uuid4().hex
+                pipe.set(REVOCATION_KEY_PREFIX + jti, 1, exat=exp)
+                pipe.xadd(REVOCATION_STREAM_KEY, {'jti': jti})
+                if len(revoked) < options['checks']:
+                    revoked.append(jti)
+            pipe.execute()
+        elapsed = time.perf_counter() - started
+        memory = client.info('memory')['used_memory'] - memory_before
+        self.stdout.write(
+            f'Запись: {count} отзывов за {elapsed:.1f} с ({count / elapsed:.0f}/с), '
+            f'память Redis +{memory / 2 ** 20:.0f} МБ'
+        )
+
+        started = time.perf_counter()
+        store.refresh()
+        self.stdout.write(
+            f'Сборка Bloom-фильтра: {time.perf_counter() - started:.1f} с, '
+            f'{len(store._bloom.bits) / 2 ** 20:.1f} МБ'
+        )
+
+        fresh = [uuid.uuid4().hex for _ in range(options['checks'])]
+        plain = RevocationStore(bloom_enabled=False)
+        for label, checker in (('EXISTS в Redis', plain), ('Bloom + EXISTS', store)):
+            for kind, jtis, expected in (('не отозван', fresh, False), ('отозван', revoked, True)):
+                started = time.perf_counter()
+                mismatches = sum(checker.is_revoked(jti) != expected for jti in jtis)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{label}, {kind}: {elapsed / len(jtis) * 1e6:.1f} мкс на проверку'
+                    + (f', ошибок: {mismatches}' if mismatches else '')
+                )
+
+        if not options['keep']:
+            self.stdout.write('Удаление данных теста...')
+            cursor = 0
+            while True:
+                cursor, keys = client.scan(cursor, match=REVOCATION_KEY_PREFIX + '*', count=10_000)
+                keys = [key for key in keys if key != REVOCATION_STREAM_KEY.encode()]
+                if keys:
+                    client.unlink(*keys)
+                if not cursor:
+                    break
+            client.unlink(REVOCATION_STREAM_KEY)
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from config.async_redis import is_redis_cache
+from users.throttling import LOGIN_THROTTLES, limiter, make_key, parse_rate
+
+
+def make_view(throttles):
+    class BenchView(APIView):
+        authentication_classes = []
+        permission_classes = [AllowAny]
+        throttle_classes = throttles
+
+        def post(self, request):
+            return Response({'ok': True})
+
+    return BenchView.as_view()
+
+
+class Command(BaseCommand):
+    help = 'Накладные расходы ограничителя частоты на запрос'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        backend = 'Redis (Lua)' if is_redis_cache() else 'память процесса'
+        self.stdout.write(f'Хранилище корзин: {backend}')
+
+        # Сам ограничитель: одна корзина на запрос, лимит заведомо не достигается
+        capacity, rate = parse_rate(f'{count * 10}/min')
+        started = time.perf_counter()
+        for i in range(count):
+            limiter.hit(make_key('bench', i % 1000), capacity, rate)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'limiter.hit: {elapsed / count * 1e6:.1f} мкс на вызов')
+
+        # Полный запрос DRF без троттлинга и с троттлингом входа (IP + логин)
+        factory = APIRequestFactory()
+        timings = {}
+        for label, throttles in (('без троттлинга', []), ('IP + логин', LOGIN_THROTTLES)):
+            view = make_view(throttles)
+            started = time.perf_counter()
+            for i in range(count):
+                request = factory.post(
+                    '/bench/', {'username': f'user{i % 1000}'}, format='json',
+                    REMOTE_ADDR=f'10.0.{i % 250}.{i % 200}',
+                )
+                view(request)
+            timings[label] = (time.perf_counter() - started) / count
+            self.stdout.write(f'{label}: {timings[label] * 1e6:.1f} мкс на запрос')
+
+        overhead = timings['IP + логин'] - timings['без троттлинга']
+        self.stdout.write(f'Накладные расходы троттлинга: {overhead * 1e6:.1f} мкс на запрос')
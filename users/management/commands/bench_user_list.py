@@ -0,0 +1,60 @@
+import statistics
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from users.api.pagination import KeysetPagination
+from users.api.views import UserListView
+from users.models import Client
+
+
+class Command(BaseCommand):
+    help = 'Сравнение PageNumberPagination и курсорной пагинации списка клиентов на глубоких страницах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Сколько клиентов досоздать перед замером (например 1000000)')
+        parser.add_argument('--depths', default='1,100,10000,90000', help='Номера страниц для замера')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--fields', default='', help='Значение ?fields= для разреженного режима')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            call_command('seed_clients', options['seed'], stdout=self.stdout)
+
+        admin = Client.objects.filter(is_staff=True).first() or Client.objects.first()
+        admin.is_staff = True
+        factory = APIRequestFactory()
+        view = UserListView.as_view()
+        page_size = KeysetPagination.page_size
+        extra = f"&fields={options['fields']}" if options['fields'] else ''
+
+        def measure(url):
+            timings = []
+            for _ in range(options['repeat']):
+                request = factory.get(url)
+                force_authenticate(request, user=admin)
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.data
+            return statistics.median(timings)
+
+        pagination = KeysetPagination()
+        for depth in [int(d) for d in options['depths'].split(',')]:
+            row = (
+                Client.objects.order_by(*pagination.ordering)
+                .only('id', 'registration_date')[(depth - 1) * page_size:][:1]
+            )
+            row = list(row)
+            if not row:
+                self.stdout.write(f'Страница {depth}: нет данных')
+                continue
+            cursor = pagination.encode_cursor(row[0])
+            offset_ms = measure(f'/?page={depth}{extra}')
+            keyset_ms = measure(f'/?cursor={cursor}{extra}')
+            self.stdout.write(
+                f'Страница {depth}: OFFSET {offset_ms:.1f} мс, keyset {keyset_ms:.1f} мс'
+            )
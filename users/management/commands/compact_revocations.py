@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.revocation import revocation_store
+
+
+class Command(BaseCommand):
+    help = 'Удаление из стрима отзывов записей об уже истёкших токенах'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, запуская компактизацию раз в --interval секунд',
+        )
+        parser.add_argument('--interval', type=int, default=3600)
+
+    def handle(self, *args, **options):
+        # Сами ключи revoked:<jti> удаляет Redis по EXAT, здесь чистится только стрим
+        while True:
+            removed = revocation_store.compact()
+            self.stdout.write(f'Удалено записей стрима: {removed}; {revocation_store.stats()}')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
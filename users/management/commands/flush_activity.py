@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.activity import activity_tracker
+
+
+class Command(BaseCommand):
+    help = 'Сброс накопленных отметок last_activity в БД пакетными UPDATE'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, сбрасывая отметки раз в --interval секунд',
+        )
+        parser.add_argument('--interval', type=int, default=activity_tracker.flush_interval)
+
+    def handle(self, *args, **options):
+        while True:
+            updated = activity_tracker.flush()
+            self.stdout.write(f'Обновлено клиентов: {updated}')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
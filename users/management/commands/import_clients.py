@@ -0,0 +1,51 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.bulk_import import ClientImporter, iter_records, open_text, stream_report
+from users.hashing import HashingService
+
+
+class Command(BaseCommand):
+    help = 'Потоковый импорт клиентов из CSV или JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или - для stdin')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='По умолчанию - по расширению файла')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--workers', type=int, help='Процессов для хэширования паролей (по умолчанию HASHING_WORKERS)')
+        parser.add_argument('--report', help='Куда писать отчёт об ошибках (JSONL), по умолчанию stdout')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        importer_kwargs = {'dry_run': options['dry_run']}
+        if options['batch_size']:
+            importer_kwargs['batch_size'] = options['batch_size']
+        if options['workers']:
+            # Команда - отдельный процесс: свой пул нужного размера, очередь ему не нужна
+            importer_kwargs['hasher'] = HashingService(workers=options['workers'], max_queue=0)
+        importer = ClientImporter(**importer_kwargs)
+
+        try:
+            source = sys.stdin if path == '-' else open_text(path)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        report = open(options['report'], 'w', encoding='utf-8') if options['report'] else self.stdout
+        started = time.perf_counter()
+        try:
+            for line in stream_report(importer.run(iter_records(source, fmt))):
+                report.write(line)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if options['report']:
+                report.close()
+            if 'hasher' in importer_kwargs:
+                importer_kwargs['hasher'].shutdown()
+
+        self.stderr.write(f'Время импорта: {time.perf_counter() - started:.1f} с')
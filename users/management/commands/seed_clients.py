@@ -0,0 +1,85 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import Client
+
+INN10_WEIGHTS = (2, 4, 10, 3, 5, 9, 4, 6, 8)
+INN12_WEIGHTS_1 = (7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+INN12_WEIGHTS_2 = (3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+
+
+def _check_digit(digits, weights):
+    return sum(d * w for d, w in zip(digits, weights)) % 11 % 10
+
+
+def make_inn(number, client_type):
+    """Валидный ИНН с контрольными цифрами: 10 цифр для юрлиц, 12 для остальных"""
+    if client_type == 'organization':
+        digits = [int(c) for c in f'{number:09d}'[-9:]]
+        digits.append(_check_digit(digits, INN10_WEIGHTS))
+    else:
+        digits = [int(c) for c in f'{number:010d}'[-10:]]
+        digits.append(_check_digit(digits, INN12_WEIGHTS_1))
+        digits.append(_check_digit(digits, INN12_WEIGHTS_2))
+    return ''.join(map(str, digits))
+
+
+def make_kpp(number):
+    """КПП: код налогового органа, причина постановки на учёт 01, порядковый номер"""
+    return f'{770001000 + number % 1000:09d}'
+
+
+def make_clients(prefix, numbers, password, rng=random):
+    """Несохранённые клиенты {prefix}_{number} с валидными ИНН/КПП"""
+    types = [choice[0] for choice in Client.CLIENT_TYPE_CHOICES]
+    statuses = [choice[0] for choice in Client.CLIENT_STATUS_CHOICES]
+    clients = []
+    for number in numbers:
+        client_type = rng.choice(types)
+        clients.append(Client(
+            username=f'{prefix}_{number}',
+            email=f'{prefix}_{number}@example.com',
+            password=password,
+            inn=make_inn(number, client_type),
+            kpp=make_kpp(number) if client_type == 'organization' else None,
+            company_name=f'ООО Тест {number}' if client_type == 'organization' else None,
+            legal_address='г. Москва',
+            phone=f'+79{number % 10 ** 9:09d}',
+            client_type=client_type,
+            status=rng.choice(statuses),
+        ))
+    return clients
+
+
+class Command(BaseCommand):
+    help = 'Заполнение БД тестовыми клиентами через bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        batch_size = options['batch_size']
+        prefix = options['prefix']
+        # Один хэш на всех: сидирование не должно упираться в PBKDF2
+        password = make_password('seed-password')
+        start_number = Client.objects.filter(username__startswith=f'{prefix}_').count()
+
+        started = time.perf_counter()
+        created = 0
+        while created < count:
+            numbers = range(start_number + created, start_number + min(created + batch_size, count))
+            batch = make_clients(prefix, numbers, password)
+            with transaction.atomic():
+                Client.objects.bulk_create(batch, batch_size=batch_size)
+            created += len(batch)
+            self.stdout.write(f'\rСоздано {created}/{count}', ending='')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'\nГотово: {created} клиентов за {elapsed:.1f} с ({created / elapsed:.0f}/с)')
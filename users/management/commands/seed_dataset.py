@@ -0,0 +1,167 @@
+import hashlib
+import random
+import time
+import zlib
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from dashboard.rollups import check_rollups
+from documents.jobs import PROCESS_BLOB, blob_job_key
+from documents.models import Document, ProcessingJob, StoredBlob
+from payments.ledger import post_entries
+from payments.models import Invoice
+from payments.partitions import ensure_partitions
+from users.models import Client
+
+from .seed_clients import make_clients, make_inn, make_kpp
+
+SEED_PASSWORD = 'seed-password'
+
+DOCUMENT_KINDS = (
+    ('Договор поставки', 'application/pdf'),
+    ('Договор оказания услуг', 'application/pdf'),
+    ('Акт выполненных работ', 'application/pdf'),
+    ('Счёт-фактура', 'application/pdf'),
+    ('Скан доверенности', 'image/png'),
+)
+COUNTERPARTIES = ('Ромашка', 'Вектор', 'Альфа-Трейд', 'СеверСтрой', 'Технопарк', 'Гранит', 'Меридиан')
+
+
+class Command(BaseCommand):
+    help = (
+        'Набор данных для бенчмарков (manage.py bench_api): клиенты с валидными ИНН/КПП, '
+        'документы и счета с оплатами через журнал расчётов. Всё пачками bulk_create; '
+        f'пароль всех клиентов - {SEED_PASSWORD}. С одинаковым --seed набор воспроизводится.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100_000)
+        parser.add_argument('--documents-per-client', type=int, default=3)
+        parser.add_argument('--invoices-per-client', type=int, default=4)
+        parser.add_argument('--paid-share', type=float, default=0.6, help='Доля оплаченных счетов')
+        parser.add_argument('--months', type=int, default=12, help='За сколько месяцев разбросаны счета и оплаты')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Клиентов в одной транзакции')
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        password = make_password(SEED_PASSWORD)
+        now = timezone.now()
+        since = now - timedelta(days=30 * options['months'])
+        ensure_partitions(since)
+
+        # ИНН администратора - из верхнего диапазона номеров, свой для каждого префикса
+        admin_number = 10 ** 9 - 1 - zlib.crc32(prefix.encode()) % 10 ** 6
+        admin, created = Client.objects.get_or_create(
+            username=f'{prefix}_admin',
+            defaults={
+                'email': f'{prefix}_admin@example.com', 'password': password,
+                'inn': make_inn(admin_number, 'individual'), 'client_type': 'individual',
+                'is_staff': True, 'is_superuser': True,
+            },
+        )
+        if created:
+            self.stdout.write(f'Администратор для бенчмарков: {admin.username}')
+
+        start_number = Client.objects.filter(username__startswith=f'{prefix}_').exclude(pk=admin.pk).count()
+        totals = {'clients': 0, 'documents': 0, 'invoices': 0, 'payments': 0}
+        started = time.perf_counter()
+        while totals['clients'] < options['clients']:
+            first = start_number + totals['clients']
+            numbers = range(first, first + min(options['batch_size'], options['clients'] - totals['clients']))
+            with transaction.atomic():
+                clients = Client.objects.bulk_create(make_clients(prefix, numbers, password, rng))
+                client_ids = [client.pk for client in clients]
+                totals['documents'] += self.seed_documents(clients, options, rng)
+                invoices, payments = self.seed_payments(clients, options, rng, since, now)
+                totals['invoices'] += invoices
+                totals['payments'] += payments
+                # Документы заведены в обход document_added - счётчики кабинета по таблицам
+                check_rollups(client_ids, fix=True)
+            totals['clients'] += len(clients)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"\rКлиентов {totals['clients']}/{options['clients']} ({totals['clients'] / elapsed:.0f}/с)",
+                ending='',
+            )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"\nГотово за {elapsed:.1f} с: клиентов {totals['clients']}, документов {totals['documents']}, "
+            f"счетов {totals['invoices']}, оплат {totals['payments']}"
+        )
+
+    def seed_documents(self, clients, options, rng):
+        blobs, documents = [], []
+        for client in clients:
+            for index in range(options['documents_per_client']):
+                kind, content_type = rng.choice(DOCUMENT_KINDS)
+                counterparty_number = rng.randrange(10 ** 8)
+                contract_number = f'{rng.randrange(1, 10000)}/{rng.randrange(2019, 2026)}'
+                counterparty = f'ООО {rng.choice(COUNTERPARTIES)}'
+                blob = StoredBlob(
+                    sha256=hashlib.sha256(f'{client.username}:{index}'.encode()).hexdigest(),
+                    size=rng.randrange(20_000, 5_000_000),
+                )
+                blobs.append(blob)
+                documents.append(Document(
+                    owner=client,
+                    title=f'{kind} № {contract_number}',
+                    filename=f'{kind.lower().replace(" ", "_")}_{index}.{content_type.rsplit("/", 1)[1]}',
+                    content_type=content_type,
+                    blob=blob,
+                    contract_number=contract_number,
+                    counterparty_inn=make_inn(counterparty_number, 'organization'),
+                    counterparty_kpp=make_kpp(counterparty_number),
+                    counterparty_name=counterparty,
+                    text=f'{kind} № {contract_number} между {client.company_name or client.username} и {counterparty}',
+                ))
+        StoredBlob.objects.bulk_create(blobs)
+        for document in documents:
+            document.blob_id = document.blob.pk
+        Document.objects.bulk_create(documents)
+        # Файлы считаются обработанными: в кабинете документы готовы
+        ProcessingJob.objects.bulk_create([
+            ProcessingJob(key=blob_job_key(blob), kind=PROCESS_BLOB, payload={'blob_id': blob.pk}, status='done')
+            for blob in blobs
+        ])
+        return len(documents)
+
+    def seed_payments(self, clients, options, rng, since, now):
+        span = (now - since).total_seconds()
+        invoices = []
+        for client in clients:
+            for index in range(options['invoices_per_client']):
+                invoices.append(Invoice(
+                    client=client,
+                    number=f'{client.username}-{index}',
+                    amount=rng.randrange(1_000, 5_000_000) * 100,
+                    purpose=f'Оплата по счёту {client.username}-{index}',
+                    issued_at=since + timedelta(seconds=rng.random() * span),
+                ))
+        Invoice.objects.bulk_create(invoices)
+
+        postings = []
+        payments = 0
+        for invoice in invoices:
+            postings.append({
+                'client_id': invoice.client_id, 'kind': 'invoice', 'amount': invoice.amount,
+                'invoice_id': invoice.pk, 'reference': invoice.number, 'created_at': invoice.issued_at,
+            })
+            if rng.random() < options['paid_share']:
+                paid_at = min(invoice.issued_at + timedelta(days=rng.randrange(1, 30)), now)
+                postings.append({
+                    'client_id': invoice.client_id, 'kind': 'payment', 'amount': invoice.amount,
+                    'invoice_id': invoice.pk, 'reference': f'ПП-{invoice.pk}', 'created_at': paid_at,
+                })
+                payments += 1
+        # Баланс после проводки считается по порядку - проводки клиента по времени
+        postings.sort(key=lambda posting: (posting['client_id'], posting['created_at']))
+        post_entries(postings)
+        return len(invoices), payments
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['registration_date', 'id'], name='users_clien_registr_3863e1_idx'),
+        ),
+    ]
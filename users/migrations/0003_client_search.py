@@ -0,0 +1,64 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+import django.db.models.functions.text
+
+# search_vector ведётся триггером: срабатывает и на bulk_create/update(),
+# которые не вызывают save() и сигналы (массовый импорт, сброс активности)
+CREATE_TRIGGER = """
+CREATE FUNCTION users_client_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.inn, '') || ' ' || coalesce(NEW.kpp, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.company_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.username, '') || ' ' || coalesce(NEW.email, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.first_name, '') || ' ' || coalesce(NEW.last_name, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.legal_address, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_client_search_vector_update
+    BEFORE INSERT OR UPDATE OF inn, kpp, company_name, username, email, first_name, last_name, legal_address
+    ON users_client
+    FOR EACH ROW EXECUTE FUNCTION users_client_search_vector();
+
+UPDATE users_client SET inn = inn;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS users_client_search_vector_update ON users_client;
+DROP FUNCTION IF EXISTS users_client_search_vector();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_client_users_clien_registr_3863e1_idx'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='client',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='client_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass('inn', name='gin_trgm_ops'), name='client_inn_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('company_name'), name='gin_trgm_ops'), name='client_company_name_trgm'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -1,7 +1,16 @@
-from django.db import models
+from functools import partial
+
+from django.db import models, transaction
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.translation import gettext_lazy as _
 
+from .hashing import hashing_service
+from .profile_cache import invalidate_profile
+from .state import invalidate_client_state
+
 class Client(AbstractUser):
     """
     Модель клиента системы документооборота.
@@ -91,6 +100,9 @@ class Client(AbstractUser):
         default='pending'
     )
     
+    # Полнотекстовый индекс реквизитов, ведётся триггером в БД
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     # Исправляем конфликт related_name с моделью User
     groups = models.ManyToManyField(
         'auth.Group',
@@ -118,6 +130,12 @@ class Client(AbstractUser):
             models.Index(fields=['inn']),
             models.Index(fields=['status', 'registration_date']),
             models.Index(fields=['client_type', 'status']),
+            # Ключ курсорной пагинации списка клиентов
+            models.Index(fields=['registration_date', 'id']),
+            # Поиск: полнотекстовый и по части ИНН/названия (pg_trgm)
+            GinIndex(fields=['search_vector'], name='client_search_vector_gin'),
+            GinIndex(OpClass('inn', name='gin_trgm_ops'), name='client_inn_trgm'),
+            GinIndex(OpClass(Upper('company_name'), name='gin_trgm_ops'), name='client_company_name_trgm'),
         ]
     
     def __str__(self):
@@ -135,7 +153,19 @@ class Client(AbstractUser):
             self.kpp = None
         
         super().save(*args, **kwargs)
-    
+
+        # Сбрасываем кэш состояния (JWT без БД) и профиля - после коммита:
+        # иначе параллельный запрос успеет закэшировать ещё не изменённое состояние
+        transaction.on_commit(partial(invalidate_client_state, self.pk), using=self._state.db)
+        transaction.on_commit(partial(invalidate_profile, self.pk), using=self._state.db)
+    
+    def set_password(self, raw_password):
+        # Хэширование через ограниченный пул процессов
+        if raw_password is None:
+            return super().set_password(raw_password)
+        self.password = hashing_service.make_password(raw_password)
+        self._password = raw_password
+
     @property
     def full_info(self):
         """Полная информация о клиенте"""
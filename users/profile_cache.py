@@ -0,0 +1,125 @@
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+
+from config.async_redis import acache_get, acache_set
+from config.db_router import REPLICA_STICKY_SECONDS, replica_reads_active
+
+PROFILE_CACHE_TIMEOUT = getattr(settings, 'PROFILE_CACHE_TIMEOUT', 300)
+
+
+def _version_key(client_id):
+    return f'profile:ver:{client_id}'
+
+
+def _payload_key(client_id, version):
+    return f'profile:{client_id}:{version}'
+
+
+def _make_etag(body):
+    return '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest()
+
+
+def render_profile(client):
+    """Сериализованный профиль в байтах и его ETag"""
+    from .serializers import ClientSerializer
+
+    body = JSONRenderer().render(ClientSerializer(client).data)
+    return {'body': body, 'etag': _make_etag(body)}
+
+
+def get_profile_payload(user):
+    """
+    Профиль из кэша (ключ с версией клиента) или свежий рендер.
+    Для пользователя из токена строка Client читается только при промахе.
+    """
+    from .authentication import resolve_client
+
+    try:
+        version = cache.get(_version_key(user.pk), 0)
+        key = _payload_key(user.pk, version)
+        payload = cache.get(key)
+    except Exception:
+        # Кэш недоступен - профиль из БД, без записи в кэш
+        return render_profile(resolve_client(user))
+    if payload is None:
+        payload = render_profile(resolve_client(user))
+        # С реплики профиль мог прийти до записи, поднявшей версию: такой
+        # рендер живёт в кэше не дольше окна read-your-writes
+        timeout = min(PROFILE_CACHE_TIMEOUT, REPLICA_STICKY_SECONDS) if replica_reads_active() else PROFILE_CACHE_TIMEOUT
+        try:
+            cache.set(key, payload, timeout)
+        except Exception:
+            pass
+    return payload
+
+
+async def aget_profile_payload(client_id):
+    """Асинхронный вариант для ASGI-представлений"""
+    from .models import Client
+
+    try:
+        version = await acache_get(_version_key(client_id), 0)
+        key = _payload_key(client_id, version)
+        payload = await acache_get(key)
+    except Exception:
+        key = payload = None
+    if payload is None:
+        client = await Client.objects.aget(pk=client_id)
+        payload = await sync_to_async(render_profile)(client)
+        if key is not None:
+            try:
+                await acache_set(key, payload, PROFILE_CACHE_TIMEOUT)
+            except Exception:
+                pass
+    return payload
+
+
+def get_profile_data(user):
+    """Профиль как dict (для ответов, куда он встраивается)"""
+    return json.loads(get_profile_payload(user)['body'])
+
+
+def invalidate_profile(client_id):
+    """
+    Новая версия ключа: старые записи больше не читаются и истекут сами.
+    Внутри транзакции вызывать через transaction.on_commit - иначе параллельный
+    запрос закэширует под новой версией профиль до коммита.
+    """
+    try:
+        cache.incr(_version_key(client_id))
+    except ValueError:
+        cache.set(_version_key(client_id), 1, None)
+    except Exception:
+        pass
+
+
+def wrap_verify(payload):
+    """Ответ VerifyTokenView из готового профиля без повторной сериализации"""
+    body = b'{"valid":true,"user":' + payload['body'] + b'}'
+    return {'body': body, 'etag': _make_etag(body)}
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [value.strip() for value in if_none_match.split(',')]
+    return any(value.removeprefix('W/') == etag for value in candidates)
+
+
+def profile_response(request, payload):
+    """200 с кэшированными байтами или 304, если ETag совпал"""
+    if etag_matches(request.headers.get('If-None-Match'), payload['etag']):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(payload['body'], content_type='application/json')
+    response['ETag'] = payload['etag']
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,256 @@
+"""
+Отзыв JWT (выход из системы, ротация refresh токенов) без SQL-таблиц.
+
+Каждый отозванный jti - отдельный ключ Redis, который истекает вместе с
+токеном (SET ... EXAT exp), поэтому хранилище не растёт бесконечно, а
+проверка - один EXISTS. Перед Redis может стоять Bloom-фильтр процесса:
+для неотозванного токена (почти все запросы) ответ получается без похода
+в сеть. Фильтр догоняет другие процессы по Redis-стриму отзывов в
+фоновом потоке; там же он пересобирается и подменяется одним
+присваиванием - запрос не ждёт ни сети, ни пересборки. Если поток
+отстал (Redis недоступен), проверка идёт мимо фильтра в Redis.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from config.async_redis import get_async_redis, is_redis_cache
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_KEY_PREFIX = 'revoked:'
+REVOCATION_STREAM_KEY = 'revoked:stream'
+
+# Bloom-фильтр перед Redis и его параметры
+REVOCATION_BLOOM_ENABLED = getattr(settings, 'REVOCATION_BLOOM_ENABLED', True)
+REVOCATION_BLOOM_CAPACITY = getattr(settings, 'REVOCATION_BLOOM_CAPACITY', 1_000_000)
+REVOCATION_BLOOM_ERROR_RATE = getattr(settings, 'REVOCATION_BLOOM_ERROR_RATE', 0.001)
+# Максимальная задержка, с которой процесс видит отзыв из другого процесса
+REVOCATION_SYNC_INTERVAL = getattr(settings, 'REVOCATION_SYNC_INTERVAL', 1.0)
+# Полная пересборка фильтра (из него нельзя удалять истёкшие jti)
+REVOCATION_BLOOM_REBUILD_INTERVAL = getattr(settings, 'REVOCATION_BLOOM_REBUILD_INTERVAL', 3600)
+
+
+class BloomFilter:
+    """Простой Bloom-фильтр на bytearray (двойное хэширование blake2b)"""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+def _key(jti):
+    return REVOCATION_KEY_PREFIX + jti
+
+
+def _max_token_lifetime():
+    from rest_framework_simplejwt.settings import api_settings
+
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    return int(lifetime.total_seconds())
+
+
+class RevocationStore:
+    """
+    Хранилище отозванных jti.
+
+    С Redis: ключ на jti с EXAT и запись в стрим для Bloom-фильтров
+    других процессов. С другим кэшем (разработка) - ключи кэша с
+    таймаутом до exp, без фильтра.
+    """
+
+    def __init__(self, bloom_enabled=REVOCATION_BLOOM_ENABLED, capacity=REVOCATION_BLOOM_CAPACITY,
+                 error_rate=REVOCATION_BLOOM_ERROR_RATE, sync_interval=REVOCATION_SYNC_INTERVAL,
+                 rebuild_interval=REVOCATION_BLOOM_REBUILD_INTERVAL):
+        self.bloom_enabled = bloom_enabled
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self._bloom = None
+        self._built_at = 0
+        self._synced_at = 0
+        self._last_id = '0-0'
+        # Добавление в фильтр (запись битов) и подмена фильтра
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _redis(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+
+    # Запись
+
+    def revoke(self, jti, exp):
+        """Отозвать jti до момента exp (unix time)"""
+        if exp <= time.time():
+            return
+        if not is_redis_cache():
+            cache.set(_key(jti), 1, max(1, int(exp - time.time())))
+            return
+
+        pipe = self._redis().pipeline(transaction=False)
+        pipe.set(_key(jti), 1, exat=int(exp))
+        pipe.xadd(REVOCATION_STREAM_KEY, {'jti': jti})
+        pipe.execute()
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def revoke_token(self, token):
+        """Отозвать токен simplejwt (access или refresh)"""
+        from rest_framework_simplejwt.settings import api_settings
+
+        self.revoke(token[api_settings.JTI_CLAIM], token['exp'])
+
+    # Bloom-фильтр
+
+    def _rebuild(self, client):
+        """
+        Фильтр заново из стрима (в стриме только отзывы за время жизни токена).
+        Собирается в стороне; последние записи дочитываются под блокировкой
+        прямо перед подменой - отзыв этого процесса, попавший в старый фильтр
+        во время сборки, не теряется.
+        """
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        last_id = self._read_stream(client, bloom, '0-0')
+        with self._lock:
+            self._last_id = self._read_stream(client, bloom, last_id)
+            self._bloom = bloom
+        self._built_at = self._synced_at = time.monotonic()
+
+    def _sync(self, client):
+        """Догоняем отзывы других процессов с последней прочитанной записи"""
+        with self._lock:
+            self._last_id = self._read_stream(client, self._bloom, self._last_id)
+        self._synced_at = time.monotonic()
+
+    @staticmethod
+    def _read_stream(client, bloom, last_id):
+        """Записи стрима после last_id -> в фильтр; возвращает id последней"""
+        while True:
+            response = client.xread({REVOCATION_STREAM_KEY: last_id}, count=10000)
+            if not response:
+                return last_id
+            entries = response[0][1]
+            for entry_id, fields in entries:
+                bloom.add(fields[b'jti'].decode())
+            last_id = entries[-1][0].decode()
+
+    def refresh(self):
+        """Один шаг фонового потока: пересборка по расписанию, иначе догоняем стрим"""
+        client = self._redis()
+        if self._bloom is None or time.monotonic() - self._built_at > self.rebuild_interval:
+            self._rebuild(client)
+        else:
+            self._sync(client)
+
+    def ensure_background_sync(self):
+        """Запускает фоновый поток синхронизации фильтра (один на процесс)"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='revocation-sync', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning('Не удалось синхронизировать фильтр отзыва токенов: %s', e)
+            if self._stop.wait(self.sync_interval):
+                return
+
+    def stop(self):
+        self._stop.set()
+
+    def _fresh_bloom(self):
+        """Фильтр, если поток синхронизировал его недавно, иначе None - проверять в Redis"""
+        self.ensure_background_sync()
+        bloom = self._bloom
+        if bloom is None or time.monotonic() - self._synced_at > 2 * self.sync_interval:
+            return None
+        return bloom
+
+    # Проверка
+
+    def is_revoked(self, jti):
+        if not is_redis_cache():
+            return cache.get(_key(jti)) is not None
+
+        if self.bloom_enabled:
+            bloom = self._fresh_bloom()
+            if bloom is not None and jti not in bloom:
+                return False
+        return bool(self._redis().exists(_key(jti)))
+
+    async def ais_revoked(self, jti):
+        """Асинхронная проверка: фильтр не ходит в сеть, event loop не блокируется"""
+        if not is_redis_cache():
+            return await cache.aget(_key(jti)) is not None
+
+        if self.bloom_enabled:
+            bloom = self._fresh_bloom()
+            if bloom is not None and jti not in bloom:
+                return False
+        return bool(await get_async_redis().exists(_key(jti)))
+
+    def is_token_revoked(self, token):
+        from rest_framework_simplejwt.settings import api_settings
+
+        jti = token.get(api_settings.JTI_CLAIM)
+        return jti is not None and self.is_revoked(jti)
+
+    # Обслуживание
+
+    def compact(self):
+        """
+        Удаляет из стрима записи старше максимального времени жизни токена:
+        такие токены уже истекли (их ключи Redis удалены по EXAT).
+        Возвращает число удалённых записей.
+        """
+        if not is_redis_cache():
+            return 0
+        min_id = int((time.time() - _max_token_lifetime()) * 1000)
+        return self._redis().xtrim(REVOCATION_STREAM_KEY, minid=min_id, approximate=False)
+
+    def stats(self):
+        if not is_redis_cache():
+            return {}
+        client = self._redis()
+        return {
+            'stream_length': client.xlen(REVOCATION_STREAM_KEY),
+            'bloom_entries': self._bloom.count if self._bloom is not None else None,
+            'bloom_bytes': len(self._bloom.bits) if self._bloom is not None else None,
+        }
+
+
+revocation_store = RevocationStore()
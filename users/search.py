@@ -0,0 +1,9 @@
+from config.search import search_queryset
+
+# Поля с trigram-индексами (см. Client.Meta.indexes)
+CLIENT_SUBSTRING_LOOKUPS = ('inn__contains', 'company_name__icontains')
+
+
+def search_clients(queryset, text):
+    """Клиенты по реквизитам: ИНН/КПП, название, логин, email, ФИО, адрес"""
+    return search_queryset(queryset, text, CLIENT_SUBSTRING_LOOKUPS)
@@ -2,7 +2,13 @@ from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from .models import Client
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import authenticate
+from django.utils.translation import gettext_lazy as _
+from .authentication import add_client_claims
+from .revocation import revocation_store
 
 class ClientSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False)
@@ -114,15 +120,33 @@ class LoginSerializer(serializers.Serializer):
 def get_tokens_for_user(user):
     """Создание JWT токенов для пользователя"""
     refresh = RefreshToken.for_user(user)
-    
+
     # Добавляем кастомные данные в токен (как в CustomTokenObtainPairSerializer)
-    refresh['username'] = user.username
-    refresh['email'] = user.email
-    refresh['inn'] = user.inn
-    refresh['client_type'] = user.client_type
-    refresh['company_name'] = user.company_name or ''
-    
+    add_client_claims(refresh, user)
+
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
-    }
\ No newline at end of file
+    }
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """Обновление токена с проверкой отзыва refresh токена в Redis"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if revocation_store.is_token_revoked(refresh):
+            raise TokenError(_('Token is blacklisted'))
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                revocation_store.revoke_token(refresh)
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+
+            data['refresh'] = str(refresh)
+
+        return data
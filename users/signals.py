@@ -0,0 +1,87 @@
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Client
+from .state import invalidate_client_state
+from .stats import apply_statistics_delta, contribution
+
+STATS_FIELDS = ('is_active', 'status', 'client_type')
+
+
+def _stats_contribution(instance):
+    # Отложенные поля (.only/.defer) не трогаем, чтобы не вызвать лишний запрос
+    if any(field not in instance.__dict__ for field in STATS_FIELDS):
+        return None
+    return contribution(instance.is_active, instance.status, instance.client_type)
+
+
+@receiver(post_init, sender=Client)
+def client_initialized(sender, instance, **kwargs):
+    instance._stats_contribution = _stats_contribution(instance) if instance.pk else {}
+
+
+@receiver(post_save, sender=Client)
+def client_saved(sender, instance, created, **kwargs):
+    old = {} if created else instance._stats_contribution
+    new = _stats_contribution(instance)
+    instance._stats_contribution = new
+    if old is None or new is None or old == new:
+        return
+    transaction.on_commit(lambda: apply_statistics_delta(old, new))
+
+
+def _invalidate_on_commit(client_ids):
+    # Сброс после коммита: до него параллельный запрос закэшировал бы старое состояние
+    client_ids = list(client_ids)
+    if client_ids:
+        transaction.on_commit(lambda: [invalidate_client_state(client_id) for client_id in client_ids])
+
+
+def _group_members(group_ids):
+    return Client.objects.filter(groups__in=group_ids).values_list('pk', flat=True).distinct()
+
+
+@receiver(post_delete, sender=Client)
+def client_deleted(sender, instance, **kwargs):
+    _invalidate_on_commit([instance.pk])
+    old = instance._stats_contribution
+    if old:
+        transaction.on_commit(lambda: apply_statistics_delta(old, {}))
+
+
+@receiver(m2m_changed, sender=Client.groups.through)
+@receiver(m2m_changed, sender=Client.user_permissions.through)
+def client_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Права клиента изменились - сбрасываем закэшированное состояние"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _invalidate_on_commit([instance.pk])
+        return
+    # Со стороны группы или права: group.user_set.add(...) и т.п.
+    if action in ('post_add', 'post_remove') and pk_set:
+        _invalidate_on_commit(pk_set)
+    elif action == 'pre_clear':
+        # В post_clear pk_set пуст - клиентов берём до очистки
+        lookup = 'groups' if sender is Client.groups.through else 'user_permissions'
+        _invalidate_on_commit(Client.objects.filter(**{lookup: instance}).values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Права группы изменились - сбрасываем состояние её участников"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        _invalidate_on_commit(_group_members([instance.pk]))
+    elif action == 'pre_clear':
+        _invalidate_on_commit(_group_members(instance.group_set.values_list('pk', flat=True)))
+    elif pk_set:
+        _invalidate_on_commit(_group_members(pk_set))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # Связи с клиентами удаляются каскадом без m2m_changed
+    _invalidate_on_commit(_group_members([instance.pk]))
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from config.async_redis import acache_get, acache_set
+
+# Изменяемая часть клиента, которую нельзя доверить claims токена
+STATE_FIELDS = ('is_active', 'status', 'is_staff', 'is_superuser')
+# Реквизиты, которые клиент может сменить при живом токене: тоже из кэша, не из claims
+PROFILE_FIELDS = ('username', 'email', 'client_type', 'company_name')
+
+STATE_CACHE_TIMEOUT = getattr(settings, 'CLIENT_STATE_CACHE_TIMEOUT', 300)
+STATE_LOCAL_TTL = getattr(settings, 'CLIENT_STATE_LOCAL_TTL', 5)
+STATE_LOCAL_MAX_SIZE = getattr(settings, 'CLIENT_STATE_LOCAL_MAX_SIZE', 10000)
+
+_local_cache = {}
+_local_lock = threading.Lock()
+
+
+def _cache_key(client_id):
+    # v2: в состояние добавлены PROFILE_FIELDS, старые записи не читаем
+    return f'client_state:v2:{client_id}'
+
+
+def _load_state(client_id):
+    """Загрузка состояния клиента из БД (только при промахе кэша)"""
+    from .models import Client
+
+    client = Client.objects.filter(pk=client_id).only(*STATE_FIELDS, *PROFILE_FIELDS).first()
+    if client is None:
+        return None
+
+    state = {field: getattr(client, field) for field in STATE_FIELDS + PROFILE_FIELDS}
+    if client.is_active and not client.is_superuser:
+        state['permissions'] = sorted(client.get_all_permissions())
+    else:
+        state['permissions'] = []
+    return state
+
+
+def get_client_state(client_id):
+    """
+    Состояние клиента: сначала локальный кэш процесса (живёт STATE_LOCAL_TTL
+    секунд), затем Redis, затем БД. Возвращает None, если клиент удалён.
+    """
+    now = time.monotonic()
+    entry = _local_cache.get(client_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    state = None
+    try:
+        state = cache.get(_cache_key(client_id))
+    except Exception:
+        # Redis недоступен - идём в БД
+        pass
+
+    if state is None:
+        state = _load_state(client_id)
+        if state is None:
+            return None
+        try:
+            cache.set(_cache_key(client_id), state, STATE_CACHE_TIMEOUT)
+        except Exception:
+            pass
+
+    _remember_local(client_id, state, now)
+    return state
+
+
+def _remember_local(client_id, state, now):
+    with _local_lock:
+        if len(_local_cache) >= STATE_LOCAL_MAX_SIZE:
+            _local_cache.clear()
+        _local_cache[client_id] = (now + STATE_LOCAL_TTL, state)
+
+
+async def aget_client_state(client_id):
+    """Асинхронный вариант get_client_state (redis.asyncio + async ORM)"""
+    now = time.monotonic()
+    entry = _local_cache.get(client_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    state = None
+    try:
+        state = await acache_get(_cache_key(client_id))
+    except Exception:
+        pass
+
+    if state is None:
+        state = await sync_to_async(_load_state)(client_id)
+        if state is None:
+            return None
+        try:
+            await acache_set(_cache_key(client_id), state, STATE_CACHE_TIMEOUT)
+        except Exception:
+            pass
+
+    _remember_local(client_id, state, now)
+    return state
+
+
+def invalidate_client_state(client_id):
+    """Сброс кэша состояния (вызывается из Client.save и сигналов)"""
+    with _local_lock:
+        _local_cache.pop(client_id, None)
+    try:
+        cache.delete(_cache_key(client_id))
+    except Exception:
+        pass
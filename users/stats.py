@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, Q
+
+from config.db_router import replica_reads
+
+logger = logging.getLogger(__name__)
+
+# Как часто пересчитывать статистику агрегатным запросом (поправка дрейфа счётчиков)
+CLIENT_STATS_TTL = getattr(settings, 'CLIENT_STATS_TTL', 60)
+
+STATS_SNAPSHOT_KEY = 'client_stats:snapshot'
+STATS_COUNTER_PREFIX = 'client_stats:'
+
+STATS_FILTERS = {
+    'total_users': Q(),
+    'active_users': Q(is_active=True),
+    'pending_users': Q(status='pending'),
+    'active_companies': Q(status='active', client_type='organization'),
+    'individuals': Q(client_type='individual'),
+    'organizations': Q(client_type='organization'),
+}
+
+_refresh_lock = threading.Lock()
+
+
+def contribution(is_active, status, client_type):
+    """Вклад одного клиента в каждый из счётчиков (0 или 1)"""
+    return {
+        'total_users': 1,
+        'active_users': int(bool(is_active)),
+        'pending_users': int(status == 'pending'),
+        'active_companies': int(status == 'active' and client_type == 'organization'),
+        'individuals': int(client_type == 'individual'),
+        'organizations': int(client_type == 'organization'),
+    }
+
+
+@replica_reads()
+def compute_client_statistics():
+    """Вся статистика одним запросом с условной агрегацией (с реплики, если есть)"""
+    from .models import Client
+
+    return Client.objects.order_by().aggregate(**{
+        name: Count('pk', filter=condition) if condition else Count('pk')
+        for name, condition in STATS_FILTERS.items()
+    })
+
+
+def refresh_client_statistics():
+    """Пересчёт статистики: обновляет снимок и выравнивает счётчики"""
+    stats = compute_client_statistics()
+    cache.set(STATS_SNAPSHOT_KEY, {'stats': stats, 'computed_at': time.time()}, None)
+    cache.set_many({STATS_COUNTER_PREFIX + name: value for name, value in stats.items()}, None)
+    return stats
+
+
+def _refresh_in_background():
+    # Один фоновый пересчёт на процесс
+    if not _refresh_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            refresh_client_statistics()
+        except Exception as e:
+            logger.warning('Не удалось пересчитать статистику клиентов: %s', e)
+        finally:
+            connections.close_all()
+            _refresh_lock.release()
+
+    threading.Thread(target=run, name='client-stats-refresh', daemon=True).start()
+
+
+def get_client_statistics():
+    """
+    Статистика клиентов без сканирования таблицы на каждый запрос.
+    Значения берутся из счётчиков, которые ведут сигналы Client; раз в
+    CLIENT_STATS_TTL секунд счётчики сверяются с агрегатным запросом в фоне.
+    """
+    snapshot = cache.get(STATS_SNAPSHOT_KEY)
+    if snapshot is None:
+        return refresh_client_statistics()
+
+    if time.time() - snapshot['computed_at'] > CLIENT_STATS_TTL:
+        _refresh_in_background()
+
+    keys = [STATS_COUNTER_PREFIX + name for name in STATS_FILTERS]
+    counters = cache.get_many(keys)
+    if len(counters) != len(keys):
+        return snapshot['stats']
+    return {name: counters[STATS_COUNTER_PREFIX + name] for name in STATS_FILTERS}
+
+
+def apply_statistics_delta(old, new):
+    """Инкрементальное обновление счётчиков по изменению вкладов клиента"""
+    for name in STATS_FILTERS:
+        delta = new.get(name, 0) - old.get(name, 0)
+        if not delta:
+            continue
+        try:
+            cache.incr(STATS_COUNTER_PREFIX + name, delta)
+        except ValueError:
+            # Счётчика ещё нет - он появится при следующем пересчёте
+            pass
+        except Exception as e:
+            logger.warning('Не удалось обновить счётчик %s: %s', name, e)
@@ -1,3 +1,360 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from config import query_audit
+from config.query_audit import QueryBudgetExceeded, audit_queries
+
+from . import health, revocation, serializers, state, throttling
+from .admin import ClientAdmin
+from .api.views import UserListView
+from .authentication import ClientTokenUser, StatelessJWTAuthentication
+from .models import Client
+from .revocation import BloomFilter, RevocationStore
+from .serializers import get_tokens_for_user
+
+
+def make_clients(count, start=0):
+    Client.objects.bulk_create([
+        Client(username=f'client{n}', email=f'client{n}@example.com', inn=f'77{n:08d}', legal_address='г. Москва', phone='+79990000000')
+        for n in range(start, start + count)
+    ])
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Число запросов списков не растёт с числом строк: аудит запросов в
+    строгом режиме (QUERY_AUDIT_STRICT), как в CI, - превышение бюджета
+    роняет запрос с QueryBudgetExceeded.
+    """
+
+    def setUp(self):
+        # Флаги читаются при импорте config.query_audit, middleware - при первом запросе клиента
+        for name in ('QUERY_AUDIT', 'QUERY_AUDIT_STRICT'):
+            patcher = mock.patch.object(query_audit, name, True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.admin = Client.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin-pass', inn='7800000000',
+        )
+
+    def get_count(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return int(response['X-Query-Count']), response.get('X-Query-Budget')
+
+    def test_user_list_within_budget(self):
+        api = APIClient()
+        api.force_authenticate(self.admin)
+        url = reverse('users:user-list')
+
+        make_clients(3)
+        few, budget = self.get_count(api, url)
+        make_clients(30, start=3)
+        many, _ = self.get_count(api, url)
+        cursor, _ = self.get_count(api, f'{url}?pagination=cursor&fields=id,username')
+
+        self.assertEqual(budget, str(UserListView.query_budget))
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, UserListView.query_budget)
+        # Без COUNT(*)
+        self.assertEqual(cursor, many - 1)
+
+    def test_client_admin_changelist_within_budget(self):
+        self.client.force_login(self.admin)
+        url = reverse('admin:users_client_changelist')
+
+        make_clients(3)
+        few, budget = self.get_count(self.client, url)
+        make_clients(30, start=3)
+        many, _ = self.get_count(self.client, url)
+
+        self.assertEqual(budget, str(ClientAdmin.query_budgets['changelist_view']))
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, ClientAdmin.query_budgets['changelist_view'])
+
+    def test_audit_queries_reports_n_plus_one(self):
+        make_clients(10)
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with audit_queries(budget=3, label='группы клиентов'):
+                for client in Client.objects.all():
+                    list(client.groups.all())
+        self.assertIn('группы клиентов: 12 запросов к БД при бюджете 3', str(raised.exception))
+        self.assertIn('раз: SELECT', str(raised.exception))
+
+
+def clear_state_cache():
+    state._local_cache.clear()
+    cache.clear()
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    """Пользователь из токена: из claims только id и ИНН, остальное - из кэша состояния"""
+
+    def setUp(self):
+        clear_state_cache()
+        self.addCleanup(clear_state_cache)
+        self.client_obj = Client.objects.create_user(
+            username='payer', email='payer@example.com', password='payer-pass', inn='7701000001',
+            legal_address='г. Москва', phone='+79990000000', company_name='ООО Ромашка',
+        )
+        self.token = get_tokens_for_user(self.client_obj)['access']
+
+    def authenticate(self):
+        auth = StatelessJWTAuthentication()
+        user = auth.get_user(auth.get_validated_token(self.token.encode()))
+        self.assertIsInstance(user, ClientTokenUser)
+        return user
+
+    def update(self, **fields):
+        for name, value in fields.items():
+            setattr(self.client_obj, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_obj.save()
+
+    def test_identity_without_client_query(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertEqual((user.pk, user.inn, user.username, user.email), (
+                self.client_obj.pk, '7701000001', 'payer', 'payer@example.com',
+            ))
+            self.assertEqual((user.company_name, user.client_type), ('ООО Ромашка', self.client_obj.client_type))
+            self.assertTrue(user.is_active)
+
+    def test_changed_fields_win_over_token_claims(self):
+        self.authenticate()
+        self.update(username='renamed', company_name='ООО Лютик', email='new@example.com')
+        user = self.authenticate()
+        self.assertEqual((user.username, user.company_name, user.email), ('renamed', 'ООО Лютик', 'new@example.com'))
+        self.assertEqual(str(user), 'ООО Лютик (ИНН: 7701000001)')
+
+    def test_state_reset_only_after_commit(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client_obj.username = 'renamed'
+            self.client_obj.save()
+            # До коммита в кэше остаётся старое состояние
+            self.assertEqual(self.authenticate().username, 'payer')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.authenticate().username, 'renamed')
+
+    def test_deactivated_client_rejected(self):
+        self.authenticate()
+        self.update(is_active=False)
+        response = APIClient().get(reverse('users:profile'), HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, 401)
+
+    def test_unknown_attribute_fails_loudly(self):
+        user = self.authenticate()
+        with self.assertLogs('users.authentication', 'ERROR'), self.assertNumQueries(0):
+            with self.assertRaises(AttributeError):
+                user.legal_address
+        self.assertEqual(user.client.legal_address, 'г. Москва')
+
+    def test_profile_reads_full_client(self):
+        response = APIClient().get(reverse('users:profile'), HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.json()['legal_address'], 'г. Москва')
+
+
+class ClientStateSignalTests(TestCase):
+    """Права в кэше состояния сбрасываются при изменении групп и прав после коммита"""
+
+    def setUp(self):
+        clear_state_cache()
+        self.addCleanup(clear_state_cache)
+        self.client_obj = Client.objects.create_user(
+            username='payer', password='payer-pass', inn='7701000001', legal_address='г. Москва', phone='+79990000000',
+        )
+        self.group = Group.objects.create(name='Бухгалтерия')
+        self.perm = Permission.objects.get(codename='view_client')
+
+    def permissions(self):
+        return state.get_client_state(self.client_obj.pk)['permissions']
+
+    def assert_reset(self, change, expected):
+        self.permissions()
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertEqual(self.permissions(), expected)
+
+    def test_client_permissions(self):
+        self.assert_reset(lambda: self.client_obj.user_permissions.add(self.perm), ['users.view_client'])
+        self.assert_reset(lambda: self.client_obj.user_permissions.clear(), [])
+
+    def test_client_groups(self):
+        self.group.permissions.add(self.perm)
+        self.assert_reset(lambda: self.client_obj.groups.add(self.group), ['users.view_client'])
+        self.assert_reset(lambda: self.client_obj.groups.remove(self.group), [])
+
+    def test_group_side_changes(self):
+        self.group.permissions.add(self.perm)
+        self.assert_reset(lambda: self.group.client_set.add(self.client_obj), ['users.view_client'])
+        self.assert_reset(lambda: self.group.client_set.clear(), [])
+
+    def test_group_permissions_reach_members(self):
+        self.client_obj.groups.add(self.group)
+        self.assert_reset(lambda: self.group.permissions.add(self.perm), ['users.view_client'])
+        self.assert_reset(lambda: self.perm.group_set.clear(), [])
+
+    def test_group_deleted(self):
+        self.group.permissions.add(self.perm)
+        self.client_obj.groups.add(self.group)
+        with self.captureOnCommitCallbacks(execute=True):
+            pass
+        self.assert_reset(self.group.delete, [])
+
+
+class RunChecksTests(TestCase):
+
+    def test_hung_probe_is_not_started_again(self):
+        release = threading.Event()
+        calls = []
+
+        def hung():
+            calls.append(1)
+            release.wait(5)
+
+        self.addCleanup(release.set)
+        self.assertEqual(health.run_checks({'slow': hung}, timeout=0.05), {'slow': 'Таймаут проверки (0.05 с)'})
+        self.assertEqual(health.run_checks({'slow': hung, 'ok': lambda: None}, timeout=0.05), {
+            'slow': 'Таймаут проверки (0.05 с)', 'ok': None,
+        })
+        self.assertEqual(len(calls), 1)
+
+        release.set()
+        self.assertEqual(health.run_checks({'slow': hung}), {'slow': None})
+
+
+class RevocationTests(TestCase):
+    """Отзыв токенов при выходе и ротации (кэш без Redis - ключи кэша)"""
+
+    def setUp(self):
+        clear_state_cache()
+        self.addCleanup(clear_state_cache)
+        self.client_obj = Client.objects.create_user(
+            username='payer', password='payer-pass', inn='7701000001', legal_address='г. Москва', phone='+79990000000',
+        )
+        self.tokens = get_tokens_for_user(self.client_obj)
+        self.api = APIClient()
+
+    def bearer(self, token):
+        return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def refresh(self, url_name, token):
+        return self.api.post(reverse(url_name), {'refresh': token}, format='json')
+
+    def test_logout_revokes_access_and_refresh(self):
+        access, refresh = self.tokens['access'], self.tokens['refresh']
+        self.assertEqual(self.api.get(reverse('users:verify_token'), **self.bearer(access)).status_code, 200)
+        self.assertEqual(self.api.get(reverse('users:async_verify_token'), **self.bearer(access)).status_code, 200)
+
+        response = self.api.post(reverse('users:logout'), {'refresh': refresh}, format='json', **self.bearer(access))
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.api.get(reverse('users:verify_token'), **self.bearer(access)).status_code, 401)
+        self.assertEqual(self.api.get(reverse('users:async_verify_token'), **self.bearer(access)).status_code, 401)
+        self.assertEqual(self.refresh('users:token_refresh', refresh).status_code, 401)
+        self.assertEqual(self.refresh('users:async_token_refresh', refresh).status_code, 401)
+
+    def test_rotation_revokes_old_refresh(self):
+        for name in ('ROTATE_REFRESH_TOKENS', 'BLACKLIST_AFTER_ROTATION'):
+            patcher = mock.patch.object(serializers.api_settings, name, True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        old = self.tokens['refresh']
+        response = self.refresh('users:token_refresh', old)
+        self.assertEqual(response.status_code, 200)
+        new = response.json()['refresh']
+        self.assertNotEqual(new, old)
+
+        self.assertEqual(self.refresh('users:token_refresh', old).status_code, 401)
+        self.assertEqual(self.refresh('users:async_token_refresh', old).status_code, 401)
+        self.assertEqual(self.refresh('users:async_token_refresh', new).status_code, 200)
+
+
+class RevocationStoreBloomTests(TestCase):
+    """Bloom-фильтр перед Redis: устаревший фильтр не отвечает за Redis"""
+
+    def setUp(self):
+        patcher = mock.patch.object(revocation, 'is_redis_cache', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.redis = mock.Mock()
+        self.redis.exists.return_value = 0
+        self.store = RevocationStore(capacity=1000, error_rate=0.001, sync_interval=1)
+        self.store._redis = lambda: self.redis
+        self.store.ensure_background_sync = lambda: None
+        self.store._bloom = BloomFilter(1000, 0.001)
+
+    def test_fresh_filter_answers_without_redis(self):
+        self.store._synced_at = time.monotonic()
+        self.assertFalse(self.store.is_revoked('jti-1'))
+        self.redis.exists.assert_not_called()
+
+    def test_filter_hit_is_confirmed_in_redis(self):
+        self.store._synced_at = time.monotonic()
+        self.store.revoke('jti-1', time.time() + 60)
+        self.redis.exists.return_value = 1
+        self.assertTrue(self.store.is_revoked('jti-1'))
+        self.redis.exists.assert_called_once_with('revoked:jti-1')
+
+    def test_stale_filter_falls_back_to_exists(self):
+        # Поток синхронизации отстал: отзыв из другого процесса в фильтр не попал
+        self.store._synced_at = time.monotonic() - 10
+        self.redis.exists.return_value = 1
+        self.assertTrue(self.store.is_revoked('jti-2'))
+        self.redis.exists.assert_called_once_with('revoked:jti-2')
+
+
+class LoginThrottleTests(TestCase):
+    """Token bucket на вход: 429 с Retry-After, ключ IP - только REMOTE_ADDR без прокси"""
+
+    def setUp(self):
+        patchers = [
+            mock.patch.object(throttling, 'limiter', throttling.TokenBucketLimiter()),
+            mock.patch.dict(throttling.drf_settings.DEFAULT_THROTTLE_RATES, {'login_ip': '4/min', 'login_username': '2/min'}),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def login(self, username, url_name='users:login', **extra):
+        return self.client.post(
+            reverse(url_name), {'username': username, 'password': 'wrong-pass'}, content_type='application/json', **extra,
+        )
+
+    def test_username_bucket_returns_retry_after(self):
+        self.assertEqual([self.login('payer').status_code for _ in range(2)], [401, 401])
+        response = self.login('Payer ')
+        self.assertEqual(response.status_code, 429)
+        # 2 попытки в минуту: следующая примерно через 30 секунд
+        self.assertIn(response['Retry-After'], ('29', '30'))
+        self.assertEqual(self.login('other').status_code, 401)
+
+    def test_async_login_shares_buckets(self):
+        self.assertEqual([self.login('payer').status_code for _ in range(2)], [401, 401])
+        response = self.login('payer', url_name='users:async_login')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(response['Retry-After'], ('29', '30'))
+
+    def test_forwarded_for_ignored_without_proxies(self):
+        codes = [
+            self.login(f'user{n}', HTTP_X_FORWARDED_FOR=f'10.0.0.{n}').status_code for n in range(5)
+        ]
+        self.assertEqual(codes, [401, 401, 401, 401, 429])
 
-# Create your tests here.
+    def test_forwarded_for_used_behind_proxy(self):
+        with mock.patch.object(throttling.drf_settings, 'NUM_PROXIES', 1):
+            codes = [
+                self.login(f'user{n}', HTTP_X_FORWARDED_FOR=f'10.0.0.{n}').status_code for n in range(5)
+            ]
+        self.assertEqual(codes, [401] * 5)
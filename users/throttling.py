@@ -0,0 +1,239 @@
+"""
+Ограничение частоты запросов (token bucket) для входа, выдачи токенов,
+регистрации и публичных эндпоинтов.
+
+Состояние корзины хранится в Redis и обновляется атомарно Lua-скриптом
+(время берётся из Redis, поэтому часы воркеров не важны). Если Redis
+недоступен или кэш не Redis, используется корзина в памяти процесса
+(не больше THROTTLE_LOCAL_MAX_SIZE ключей, вытесняются давно не тронутые).
+
+IP клиента - BaseThrottle.get_ident с NUM_PROXIES из REST_FRAMEWORK: без
+него ключом стал бы X-Forwarded-For, который клиент подставляет сам.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework.throttling import BaseThrottle
+
+from config.async_redis import get_async_redis, is_redis_cache
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_KEY_PREFIX = 'throttle:'
+THROTTLE_LOCAL_MAX_SIZE = getattr(settings, 'THROTTLE_LOCAL_MAX_SIZE', 100_000)
+
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = math.ceil((cost - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate))
+return {allowed, wait}
+"""
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/min' -> (ёмкость 10, пополнение токенов в миллисекунду)"""
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / (PERIODS[period[0]] * 1000)
+
+
+class TokenBucketLimiter:
+    """Token bucket в Redis (Lua) с запасной корзиной в памяти процесса"""
+
+    def __init__(self):
+        self._script = None
+        self._async_scripts = weakref.WeakKeyDictionary()
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _redis_script(self):
+        if self._script is None:
+            from django_redis import get_redis_connection
+            self._script = get_redis_connection('default').register_script(TOKEN_BUCKET_LUA)
+        return self._script
+
+    def _async_script(self):
+        client = get_async_redis()
+        script = self._async_scripts.get(client)
+        if script is None:
+            script = client.register_script(TOKEN_BUCKET_LUA)
+            self._async_scripts[client] = script
+        return script
+
+    def hit(self, key, capacity, rate, cost=1):
+        """
+        Списать cost токенов из корзины key.
+        Возвращает (разрешено, сколько секунд ждать до следующей попытки).
+        """
+        if is_redis_cache():
+            try:
+                allowed, wait = self._redis_script()(keys=[key], args=[rate, capacity, cost])
+                return bool(allowed), wait / 1000
+            except Exception as e:
+                logger.warning('Ограничитель частоты без Redis: %s', e)
+        return self._hit_local(key, capacity, rate, cost)
+
+    async def ahit(self, key, capacity, rate, cost=1):
+        """Асинхронный вариант hit через redis.asyncio"""
+        if is_redis_cache():
+            try:
+                allowed, wait = await self._async_script()(keys=[key], args=[rate, capacity, cost])
+                return bool(allowed), wait / 1000
+            except Exception as e:
+                logger.warning('Ограничитель частоты без Redis: %s', e)
+        return self._hit_local(key, capacity, rate, cost)
+
+    def _hit_local(self, key, capacity, rate, cost):
+        now = time.monotonic() * 1000
+        with self._lock:
+            tokens, ts = self._local.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - ts) * rate)
+            if tokens >= cost:
+                allowed, wait = True, 0
+                tokens -= cost
+            else:
+                allowed, wait = False, math.ceil((cost - tokens) / rate)
+            self._local[key] = (tokens, now)
+            self._local.move_to_end(key)
+            if len(self._local) > THROTTLE_LOCAL_MAX_SIZE:
+                self._local.popitem(last=False)
+        return allowed, wait / 1000
+
+
+limiter = TokenBucketLimiter()
+
+
+def get_rate(scope):
+    return drf_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+
+def make_key(scope, ident):
+    return f'{THROTTLE_KEY_PREFIX}{scope}:{ident}'
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Базовый DRF-троттлинг на token bucket. Наследники задают scope
+    (ключ в DEFAULT_THROTTLE_RATES) и get_ident_value.
+    Время ожидания DRF отдаёт в заголовке Retry-After.
+    """
+    scope = None
+
+    def __init__(self):
+        self.rate = get_rate(self.scope)
+        self.wait_seconds = None
+
+    def get_ident_value(self, request, view):
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        if not self.rate:
+            return True
+        ident = self.get_ident_value(request, view)
+        if not ident:
+            return True
+        capacity, rate = parse_rate(self.rate)
+        allowed, self.wait_seconds = limiter.hit(make_key(self.scope, ident), capacity, rate)
+        return allowed
+
+    def wait(self):
+        # Retry-After - целые секунды, округляем вверх
+        return math.ceil(self.wait_seconds) if self.wait_seconds else None
+
+
+def _field(request, name):
+    try:
+        value = request.data.get(name)
+    except Exception:
+        return None
+    if not isinstance(value, str) or not value.strip():
+        return None
+    return value.strip().lower()
+
+
+def hash_ident(value):
+    """Логины и email в ключах Redis - в виде хэша фиксированной длины"""
+    return hashlib.sha1(value.encode()).hexdigest()
+
+
+class LoginIPThrottle(TokenBucketThrottle):
+    """Попытки входа с одного IP"""
+    scope = 'login_ip'
+
+
+class LoginUsernameThrottle(TokenBucketThrottle):
+    """Попытки входа в одну учётную запись (перебор паролей с разных IP)"""
+    scope = 'login_username'
+
+    def get_ident_value(self, request, view):
+        username = _field(request, 'username')
+        return hash_ident(username) if username else None
+
+
+class RegisterIPThrottle(TokenBucketThrottle):
+    """Регистрации с одного IP"""
+    scope = 'register_ip'
+
+
+class RegisterINNThrottle(TokenBucketThrottle):
+    """Регистрации на один ИНН"""
+    scope = 'register_inn'
+
+    def get_ident_value(self, request, view):
+        return _field(request, 'inn')
+
+
+class PublicIPThrottle(TokenBucketThrottle):
+    """Публичные эндпоинты без аутентификации"""
+    scope = 'public_ip'
+
+
+LOGIN_THROTTLES = [LoginIPThrottle, LoginUsernameThrottle]
+REGISTER_THROTTLES = [RegisterIPThrottle, RegisterINNThrottle]
+
+
+async def acheck_login_rate(request, username):
+    """
+    Троттлинг входа для async-представлений.
+    Возвращает None или число секунд для Retry-After.
+    """
+    checks = [(LoginIPThrottle.scope, BaseThrottle().get_ident(request))]
+    if username:
+        checks.append((LoginUsernameThrottle.scope, hash_ident(username.strip().lower())))
+
+    waits = []
+    for scope, ident in checks:
+        rate = get_rate(scope)
+        if not rate:
+            continue
+        capacity, per_ms = parse_rate(rate)
+        allowed, wait = await limiter.ahit(make_key(scope, ident), capacity, per_ms)
+        if not allowed:
+            waits.append(wait)
+    return math.ceil(max(waits)) if waits else None
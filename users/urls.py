@@ -1,6 +1,8 @@
 from django.urls import path
-from . import views
-from .health import HealthCheckView
+from django.views.decorators.csrf import csrf_exempt
+from . import async_views, views
+from .api.views import ClientBulkImportView, ClientSearchView, UserListView
+from .health import HashingMetricsView, HealthCheckView, LivenessView, ProfilerView, ReadinessView
 
 app_name = 'users'
 
@@ -14,10 +16,25 @@ urlpatterns = [
     path('logout/', views.LogoutView.as_view(), name='logout'),
     path('verify/', views.VerifyTokenView.as_view(), name='verify_token'),
     path('health/', HealthCheckView.as_view(), name='health_check'),
+    path('health/live/', LivenessView.as_view(), name='health_live'),
+    path('health/ready/', ReadinessView.as_view(), name='health_ready'),
+    path('health/hashing/', HashingMetricsView.as_view(), name='health_hashing'),
+    path('health/profile/', ProfilerView.as_view(), name='health_profile'),
     
     # Профиль пользователя
     path('profile/', views.UserProfileView.as_view(), name='profile'),
+
+    # Список клиентов (для администраторов)
+    path('clients/', UserListView.as_view(), name='user-list'),
+    path('clients/import/', ClientBulkImportView.as_view(), name='client-import'),
+    path('clients/search/', ClientSearchView.as_view(), name='client-search'),
     
+    # Асинхронные варианты (для запуска под ASGI/uvicorn)
+    path('async/login/', csrf_exempt(async_views.AsyncLoginView.as_view()), name='async_login'),
+    path('async/token/refresh/', csrf_exempt(async_views.AsyncTokenRefreshView.as_view()), name='async_token_refresh'),
+    path('async/verify/', async_views.AsyncVerifyTokenView.as_view(), name='async_verify_token'),
+    path('async/profile/', async_views.AsyncUserProfileView.as_view(), name='async_profile'),
+
     # Регистрация
     path('register/', views.RegisterView.as_view(), name='register'),
     
@@ -9,7 +9,14 @@ from .serializers import RegisterSerializer
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+from config.db_router import replica_reads
+
+from .activity import activity_tracker
 from .models import Client
+from .revocation import revocation_store
+from .throttling import LOGIN_THROTTLES, REGISTER_THROTTLES
+from .profile_cache import get_profile_data, get_profile_payload, profile_response, wrap_verify
+from .authentication import add_client_claims
 from .serializers import (
     ClientSerializer, 
     RegisterSerializer, 
@@ -19,7 +26,8 @@ from .serializers import (
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
 
 # Существующий тестовый endpoint
 @api_view(['GET'])
@@ -36,31 +44,25 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def get_token(cls, user):
         token = super().get_token(user)
         # Добавляем дополнительные поля в токен
-        token['username'] = user.username
-        token['email'] = user.email
-        token['inn'] = user.inn
-        token['client_type'] = user.client_type
-        token['company_name'] = user.company_name or ''
-        return token
+        return add_client_claims(token, user)
 
 # Кастомные вьюхи для JWT
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = LOGIN_THROTTLES
     
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        
-        # Добавляем данные пользователя в ответ при успешном входе
-        if response.status_code == 200:
-            try:
-                username = request.data.get('username')
-                user = Client.objects.get(username=username)
-                user_data = ClientSerializer(user).data
-                response.data['user'] = user_data
-            except:
-                pass
-                
-        return response
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        # Добавляем данные пользователя в ответ: пользователь уже загружен
+        # при аутентификации, повторный запрос к БД не нужен
+        data = dict(serializer.validated_data)
+        data['user'] = get_profile_data(serializer.user)
+        return Response(data, status=status.HTTP_200_OK)
 
 class CustomTokenRefreshView(TokenRefreshView):
     pass
@@ -70,12 +72,15 @@ class UserProfileView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        serializer = ClientSerializer(request.user)
-        return Response(serializer.data)
+        # Готовые байты профиля из кэша, 304 при совпадении ETag.
+        # Промах кэша читается с реплики, сразу после записи - из основной базы
+        with replica_reads():
+            return profile_response(request, get_profile_payload(request.user))
 
 # Регистрация
 class RegisterView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = REGISTER_THROTTLES
     @swagger_auto_schema(
         request_body=RegisterSerializer,  # Используем ваш сериализатор
         responses={
@@ -88,12 +93,9 @@ class RegisterView(APIView):
         
         if serializer.is_valid():
             try:
+                # last_activity уже выставлен auto_now при создании
                 user = serializer.save()
                 
-                # Обновляем последнюю активность
-                user.last_activity = timezone.now()
-                user.save()
-                
                 # Получаем токены для нового пользователя
                 tokens = get_tokens_for_user(user)
                 user_data = ClientSerializer(user).data
@@ -118,6 +120,7 @@ class RegisterView(APIView):
 # Вход в систему
 class LoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = LOGIN_THROTTLES
     @swagger_auto_schema(
         operation_description="Вход в систему",
         request_body=openapi.Schema(
@@ -136,13 +139,12 @@ class LoginView(APIView):
         if serializer.is_valid():
             user = serializer.validated_data['user']
             
-            # Обновляем последнюю активность
-            user.last_activity = timezone.now()
-            user.save()
+            # Отмечаем активность без UPDATE всей строки Client
+            activity_tracker.touch(user.pk)
             
             # Получаем токены
             tokens = get_tokens_for_user(user)
-            user_data = ClientSerializer(user).data
+            user_data = get_profile_data(user)
             
             return Response({
                 'success': True,
@@ -156,7 +158,7 @@ class LoginView(APIView):
                 'details': serializer.errors
             }, status=status.HTTP_401_UNAUTHORIZED)
 
-# Выход из системы (добавление refresh токена в черный список)
+# Выход из системы (отзыв refresh и текущего access токена)
 class LogoutView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     @swagger_auto_schema(
@@ -178,7 +180,11 @@ class LogoutView(APIView):
         try:
             refresh_token = request.data.get('refresh')
             token = RefreshToken(refresh_token)
-            token.blacklist()
+            if token.get(api_settings.USER_ID_CLAIM) != request.user.pk:
+                raise TokenError('Токен выдан другому пользователю')
+            revocation_store.revoke_token(token)
+            if request.auth is not None:
+                revocation_store.revoke_token(request.auth)
             
             return Response({
                 'success': True,
@@ -198,7 +204,5 @@ class VerifyTokenView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        return Response({
-            'valid': True,
-            'user': ClientSerializer(request.user).data
-        })
\ No newline at end of file
+        payload = wrap_verify(get_profile_payload(request.user))
+        return profile_response(request, payload)
\ No newline at end of file